@@ -0,0 +1,234 @@
+import asyncio
+
+import pytest
+
+from tg import MinimalApplicationConfigurator, TGController, expose, milestones, request, request_local, response
+from tg.configuration.utils import TGConfigError
+from tg.support.asgi import ASGIApplication, run_coroutine
+
+
+def _http_scope(path='/', method='GET', query_string=b'', headers=()):
+    return {'type': 'http', 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'root_path': '',
+            'query_string': query_string, 'headers': list(headers),
+            'server': ('testserver', 8080), 'client': ('127.0.0.1', 5000)}
+
+
+def _call(app, scope, body_chunks=(b'', )):
+    messages = []
+    incoming = [{'type': 'http.request', 'body': chunk, 'more_body': idx < len(body_chunks) - 1}
+                for idx, chunk in enumerate(body_chunks)]
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+class TestASGIApplication(object):
+    def setup_method(self):
+        class RootController(TGController):
+            @expose()
+            def index(self, **kw):
+                return 'HELLO %s' % kw.get('name', 'WORLD')
+
+            @expose()
+            def info(self):
+                return '%s %s %s' % (request.host, request.remote_addr, request.headers['X-Test'])
+
+            @expose()
+            async def async_action(self, value):
+                await asyncio.sleep(0)
+                loop = asyncio.get_running_loop()
+                return '%s %s %s' % (value, request.path, loop is request.environ['asgi.loop'])
+
+            @expose()
+            def cookies(self):
+                return '%(a)s %(b)s' % request.cookies
+
+            @expose()
+            def stream(self):
+                def _stream():
+                    try:
+                        yield b'ONE'
+                        yield b'TWO'
+                    finally:
+                        self.closed.append(True)
+                response.app_iter = _stream()
+                return response
+
+        self.root = RootController()
+        self.root.closed = []
+        request_local._reset_context_backend()
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': self.root,
+                              'registry_backend': 'contextvars',
+                              'asgi.max_workers': '2'})
+        self.app = cfg.make_asgi_app({}, {})
+
+    def teardown_method(self):
+        self.app.executor.shutdown()
+        request_local._reset_context_backend()
+        milestones._reset_all()
+
+    def test_make_asgi_app(self):
+        assert isinstance(self.app, ASGIApplication)
+        assert self.app.executor._max_workers == 2
+
+    def test_make_asgi_app_requires_contextvars(self):
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': TGController()})
+        with pytest.raises(TGConfigError) as exc:
+            cfg.make_asgi_app({}, {})
+        assert 'registry_backend = contextvars' in str(exc.value)
+
+    def test_get(self):
+        start, body, end = _call(self.app, _http_scope('/', query_string=b'name=TG'))
+        assert start['type'] == 'http.response.start'
+        assert start['status'] == 200
+        assert (b'content-type', b'text/html; charset=utf-8') in start['headers']
+        assert body == {'type': 'http.response.body', 'body': b'HELLO TG', 'more_body': True}
+        assert end == {'type': 'http.response.body', 'body': b'', 'more_body': False}
+
+    def test_post_streamed_body(self):
+        scope = _http_scope('/', method='POST', headers=[
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', b'7'),
+        ])
+        messages = _call(self.app, scope, body_chunks=(b'nam', b'e=TG'))
+        assert messages[1]['body'] == b'HELLO TG'
+
+    def test_post_without_content_length(self):
+        scope = _http_scope('/', method='POST', headers=[
+            (b'content-type', b'application/x-www-form-urlencoded'),
+        ])
+        messages = _call(self.app, scope, body_chunks=(b'nam', b'e=TG'))
+        assert messages[1]['body'] == b'HELLO TG'
+
+    def test_environ(self):
+        scope = _http_scope('/info', headers=[(b'x-test', b'a'), (b'x-test', b'b')])
+        messages = _call(self.app, scope)
+        assert messages[1]['body'] == b'testserver:8080 127.0.0.1 a,b'
+
+    def test_multiple_cookie_headers(self):
+        scope = _http_scope('/cookies', headers=[(b'cookie', b'a=1'), (b'cookie', b'b=2')])
+        messages = _call(self.app, scope)
+        assert messages[1]['body'] == b'1 2'
+
+    def test_disconnect_while_receiving_body(self):
+        scope = _http_scope('/', method='POST', headers=[
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', b'7'),
+        ])
+        incoming = [{'type': 'http.request', 'body': b'nam', 'more_body': True},
+                    {'type': 'http.disconnect'}]
+        messages = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.app(scope, receive, send))
+        assert messages == []
+
+    def test_async_action(self):
+        messages = _call(self.app, _http_scope('/async_action/5'))
+        assert messages[1]['body'] == b'5 /async_action/5 True'
+
+    def test_streamed_response(self):
+        messages = _call(self.app, _http_scope('/stream'))
+        assert [m['body'] for m in messages[1:]] == [b'ONE', b'TWO', b'']
+
+    def test_slow_client_doesnt_hold_thread(self):
+        messages = []
+        incoming = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            # The response was consumed by the worker before the client got it.
+            deadline = asyncio.get_running_loop().time() + 2
+            while not self.root.closed and asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(0.01)
+            messages.append((message, bool(self.root.closed)))
+
+        asyncio.run(self.app(_http_scope('/stream'), receive, send))
+        assert all(closed for __, closed in messages)
+        messages = [m for m, __ in messages]
+        assert [m['body'] for m in messages[1:]] == [b'ONE', b'TWO', b'']
+
+    def test_disconnect_while_sending_response(self):
+        incoming = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            raise OSError('disconnected')
+
+        with pytest.raises(OSError):
+            asyncio.run(self.app(_http_scope('/stream'), receive, send))
+        assert self.root.closed
+
+    def test_not_found(self):
+        messages = _call(self.app, _http_scope('/missing'))
+        assert messages[0]['status'] == 404
+        assert messages[-1]['more_body'] is False
+
+    def test_lifespan(self):
+        messages = []
+        incoming = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.app({'type': 'lifespan'}, receive, send))
+        assert messages == [{'type': 'lifespan.startup.complete'},
+                            {'type': 'lifespan.shutdown.complete'}]
+
+    def test_unsupported_scope(self):
+        with pytest.raises(ValueError):
+            asyncio.run(self.app({'type': 'websocket'}, None, None))
+
+
+class TestRunCoroutine(object):
+    def test_thread_event_loop(self):
+        async def coroutine(value):
+            await asyncio.sleep(0)
+            return value
+
+        assert run_coroutine(coroutine(1)) == 1
+        assert run_coroutine(coroutine(2)) == 2
+
+    def test_exceptions_propagate(self):
+        async def coroutine():
+            raise ValueError('FAILED')
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, run_coroutine, coroutine(), loop)
+
+        with pytest.raises(ValueError):
+            asyncio.run(main())
+
+    def test_waiting_from_event_loop_thread(self):
+        async def coroutine():
+            return 1
+
+        async def main():
+            return run_coroutine(coroutine(), asyncio.get_running_loop())
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(main())
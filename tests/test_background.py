@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from tg.support.background import BackgroundRunner
+
+
+class TestBackgroundRunner(object):
+    def test_runs_in_background(self):
+        runner = BackgroundRunner(workers=2, name='tg-test')
+        threads = []
+        try:
+            assert runner.submit(lambda: threads.append(threading.current_thread().name))
+            runner.join()
+        finally:
+            runner.shutdown()
+
+        assert threads[0].startswith('tg-test-')
+        stats = runner.stats()
+        assert stats['queued'] == 1
+        assert stats['completed'] == 1
+        assert stats['pending'] == 0
+        assert 0 <= stats['max_lag'] <= stats['total_lag']
+
+    def test_failures_are_counted(self):
+        def fail():
+            raise ValueError('FAIL')
+
+        runner = BackgroundRunner()
+        try:
+            runner.submit(fail)
+            runner.join()
+        finally:
+            runner.shutdown()
+        assert runner.stats()['failed'] == 1
+
+    def _blocked_runner(self, overflow):
+        runner = BackgroundRunner(queue_size=1, overflow=overflow)
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait()
+
+        runner.submit(blocking)
+        started.wait()
+        runner.submit(lambda: None)  # Fills the queue
+        return runner, release
+
+    def test_overflow_drop(self):
+        runner, release = self._blocked_runner('drop')
+        try:
+            assert runner.submit(lambda: None) is False
+        finally:
+            release.set()
+            runner.shutdown()
+        assert runner.stats()['dropped'] == 1
+        assert runner.stats()['completed'] == 2
+
+    def test_overflow_run(self):
+        runner, release = self._blocked_runner('run')
+        threads = []
+        try:
+            assert runner.submit(lambda: threads.append(threading.current_thread()))
+        finally:
+            release.set()
+            runner.shutdown()
+        assert threads == [threading.current_thread()]
+        assert runner.stats()['completed'] == 3
+
+    def test_unsupported_overflow(self):
+        with pytest.raises(ValueError):
+            BackgroundRunner(overflow='explode')
+
+    def test_shutdown_at_exit(self, monkeypatch):
+        import atexit
+        registered = []
+        monkeypatch.setattr(atexit, 'register', registered.append)
+        monkeypatch.setattr(atexit, 'unregister', registered.remove)
+
+        runner = BackgroundRunner()
+        assert registered == []
+
+        runner.submit(lambda: None)
+        runner.submit(lambda: None)
+        assert registered == [runner.shutdown]
+
+        runner.shutdown()
+        assert registered == []
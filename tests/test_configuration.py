@@ -19,7 +19,13 @@ else:
 from webtest import TestApp
 
 import tg.i18n
-from tests.base import setup_session_dir, teardown_session_dir, utcnow
+from tests.base import (
+    cache_dir,
+    session_dir,
+    setup_session_dir,
+    teardown_session_dir,
+    utcnow,
+)
 from tg import (
     MinimalApplicationConfigurator,
     TGController,
@@ -28,6 +34,7 @@ from tg import (
     request,
     response,
 )
+from tg.appwrappers import ApplicationWrapper, PhasedApplicationWrapper
 from tg.appwrappers.mingflush import MingApplicationWrapper
 from tg.configuration import config, milestones
 from tg.configuration.app_config import AppConfig
@@ -58,6 +65,7 @@ from tg.configurator.components.transactions import (
 )
 from tg.renderers.base import RendererFactory
 from tg.support.converters import asbool, asint
+from tg.support.registry import ContextVarLocal
 from tg.util import Bunch
 from tg.wsgiapp import TGApp
 
@@ -451,6 +459,79 @@ class TestConfigurator:
         app = TestApp(apc.make_wsgi_app({}, {}))
         assert app.get('/').text == 'HI'
 
+    def test_registry_contextvars_backend(self):
+        from tg import request_local
+        from tg.util.webtest import test_context
+
+        class MinimalController(TGController):
+            @expose()
+            def index(self):
+                return request.path
+
+        tgapp = Bunch(app=None)
+        def save_app(app):
+            tgapp.app = app
+            return app
+
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({
+            'root_controller': MinimalController(),
+            'registry_backend': 'contextvars'
+        })
+        request_local._reset_context_backend()
+        try:
+            app = TestApp(cfg.make_wsgi_app({}, {}, wrap_app=save_app))
+            assert isinstance(request_local.context.____local__, ContextVarLocal)
+            assert app.get('/').text == '/'
+            assert not request_local.context._object_stack()
+
+            with test_context(tgapp.app, '/some/path'):
+                assert request.path == '/some/path'
+                # Config is resolved from the context, only the context is pushed.
+                assert tg.config._current_obj() is tgapp.app.config
+                assert not request_local.config._object_stack()
+            assert not request_local.context._object_stack()
+        finally:
+            request_local._reset_context_backend()
+
+    def test_registry_backend_locked_after_request(self):
+        from tg import request_local
+
+        class MinimalController(TGController):
+            @expose()
+            def index(self):
+                return 'HI'
+
+        request_local._reset_context_backend()
+        try:
+            cfg = MinimalApplicationConfigurator()
+            cfg.update_blueprint({'root_controller': MinimalController()})
+            app = TestApp(cfg.make_wsgi_app({}, {}))
+            assert app.get('/').text == 'HI'
+
+            cfg = MinimalApplicationConfigurator()
+            cfg.update_blueprint({'root_controller': MinimalController(),
+                                  'registry_backend': 'contextvars'})
+            with pytest.raises(TGConfigError) as exc:
+                cfg.make_wsgi_app({}, {})
+            assert 'threadlocal backend is already in use' in str(exc.value)
+
+            # Applications using the same backend can still be created.
+            cfg = MinimalApplicationConfigurator()
+            cfg.update_blueprint({'root_controller': MinimalController(),
+                                  'registry_backend': 'threadlocal'})
+            app = TestApp(cfg.make_wsgi_app({}, {}))
+            assert app.get('/').text == 'HI'
+        finally:
+            request_local._reset_context_backend()
+
+    def test_registry_invalid_backend(self):
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'registry_backend': 'greenlets'})
+
+        with pytest.raises(TGConfigError):
+            cfg.make_wsgi_app({}, {})
+
     def test_app_without_controller(self):
         cfg = MinimalApplicationConfigurator()
         app = TestApp(cfg.make_wsgi_app({}, {}))
@@ -772,6 +853,63 @@ class TestAppConfig:
 
         transaction.manager = prev_transaction_manager
 
+    def test_sqlalchemy_streamed_response(self):
+        from tg.render import _encode_stream
+
+        events = []
+        fake_transaction = FakeTransaction()
+        fake_transaction.commit = lambda: events.append('commit')
+        fake_transaction.abort = lambda: events.append('abort')
+        import transaction
+        prev_transaction_manager = transaction.manager
+        transaction.manager = fake_transaction
+
+        def _template(fail=False):
+            yield 'HI'
+            if fail:
+                raise ValueError('crash')
+            events.append('streamed')
+
+        class RootController(TGController):
+            @expose()
+            def stream(self):
+                return _encode_stream(_template(), 'utf-8')
+
+            @expose()
+            def crash(self):
+                return _encode_stream(_template(fail=True), 'utf-8')
+
+            @expose()
+            def generator(self):
+                return (c.encode('utf-8') for c in _template())
+
+        package = PackageWithModel()
+        conf = AppConfig(minimal=True, root_controller=RootController())
+        conf.package = package
+        conf.model = package.model
+        conf.use_sqlalchemy = True
+        conf['tm.enabled'] = True
+        conf['sqlalchemy.url'] = 'sqlite://'
+
+        try:
+            app = TestApp(conf.make_wsgi_app())
+            assert 'HI' in app.get('/stream')
+            assert events == ['streamed', 'commit']
+
+            del events[:]
+            with pytest.raises(ValueError):
+                app.get('/crash')
+            assert events == ['abort']
+
+            # Only templates defer the commit, other bodies are sent after it.
+            del events[:]
+            resp = app.get('/generator')
+            assert 'HI' in resp
+            assert events == ['commit', 'streamed']
+            assert 'tg.locals' not in resp.request.environ
+        finally:
+            transaction.manager = prev_transaction_manager
+
     def test_setup_sqla_persistance(self):
         conf = AppConfig(minimal=True, root_controller=RootController())
         conf['sqlalchemy.url'] = 'sqlite://'
@@ -1337,6 +1475,95 @@ class TestAppConfig:
         assert app_wrappers[3] == AppWrapper4
         assert app_wrappers[4] == AppWrapper5
 
+    def _make_wrappers_app(self, visits, pipeline, short_circuit=None):
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                visits.append('controller')
+                return 'HI!'
+
+        def make_phased(name):
+            class Phased(PhasedApplicationWrapper):
+                def before(self, context):
+                    visits.append(name + '.before')
+                    if name == short_circuit:
+                        return tg.Response('SHORT')
+
+                def after(self, context, response):
+                    visits.append(name + '.after')
+                    return response
+            Phased.__name__ = 'Phased' + name.upper()
+            return Phased
+
+        class Nested(ApplicationWrapper):
+            def __call__(self, controller, environ, context):
+                visits.append('nested.call')
+                return self.next_handler(controller, environ, context)
+
+        def track_app(app):
+            track_app.app = app
+            return app
+
+        conf = AppConfig(minimal=True, root_controller=RootController())
+        conf.package = PackageWithModel()
+        conf['application_wrappers_pipeline'] = pipeline
+        for wrapper in (make_phased('a'), Nested, make_phased('b'), make_phased('c')):
+            conf.register_wrapper(wrapper)
+        app = TestApp(conf.make_wsgi_app(wrap_app=track_app))
+        return app, track_app.app
+
+    def test_application_wrappers_pipeline(self):
+        nested_visits = []
+        app, tgapp = self._make_wrappers_app(nested_visits, pipeline=False)
+        assert app.get('/test').text == 'HI!'
+        assert isinstance(tgapp.wrapped_dispatch, PhasedApplicationWrapper)
+
+        pipeline_visits = []
+        app, tgapp = self._make_wrappers_app(pipeline_visits, pipeline=True)
+        assert app.get('/test').text == 'HI!'
+        assert not isinstance(tgapp.wrapped_dispatch, PhasedApplicationWrapper)
+
+        assert pipeline_visits == nested_visits
+        assert pipeline_visits == ['c.before', 'b.before', 'nested.call', 'a.before',
+                                   'controller', 'a.after', 'b.after', 'c.after']
+
+    def test_application_wrappers_pipeline_short_circuit(self):
+        nested_visits = []
+        app, __ = self._make_wrappers_app(nested_visits, pipeline=False, short_circuit='b')
+        assert app.get('/test').text == 'SHORT'
+
+        pipeline_visits = []
+        app, __ = self._make_wrappers_app(pipeline_visits, pipeline=True, short_circuit='b')
+        assert app.get('/test').text == 'SHORT'
+
+        assert pipeline_visits == nested_visits
+        assert pipeline_visits == ['c.before', 'b.before', 'c.after']
+
+    def test_application_wrappers_pipeline_with_session(self):
+        class RootController(TGController):
+            @expose()
+            def set_lang(self):
+                tg.i18n.set_lang('it')
+                return 'OK'
+
+            @expose()
+            def lang(self):
+                return ','.join(tg.i18n.get_lang(all=True))
+
+        conf = AppConfig(minimal=True, root_controller=RootController())
+        conf.package = PackageWithModel()
+        conf['application_wrappers_pipeline'] = True
+        conf['i18n.enabled'] = True
+        conf['session.enabled'] = True
+        conf['session.data_dir'] = session_dir
+        conf['cache.enabled'] = True
+        conf['cache.cache_dir'] = cache_dir
+        app = TestApp(conf.make_wsgi_app())
+
+        resp = app.get('/set_lang')
+        assert 'Set-cookie' in str(resp.headers)
+        assert app.get('/lang').text.startswith('it')
+
     def test_wrap_app(self):
         class RootController(TGController):
             @expose()
@@ -1647,6 +1874,34 @@ class TestAppConfig:
                                                          'paste.testing_variables':{}})
         assert testmode is True
 
+    def test_application_lazy_request_locals(self):
+        class FakeRegistry(object):
+            def register(self, *args, **kw):
+                pass
+
+        def track_app(app):
+            track_app.app = app
+            return app
+
+        conf = AppConfig(minimal=True, root_controller=RootController())
+        conf.package = PackageWithModel()
+        conf['tg.strict_tmpl_context'] = False
+        conf.make_wsgi_app(wrap_app=track_app)
+
+        __, tgl, __ = track_app.app._setup_app_env({'paste.registry': FakeRegistry()})
+        assert not hasattr(tgl, '_translator')
+        assert not hasattr(tgl, '_tmpl_context')
+
+        assert tgl.tmpl_context is tgl.tmpl_context
+        assert tgl.tmpl_context.missing == ''
+        assert tgl.translator is tgl.translator
+        assert tgl.translator.gettext('Hello') == 'Hello'
+
+        __, tgl, __ = track_app.app._setup_app_env({'paste.registry': FakeRegistry()})
+        translator = tg.i18n._get_translator(None)
+        tgl.translator = translator
+        assert tgl.translator is translator
+
     def test_application_no_controller_hijacking(self):
         class RootController(TGController):
             @expose()
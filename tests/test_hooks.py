@@ -1,4 +1,6 @@
 import atexit
+import threading
+from unittest import mock
 
 import pytest
 from webtest import TestApp
@@ -9,6 +11,7 @@ from tg import AppConfig, TGController, expose
 from tg.configuration import milestones
 from tg.configuration.utils import TGConfigError
 from tg.support.hooks import (
+    HooksNamespace,
     _ApplicationHookRegistration,
     _ControllerHookRegistration,
     _TGGlobalHooksNamespace,
@@ -290,4 +293,211 @@ class TestGlobalHooks:
         controllerhook = _ControllerHookRegistration(None, "fakename", lambda x:x)
         controllerhook_repr = repr(controllerhook)
         assert controllerhook_repr.startswith("<ControllerHookRegistration: 'fakename' <function")
-        
\ No newline at end of file
+        
+    def test_compiled_hooks(self):
+        called = []
+        def global_hook(value):
+            called.append(('global', value))
+
+        def controller_hook(value):
+            called.append(('controller', value))
+
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        tg.hooks.notify('compiled_hook', args=(1,), controller=RootController.test)
+        assert tg.hooks._compiled[RootController.test]['compiled_hook'] == ()
+
+        _ApplicationHookRegistration(tg.hooks, 'compiled_hook', global_hook)()
+        assert tg.hooks._compiled == {}
+
+        tg.hooks.notify('compiled_hook', args=(2,), controller=RootController.test)
+        _ControllerHookRegistration(RootController.test, 'compiled_hook', controller_hook)()
+        tg.hooks.notify('compiled_hook', args=(3,), controller=RootController().test)
+        assert tg.hooks._compiled[RootController.test]['compiled_hook'] == (
+            global_hook, controller_hook
+        )
+
+        tg.hooks.disconnect('compiled_hook', global_hook)
+        tg.hooks.notify('compiled_hook', args=(4,), controller=RootController.test)
+        assert called == [('global', 2), ('global', 3), ('controller', 3),
+                          ('controller', 4)]
+
+    def test_compiled_hooks_changed_while_compiling(self):
+        namespace = HooksNamespace()
+
+        class ChangingHooks(dict):
+            def get(self, *args):
+                # Another thread registers an hook during the compilation.
+                hooks = dict.get(self, *args)
+                namespace._invalidate()
+                return hooks
+
+        namespace._hooks = ChangingHooks()
+        assert namespace._compiled_hooks('changing_hook') == ()
+        assert namespace._compiled == {}
+
+    def test_hooks_stats(self):
+        def hook(value):
+            return value + 1
+
+        def failing_hook():
+            raise ValueError('FAIL')
+
+        tg.hooks._hooks['stats_hook'] = [hook]
+        tg.hooks._hooks['stats_value_hook'] = [hook, hook]
+        tg.hooks._hooks['stats_failing_hook'] = [failing_hook]
+        tg.hooks._invalidate()
+
+        assert tg.hooks.stats() is None
+        tg.hooks.notify('stats_hook', args=(1, ))
+        assert tg.hooks.stats() is None
+
+        tg.hooks.enable_stats()
+        try:
+            tg.hooks.notify('stats_hook', args=(1, ))
+            tg.hooks.notify('stats_hook', args=(2, ))
+            assert tg.hooks.notify_with_value('stats_value_hook', 1) == 3
+            tg.hooks.notify('stats_failing_hook', trap_exceptions=True)
+
+            stats = tg.hooks.stats()
+            assert stats['stats_hook'][hook]['calls'] == 2
+            assert stats['stats_value_hook'][hook]['calls'] == 2
+            assert stats['stats_failing_hook'][failing_hook]['calls'] == 1
+            hook_stats = stats['stats_hook'][hook]
+            assert 0 <= hook_stats['max'] <= hook_stats['total']
+        finally:
+            tg.hooks.disable_stats()
+
+        assert tg.hooks.stats() is None
+        assert '_call_handler' not in tg.hooks.__dict__
+        assert tg.hooks.notify_with_value('stats_value_hook', 1) == 3
+
+    def test_after_response_hooks(self):
+        from tg import FullStackApplicationConfigurator
+        from tg.configurator.components.after_response import AfterResponseConfigurationComponent
+
+        notified = []
+        def after_response(request, status):
+            notified.append((request.path, request.environ.get('wsgi.input'), status,
+                             threading.current_thread().name))
+
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        cfg = FullStackApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController(),
+                              'errorpage.enabled': False,
+                              'after_response.workers': '2'})
+        tg.hooks.register('after_response', after_response)
+        app = TestApp(cfg.make_wsgi_app({}, {}))
+        runner = tg.config['tg.after_response']
+        try:
+            app.get('/test')
+            app.get('/missing', status=404)
+            runner.join()
+        finally:
+            runner.shutdown()
+
+        assert sorted(n[:3] for n in notified) == [('/missing', None, '404 Not Found'),
+                                                  ('/test', None, '200 OK')]
+        assert all(n[3].startswith('tg-after-response') for n in notified)
+        assert runner.workers == 2
+        assert runner.stats()['completed'] == 2
+
+    def test_after_response_hook_failure(self):
+        from tg import FullStackApplicationConfigurator
+
+        notified = []
+        def failing_hook(request, status):
+            raise ValueError('hook failure')
+
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        cfg = FullStackApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController(),
+                              'errorpage.enabled': False})
+        tg.hooks.register('after_response', failing_hook)
+        tg.hooks.register('after_response', lambda req, status: notified.append(status))
+        app = TestApp(cfg.make_wsgi_app({}, {}))
+        runner = tg.config['tg.after_response']
+        try:
+            with mock.patch('tg.support.background.log') as log:
+                app.get('/test')
+                runner.join()
+        finally:
+            runner.shutdown()
+
+        # The failure doesn't prevent the other hooks from running.
+        assert notified == ['200 OK']
+        assert runner.stats()['failed'] == 1
+        assert runner.stats()['completed'] == 1
+        assert log.exception.call_count == 1
+
+    def test_after_response_minimal(self):
+        from tg import MinimalApplicationConfigurator
+        from tg.support.registry import Registry
+        from tg.wsgiapp import _AfterResponseIterator
+
+        notified = []
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        tgapp = []
+        def save_app(app):
+            tgapp.append(app)
+            return app
+
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController()})
+        tg.hooks.register('after_response', lambda req, status: notified.append(status))
+        app = cfg.make_wsgi_app({}, {}, wrap_app=save_app)
+        runner = tg.config['tg.after_response']
+        try:
+            assert TestApp(app).get('/test').text == 'HI!'
+
+            # Hooks run even when the server closes the body without iterating it
+            registry = Registry()
+            registry.prepare()
+            environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/test',
+                       'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+                       'wsgi.url_scheme': 'http', 'SCRIPT_NAME': '',
+                       'paste.registry': registry}
+            try:
+                app_iter = tgapp[0](environ, lambda status, headers, exc_info=None: None)
+            finally:
+                registry.cleanup()
+            assert isinstance(app_iter, _AfterResponseIterator)
+            app_iter.close()
+            app_iter.close()
+            runner.join()
+        finally:
+            runner.shutdown()
+        assert notified == ['200 OK', '200 OK']
+
+    def test_after_response_hook_on_controller(self):
+        class RootController(TGController):
+            @expose()
+            def test(self):
+                return 'HI!'
+
+        with pytest.raises(TGConfigError):
+            tg.hooks.register('after_response', lambda r, s: None,
+                              controller=RootController.test)
+
+    def test_after_response_invalid_overflow(self):
+        from tg import FullStackApplicationConfigurator
+        cfg = FullStackApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': TGController(),
+                              'after_response.overflow': 'explode'})
+        with pytest.raises(TGConfigError):
+            cfg.make_wsgi_app({}, {})
@@ -1,15 +1,23 @@
 """
 Testing for TG2 Configuration
 """
+import dis
+import logging
+import os
+
 import pytest
 from mako.exceptions import TemplateLookupException
 from webtest import TestApp
 
 import tg
 from tests.base import setup_session_dir, teardown_session_dir
-from tg import AppConfig
-from tg.render import MissingRendererError, _get_tg_vars
+from tg import AppConfig, TGController, expose
+from tg.configuration import milestones
+from tg.render import MissingRendererError, _auto_cache_key, _get_tg_vars
+from tg.renderers.base import warmup_templates
+from tg.validation import _ValidationStatus
 from tg.util.webtest import test_context
+from tg.util import Bunch
 
 
 def setup_module():
@@ -43,6 +51,24 @@ def test_render_default():
     assert 'value": "value' in res
 
 
+def test_auto_cache_key_types():
+    from markupsafe import Markup
+    app = TestApp(AppConfig(minimal=True).make_wsgi_app())
+
+    with test_context(app):
+        keys = [_auto_cache_key('kajiki', 'template', value) for value in (
+            {'value': 'text'}, {'value': Markup('text')},
+            {'value': [1, 2]}, {'value': (1, 2)},
+            {'value': {'1': 1}}, {'value': ['1', 1]},
+        )]
+        assert len(set(keys)) == len(keys)
+        assert None not in keys
+
+        assert _auto_cache_key('kajiki', 'template', {'value': {1: 1}}) is None
+        assert (_auto_cache_key('kajiki', 'template', {'a': 1, 'b': 2}) ==
+                _auto_cache_key('kajiki', 'template', {'b': 2, 'a': 1}))
+
+
 def test_jinja_lookup_nonexisting_template():
     conf = AppConfig(minimal=True)
     conf.use_dotted_templatenames = True
@@ -60,6 +86,51 @@ def test_jinja_lookup_nonexisting_template():
         pass
 
 
+class TestJinjaBytecodeCache(object):
+    def _make_renderer(self, **options):
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.append('jinja')
+        conf.package = FakePackage()
+        for key, value in options.items():
+            conf['templating.jinja.' + key] = value
+        conf.make_wsgi_app()
+        return tg.config['render_functions']['jinja']
+
+    def _render(self, render_jinja):
+        return render_jinja('tests.test_stack.rendering.templates.jinja_noop',
+                            {'app_globals': tg.config['tg.app_globals']})
+
+    def test_no_bytecode_cache_by_default(self):
+        render_jinja = self._make_renderer()
+        assert render_jinja.jinja2_env.bytecode_cache is None
+
+    def test_filesystem_bytecode_cache(self, tmp_path):
+        cache_dir = tmp_path / 'jinja_bytecode'
+        render_jinja = self._make_renderer(bytecode_cache_dir=str(cache_dir))
+        res = self._render(render_jinja)
+        assert 'move along' in res, res
+        assert render_jinja.jinja2_env.bytecode_cache.stats() == {'hits': 0, 'misses': 1}
+        assert len(list(cache_dir.iterdir())) == 1
+
+        # A new process sharing the directory doesn't compile the template again.
+        render_jinja = self._make_renderer(bytecode_cache_dir=str(cache_dir))
+        assert self._render(render_jinja) == res
+        assert render_jinja.jinja2_env.bytecode_cache.stats() == {'hits': 1, 'misses': 0}
+
+    def test_changed_source_is_a_miss(self, tmp_path):
+        render_jinja = self._make_renderer(bytecode_cache_dir=str(tmp_path))
+        env = render_jinja.jinja2_env
+        cache = env.bytecode_cache
+        bucket = cache.get_bucket(env, 'template', None, 'SOURCE')
+        bucket.code = compile('None', '<template>', 'exec')
+        cache.set_bucket(bucket)
+
+        assert cache.get_bucket(env, 'template', None, 'SOURCE').code is not None
+        assert cache.get_bucket(env, 'template', None, 'CHANGED').code is None
+        assert cache.stats() == {'hits': 1, 'misses': 2}
+
+
 class TestKajikiSupport(object):
     def setup_method(self):
         conf = AppConfig(minimal=True)
@@ -94,6 +165,225 @@ class TestKajikiSupport(object):
             raise AssertionError('Should have raised IOError')
 
 
+    def _compiled_renderer(self, compiled_dir, **options):
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.append('kajiki')
+        conf.package = FakePackage()
+        conf['templating.kajiki.compiled_templates_dir'] = str(compiled_dir)
+        for key, value in options.items():
+            conf['templating.kajiki.' + key] = value
+        app = TestApp(conf.make_wsgi_app())
+        return app, tg.config['render_functions']['kajiki']
+
+    def test_compiled_templates_dir(self, tmp_path, monkeypatch):
+        from kajiki.loader import FileLoader
+
+        app, render = self._compiled_renderer(tmp_path)
+        with test_context(app):
+            res = render('tests.test_stack.rendering.templates.kajiki_i18n', {})
+        assert 'Your application is now running' in res
+        assert len(list(tmp_path.iterdir())) == 1
+
+        def _compile(*args, **kwargs):
+            raise AssertionError('Template should not be compiled')
+        monkeypatch.setattr(FileLoader, '_load', _compile)
+
+        # Another process loads the compiled template instead of compiling it.
+        app, render = self._compiled_renderer(tmp_path)
+        with test_context(app):
+            assert render('tests.test_stack.rendering.templates.kajiki_i18n', {}) == res
+
+        template = render.loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+        assert template.filename.endswith('kajiki_i18n.xhtml')
+        for name, method in template.__methods__:
+            assert method._func.__code__.co_filename == template.filename
+
+    def test_compiled_templates_reload(self, tmp_path, monkeypatch):
+        import shutil
+        from tg.renderers import kajiki as kajiki_renderer
+
+        source = os.path.join(os.path.dirname(__file__), 'test_stack', 'rendering',
+                              'templates', 'kajiki_i18n.xhtml')
+        template_file = tmp_path / 'page.xhtml'
+        shutil.copy(source, str(template_file))
+        compiled_dir = tmp_path / 'compiled'
+
+        app, render = self._compiled_renderer(compiled_dir)
+        assert render.loader._reload
+        template = render.loader.load(str(template_file))
+
+        def _read_compiled(*args, **kwargs):
+            raise AssertionError('Compiled template should not be read')
+        monkeypatch.setattr(kajiki_renderer.marshal, 'load', _read_compiled)
+
+        # Reloading an unchanged template doesn't access the compiled one.
+        assert render.loader.load(str(template_file)) is template
+
+        monkeypatch.undo()
+        stat = os.stat(str(template_file))
+        os.utime(str(template_file), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert render.loader.load(str(template_file)) is not template
+        assert len(list(compiled_dir.iterdir())) == 2
+
+    def test_compiled_templates_unsupported_kajiki(self, tmp_path, monkeypatch):
+        from tg.renderers import kajiki as kajiki_renderer
+        monkeypatch.setattr(kajiki_renderer, '_KAJIKI_VERSION', '2.0.0')
+
+        app, render = self._compiled_renderer(tmp_path, pretranslate='true')
+        assert render.loader.compiled_templates_dir is None
+        assert render.pretranslate is False
+
+    def test_compiled_templates_depend_on_options(self, tmp_path):
+        app, render = self._compiled_renderer(tmp_path)
+        render.loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+
+        app, render = self._compiled_renderer(tmp_path, strip_text='true')
+        render.loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_compiled_templates_shared_by_loaders(self, tmp_path, monkeypatch):
+        from kajiki.loader import FileLoader
+        from tg.renderers.kajiki import KajikiTemplateLoader
+
+        app, render = self._compiled_renderer(tmp_path)
+        finder = render.loader.dotted_finder
+        template_name = 'tests.test_stack.rendering.templates.kajiki_i18n'
+
+        def _loader():
+            # Options whose repr changes on each process don't change the key.
+            return KajikiTemplateLoader('', finder, compiled_templates_dir=str(tmp_path),
+                                        base_globals={'helper': lambda: None})
+
+        template = _loader().load(template_name)
+        monkeypatch.setattr(FileLoader, '_load', None)
+        assert _loader().load(template_name).py_text == template.py_text
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_compiled_templates_internals_mismatch(self, tmp_path, monkeypatch, caplog):
+        from tg.renderers import kajiki as kajiki_renderer
+
+        app, render = self._compiled_renderer(tmp_path)
+        render.loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+
+        def _mismatch(*args, **kwargs):
+            raise AttributeError('_func')
+        monkeypatch.setattr(kajiki_renderer, '_template_from_compiled', _mismatch)
+        monkeypatch.setattr(kajiki_renderer, '_compiled_template', _mismatch)
+
+        app, render = self._compiled_renderer(tmp_path)
+        with caplog.at_level(logging.WARNING, logger='tg.renderers.kajiki'):
+            with test_context(app):
+                res = render('tests.test_stack.rendering.templates.kajiki_i18n', {})
+        assert 'Your application is now running' in res
+        assert render.loader.compiled_templates_dir is None
+        assert 'disabling templating.kajiki.compiled_templates_dir' in caplog.text
+
+    def test_invalid_compiled_template(self, tmp_path):
+        app, render = self._compiled_renderer(tmp_path)
+        render.loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+        compiled_file, = tmp_path.iterdir()
+        compiled_file.write_bytes(b'INVALID')
+
+        app, render = self._compiled_renderer(tmp_path)
+        with test_context(app):
+            res = render('tests.test_stack.rendering.templates.kajiki_i18n', {})
+        assert 'Your application is now running' in res
+        assert compiled_file.read_bytes() != b'INVALID'
+
+    def test_pretranslate_ignored_when_reloading(self):
+        conf = AppConfig(minimal=True)
+        conf.renderers.append('kajiki')
+        conf.package = FakePackage()
+        conf.auto_reload_templates = True
+        conf['templating.kajiki.pretranslate'] = True
+        conf.make_wsgi_app()
+        assert tg.config['render_functions']['kajiki'].pretranslate is False
+
+    def test_pretranslate_matches_generated_code(self):
+        # Pre-translation relies on the code generated by Kajiki,
+        # this fails when a Kajiki release changes it.
+        from kajiki import XMLTemplate
+        from tg.renderers.kajiki import _template_lines, _translated_template
+
+        template = XMLTemplate(source='<div>\n<p>Hello</p>\n<p py:if="True">Bye</p>\n</div>',
+                               filename='test.xhtml')
+        translations = []
+
+        def _gettext(text):
+            translations.append(text)
+            return text.upper()
+
+        variant = _translated_template(template, _gettext, None)
+        assert sorted(translations) == ['Bye', 'Hello']
+        assert variant().render() == '<div>\n<p>HELLO</p>\n<p>BYE</p>\n</div>'
+
+        template_lines = set()
+        for name, method in template.__methods__:
+            template_lines.update(line for __, line in dis.findlinestarts(method._func.__code__))
+        lines = _template_lines(template)
+        assert lines and set(line for __, line in lines) <= template_lines
+        for name, method in variant.__methods__:
+            assert method._func.__code__.co_filename == 'test.xhtml'
+
+    def test_pretranslate_expressions(self):
+        from kajiki import XMLTemplate
+        from tg.renderers.kajiki import _translated_template
+
+        template = XMLTemplate(
+            source='<div><p>Hello</p>${local.__kj__.gettext("Bye")}'
+                   '<p>${"local.__kj__.gettext(\'Hello\')"}</p></div>',
+            filename='test.xhtml'
+        )
+        variant = _translated_template(template, lambda s: s.upper(), None)
+        assert variant().render() == "<div><p>HELLO</p>BYE<p>local.__kj__.gettext('Hello')</p></div>"
+
+    def test_pretranslate_failure_renders_untranslated(self, monkeypatch, caplog):
+        from tg.renderers import kajiki as kajiki_renderer
+
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.append('kajiki')
+        conf.package = FakePackage()
+        conf.auto_reload_templates = False
+        conf['templating.kajiki.pretranslate'] = True
+        app = TestApp(conf.make_wsgi_app())
+        loader = tg.config['render_functions']['kajiki'].loader
+        template = loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+
+        def _broken(*args, **kwargs):
+            raise SyntaxError('invalid syntax')
+        monkeypatch.setattr(kajiki_renderer, '_translated_template', _broken)
+
+        with test_context(app):
+            tgl = tg.request_local.context._current_obj()
+            tgl.translator = Bunch(tg_supported_lang=['de'], gettext=lambda s: s)
+            with caplog.at_level(logging.WARNING, logger='tg.renderers.kajiki'):
+                assert loader.translated(template) is template
+        assert 'Unable to pre-translate' in caplog.text
+
+    def test_pretranslate_variants_bounded(self):
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.append('kajiki')
+        conf.package = FakePackage()
+        conf.auto_reload_templates = False
+        conf['templating.kajiki.pretranslate'] = True
+        conf['templating.kajiki.pretranslate_cache_size'] = 1
+        app = TestApp(conf.make_wsgi_app())
+        loader = tg.config['render_functions']['kajiki'].loader
+        template = loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+
+        with test_context(app):
+            tgl = tg.request_local.context._current_obj()
+            for langs in (['de'], ['it']):
+                tgl.translator = Bunch(tg_supported_lang=langs, gettext=lambda s: s)
+                loader.translated(template)
+
+        variants = loader._translated[template]
+        assert variants.get(('it',)) is not None
+        assert variants.get(('de',)) is None
+
 class TestMakoLookup(object):
     def setup_method(self):
         conf = AppConfig(minimal=True)
@@ -115,6 +405,58 @@ class TestMakoLookup(object):
         dotted_test = mlookup.adjust_uri('local:test_stack.rendering.templates.mako_inherits_local', None)
         assert dotted_test.replace('\\', '/').endswith('tests/test_stack/rendering/templates/mako_inherits_local.mak')
 
+    def test_bounded_template_cache(self):
+        from tg.renderers.mako import DottedTemplateLookup
+
+        render_mako = tg.config['render_functions']['mako']
+        mlookup = DottedTemplateLookup(
+            input_encoding='utf-8', output_encoding='utf-8', imports=[],
+            default_filters=[], package_name='tests',
+            find_template_file=render_mako.dotted_loader.find_template_file,
+            cache_size=1
+        )
+
+        noop = mlookup.adjust_uri('tests.test_stack.rendering.templates.mako_noop', None)
+        base = mlookup.adjust_uri('tests.test_stack.rendering.templates.mako_base', None)
+        t = mlookup.get_template(noop)
+        assert mlookup.get_template(noop) is t
+        assert noop in mlookup.template_cache
+
+        mlookup.get_template(base)
+        assert base in mlookup.template_cache
+        assert noop not in mlookup.template_cache
+        assert len(mlookup.template_cache) == 1
+
+    def test_concurrent_template_loading(self):
+        import threading
+
+        render_mako = tg.config['render_functions']['mako']
+        mlookup = render_mako.dotted_loader
+        template_path = mlookup.adjust_uri('tests.test_stack.rendering.templates.mako_noop', None)
+        mlookup.template_cache.pop(template_path)
+
+        templates = []
+        threads = [threading.Thread(target=lambda: templates.append(mlookup.get_template(template_path)))
+                   for __ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(templates) == 5
+        assert all(t is templates[0] for t in templates)
+
+    def test_template_cache_size_option(self):
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.append('mako')
+        conf.package = FakePackage()
+        conf['templating.mako.template_cache_size'] = '5'
+        conf.make_wsgi_app()
+
+        mlookup = tg.config['render_functions']['mako'].dotted_loader
+        assert mlookup.template_cache._entries.size == 5
+
     def test_local_lookup(self):
         render_mako = tg.config['render_functions']['mako']
         res = render_mako('tests.test_stack.rendering.templates.mako_inherits_local',
@@ -198,8 +540,233 @@ class TestMakoLookup(object):
         finally:
             os.stat = old_stat
 
+    def test_request_vars_reused_by_render_calls(self):
+        with test_context(None, '/'):
+            tgl = tg.request_local.context._current_obj()
+            vars1 = _get_tg_vars()
+            tg.request.validation = _ValidationStatus(errors={'value': 'ERROR'},
+                                                      values={'value': 1})
+            vars2 = _get_tg_vars()
+
+            assert vars1 is not vars2
+            assert vars1.tg is vars2.tg is tgl._tg_vars.tg
+            assert vars2.tg.errors == {'value': 'ERROR'}
+            assert vars2.tg.inputs == {'value': 1}
+
+    def test_render_layers_vars(self):
+        conf = AppConfig(minimal=True)
+        conf.renderers.append('kajiki')
+        conf.package = FakePackage()
+        conf.variable_provider = lambda: {'provided': 'PROVIDED', 'h': 'PROVIDER'}
+        app = TestApp(conf.make_wsgi_app())
+
+        rendered = []
+        def render_function(template_name, template_vars, **kwargs):
+            rendered.append(template_vars)
+            template_vars['written'] = True
+            return 'OK'
+
+        tg.config['render_functions']['fake'] = render_function
+        with test_context(app):
+            controller_vars = {'h': 'CONTROLLER'}
+            tg.render_template(controller_vars, 'fake', 'template')
+            tg.render_template({}, 'fake', 'template')
+
+        assert rendered[0]['h'] == 'CONTROLLER'
+        assert rendered[0]['provided'] == 'PROVIDED'
+        assert rendered[1]['h'] == 'PROVIDER'
+        assert rendered[0]['tg'] is rendered[1]['tg']
+        assert type(rendered[0]) is Bunch
+        assert controller_vars == {'h': 'CONTROLLER'}
+
+    def test_request_vars_refreshed_by_render_calls(self):
+        with test_context(None, '/'):
+            tgl = tg.request_local.context._current_obj()
+            vars1 = _get_tg_vars()
+            # Like set_request_lang does
+            tgl.translator = object()
+            vars2 = _get_tg_vars()
+
+            assert vars2['translator'] is tgl.translator
+            assert vars2['translator'] is not vars1['translator']
+            assert vars2['session'] is vars2.tg.session
+
     def test_fallback_validation_context_in_templates(self):
         with test_context(None, '/'):
             vars = _get_tg_vars()
             assert vars.tg.errors == {}, vars.tg
             assert vars.tg.inputs == {}, vars.tg
+
+
+class TestTemplatesWatcher(object):
+    def setup_method(self):
+        conf = AppConfig(minimal=True)
+        conf.use_dotted_templatenames = True
+        conf.renderers.extend(['mako', 'jinja', 'kajiki'])
+        conf.package = FakePackage()
+        conf['templating.watch_templates'] = True
+        conf.make_wsgi_app()
+        self.watcher = tg.config['tg.templates_watcher']
+        self.finder = tg.config['tg.app_globals'].dotted_filename_finder
+
+    def teardown_method(self):
+        self.watcher.stop()
+
+    def _render(self, engine, template):
+        render = tg.config['render_functions'][engine]
+        return render('tests.test_stack.rendering.templates.' + template,
+                      {'app_globals': tg.config['tg.app_globals']})
+
+    def _changed(self, filename):
+        # Pretend the file was modified since the watcher checked it.
+        self.watcher._mtimes[filename] = 0
+        assert self.watcher.check() == [filename]
+
+    def test_watcher_disabled_by_default(self):
+        conf = AppConfig(minimal=True)
+        conf.make_wsgi_app()
+        assert tg.config['tg.templates_watcher'] is None
+
+    def test_watcher_requires_auto_reload(self):
+        conf = AppConfig(minimal=True)
+        conf['templating.watch_templates'] = True
+        conf['auto_reload_templates'] = False
+        conf.make_wsgi_app()
+        assert tg.config['tg.templates_watcher'] is None
+
+    def test_mako_templates(self):
+        filename = self.finder.get_dotted_filename(
+            'tests.test_stack.rendering.templates.mako_noop', '.mak')
+        mlookup = tg.config['render_functions']['mako'].dotted_loader
+        assert mlookup.auto_reload is False
+
+        self._render('mako', 'mako_noop')
+        assert filename in mlookup.template_cache
+        assert self.watcher.mtime(filename) is not None
+
+        self._changed(filename)
+        assert filename not in mlookup.template_cache
+
+    def test_jinja_templates(self):
+        filename = self.finder.get_dotted_filename(
+            'tests.test_stack.rendering.templates.jinja_noop', '.jinja')
+        env = tg.config['render_functions']['jinja'].jinja2_env
+
+        self._render('jinja', 'jinja_noop')
+        template = env.get_template('tests.test_stack.rendering.templates.jinja_noop')
+        assert template.is_up_to_date
+        assert self.watcher.mtime(filename) is not None
+
+        # Changes are detected through the modification time known by the watcher.
+        self.watcher._mtimes[filename] = 0
+        assert not template.is_up_to_date
+        assert env.get_template('tests.test_stack.rendering.templates.jinja_noop') is not template
+
+    def test_kajiki_templates(self):
+        filename = self.finder.get_dotted_filename(
+            'tests.test_stack.rendering.templates.index', '.xhtml')
+        loader = tg.config['render_functions']['kajiki'].loader
+
+        template = loader.load('tests.test_stack.rendering.templates.index')
+        assert loader.load('tests.test_stack.rendering.templates.index') is template
+
+        self._changed(filename)
+        assert 'tests.test_stack.rendering.templates.index' not in loader.modules
+        assert loader.load('tests.test_stack.rendering.templates.index') is not template
+
+    def test_dotted_filenames_are_invalidated(self):
+        filename = self.finder.get_dotted_filename(
+            'tests.test_stack.rendering.templates.mako_noop', '.mak')
+        self._render('mako', 'mako_noop')
+
+        cache = self.finder._DottedFileNameFinder__cache
+        assert cache['tests.test_stack.rendering.templates.mako_noop'] == filename
+        self._changed(filename)
+        assert 'tests.test_stack.rendering.templates.mako_noop' not in cache
+
+
+class TestTemplatesWarmup(object):
+    def setup_method(self):
+        milestones._reset_all()
+
+        class SubController(TGController):
+            @expose('jinja:tests.test_stack.rendering.templates.jinja_noop')
+            def index(self):
+                return {}
+
+        class RootController(TGController):
+            sub = SubController()
+
+            @expose('kajiki:tests.test_stack.rendering.templates.kajiki_i18n')
+            @expose('json')
+            def index(self):
+                return {}
+
+            @expose('mako:tests.test_stack.rendering.templates.mako_noop')
+            @expose('genshi:tests.test_stack.rendering.templates.genshi_doctype',
+                    custom_format='genshi')
+            def other(self):
+                return {}
+
+            @expose('kajiki:tests.test_stack.rendering.templates.missing')
+            def missing(self):
+                return {}
+
+        self.root_controller = RootController()
+
+    def teardown_method(self):
+        milestones._reset_all()
+
+    def _make_app(self, **options):
+        conf = AppConfig(minimal=True, root_controller=self.root_controller)
+        conf.use_dotted_templatenames = True
+        conf.renderers = ['kajiki', 'jinja', 'mako', 'genshi']
+        conf.package = FakePackage()
+        for key, value in options.items():
+            conf[key] = value
+        return conf.make_wsgi_app()
+
+    def test_warmup(self, caplog):
+        with caplog.at_level(logging.INFO, logger='tg.renderers.base'):
+            self._make_app(**{'templating.warmup': 'true'})
+
+        warmed_up = sorted(r.args[1] for r in caplog.records if r.msg.startswith('Warmed up'))
+        assert warmed_up == ['tests.test_stack.rendering.templates.genshi_doctype',
+                             'tests.test_stack.rendering.templates.jinja_noop',
+                             'tests.test_stack.rendering.templates.kajiki_i18n',
+                             'tests.test_stack.rendering.templates.mako_noop']
+        failed = [r.args[1] for r in caplog.records if r.msg.startswith('Failed')]
+        assert failed == ['tests.test_stack.rendering.templates.missing']
+
+    def test_warmup_workers(self):
+        self._make_app()
+        templates = warmup_templates(tg.config, [self.root_controller], workers=2)
+        assert ('mako', 'tests.test_stack.rendering.templates.mako_noop') in templates
+        assert ('jinja', 'tests.test_stack.rendering.templates.jinja_noop') not in templates
+
+        # Templates are now in the loaders caches.
+        render_mako = tg.config['render_functions']['mako']
+        template_name, loader = render_mako._resolve_template(
+            'tests.test_stack.rendering.templates.mako_noop'
+        )
+        assert template_name in loader.template_cache
+
+    def test_warmup_defers_watcher(self):
+        app = self._make_app(**{'templating.warmup': 'true',
+                                'auto_reload_templates': True,
+                                'templating.watch_templates': True})
+        watcher = tg.config['tg.templates_watcher']
+        assert watcher.mtime(os.path.join(os.path.dirname(__file__), 'test_stack',
+                                          'rendering', 'templates', 'mako_noop.mak'))
+        assert watcher._thread is None
+
+        try:
+            TestApp(app).get('/other')
+            assert watcher._thread is not None
+        finally:
+            watcher.stop()
+
+    def test_warmup_disabled(self, caplog):
+        with caplog.at_level(logging.INFO, logger='tg.renderers.base'):
+            self._make_app()
+        assert not [r for r in caplog.records if r.name == 'tg.renderers.base']
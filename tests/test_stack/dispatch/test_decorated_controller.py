@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
+import pytest
+from crank.util import flatten_arguments, get_params_with_argspec
+
 import tg
 from tests.test_stack import TestConfig, app_from_config
 from tg.configuration import milestones
+from tg.decorators import decoration
 from tg.decorators.decoration import Decoration
+from tg.util import Bunch
 
 
 class TestHooks(object):
@@ -155,3 +160,118 @@ class TestDecorators(object):
         resp = self.app.get('/onmaster_withlist?first=1')
         assert 'master' in resp
         assert 'first' not in resp
+
+
+class TestArgumentsBinder(object):
+    def _check_binder(self, func, params, remainder):
+        binder = Decoration.get_decoration(func).arguments_binder
+        remainder = binder.unquote_remainder(remainder)
+
+        expected = get_params_with_argspec(func, params, remainder)
+        assert binder.params_with_remainder(params, remainder) == expected
+
+        expected = flatten_arguments(func, params, remainder)
+        assert binder.flatten(func, params, remainder) == expected
+
+    def test_positional_and_defaults(self):
+        def action(self, a, b, c=3):
+            pass
+
+        self._check_binder(action, {}, ['1', '2'])
+        self._check_binder(action, {'b': 5}, ['1'])
+        self._check_binder(action, {'b': 5, 'extra': 1}, ['1', '2', '3', '4'])
+
+        binder = Decoration.get_decoration(action).arguments_binder
+        with pytest.raises(TypeError):
+            binder.flatten(action, {'c': 1}, ())
+
+    def test_varargs_and_kwargs(self):
+        def action(self, a, *args, **kw):
+            pass
+
+        self._check_binder(action, {}, ['1', '2', '3'])
+        self._check_binder(action, {'x': 1}, ['1', '2', '3'])
+        self._check_binder(action, {'a': 1, 'x': 1}, ())
+
+    def test_unquoted_remainder(self):
+        def action(self, *args):
+            pass
+
+        self._check_binder(action, {}, ['a%20b', 'c'])
+        binder = Decoration.get_decoration(action).arguments_binder
+        assert binder.unquote_remainder(['a%20b']) == ('a b',)
+        assert binder.unquote_remainder(None) == ()
+
+
+class TestContentNegotiation(object):
+    def setup_method(self):
+        milestones.renderers_ready._reset()
+        base_config = TestConfig(folder='dispatch',
+                                 values={'use_sqlalchemy': False,
+                                         'use_toscawidgets': False,
+                                         'use_toscawidgets2': False})
+        app_from_config(base_config)
+
+        def func(*args, **kw):
+            pass
+
+        self.deco = Decoration.get_decoration(func)
+        self.deco.register_template_engine('text/html', 'kajiki', 'index', [], {})
+        self.deco.register_template_engine('application/json', 'json', '', [], {})
+
+    def teardown_method(self):
+        milestones.renderers_ready._reset()
+
+    def _lookup(self, accept=None, response_type=None, content_type=None):
+        environ = {}
+        if accept is not None:
+            environ['HTTP_ACCEPT'] = accept
+        tgl = Bunch(request=Bunch(environ=environ, _response_type=response_type),
+                    response=Bunch(content_type=content_type))
+        return self.deco.lookup_template_engine(tgl)[0]
+
+    def test_negotiation_is_memoized(self):
+        assert self._lookup('application/json') == 'application/json'
+        assert self._lookup('text/html') == 'text/html'
+        assert self._lookup() == 'text/html'
+        assert len(self.deco._negotiated_content_types.data) == 3
+
+        assert self._lookup('application/json') == 'application/json'
+        assert self.deco._negotiated_content_types.hits == 1
+
+    def test_negotiation_memoizes_none(self, monkeypatch):
+        negotiations = []
+
+        class NoneAccept(object):
+            def acceptable_offers(self, offers):
+                negotiations.append(offers)
+                return [(None, 1)]
+
+        monkeypatch.setattr(decoration, 'create_accept_header',
+                            lambda accept: NoneAccept())
+        assert self.deco._negotiate_content_type('text/plain') is None
+        assert self.deco._negotiate_content_type('text/plain') is None
+        assert len(negotiations) == 1
+
+    def test_response_type_and_content_type(self):
+        assert self._lookup('text/html', response_type='application/json') == 'application/json'
+        assert self._lookup('application/json', content_type='text/html') == 'text/html'
+        assert self._lookup('image/png') == 'text/html'
+
+    def test_negotiation_invalidated_by_new_engines(self):
+        assert self._lookup('text/plain') == 'text/html'
+
+        self.deco.register_template_engine('text/plain', 'kajiki', 'plain', [], {})
+        assert self.deco._negotiated_content_types is None
+        assert self._lookup('text/plain') == 'text/plain'
+
+    def test_negotiation_invalidated_by_merge(self):
+        assert self._lookup('text/plain') == 'text/html'
+
+        def parent(*args, **kw):
+            pass
+        parent_deco = Decoration.get_decoration(parent)
+        parent_deco.register_template_engine('text/plain', 'kajiki', 'plain', [], {})
+
+        self.deco.merge(parent_deco)
+        assert self._lookup('text/plain') == 'text/plain'
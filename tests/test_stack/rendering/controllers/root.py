@@ -283,6 +283,52 @@ class RootController(TGController):
     def kajiki_index_dotted(self):
         return {}
 
+    @expose('kajiki:index.xhtml', render_params={'stream': True})
+    def kajiki_stream(self):
+        return {}
+
+    @expose('jinja:jinja_inherits.jinja', render_params={'stream': True})
+    def jinja_stream(self):
+        return {}
+
+    @expose('genshi:genshi_doctype.html', render_params={'stream': True})
+    def genshi_stream(self):
+        return {}
+
+    @expose('kajiki:index.xhtml', render_params={'stream': True})
+    def stream_cached(self):
+        return dict(tg_cache={'key': 'stream_cached', 'expire': 20})
+
+    @expose('jinja:jinja_inherits.jinja', render_params={'block': 'content'})
+    def jinja_block(self):
+        return {}
+
+    @expose('kajiki:tests.test_stack.rendering.templates.kajiki_blocks',
+            render_params={'block': 'content'})
+    def kajiki_block(self, page=1):
+        return dict(page=page)
+
+    @expose('kajiki:tests.test_stack.rendering.templates.kajiki_blocks',
+            render_params={'block': 'missing'})
+    def kajiki_missing_block(self):
+        return dict(page=1)
+
+    @expose('kajiki:tests.test_stack.rendering.templates.kajiki_blocks')
+    def kajiki_blocks(self, page=1):
+        return dict(page=page)
+
+    @expose('kajiki:tests.test_stack.rendering.templates.kajiki_blocks_extends')
+    def kajiki_blocks_extends(self, page=1):
+        return dict(page=page)
+
+    @expose('jinja:jinja_blocks_super.jinja')
+    def jinja_blocks_super(self, page=1):
+        return dict(page=page)
+
+    @expose('kajiki:tests.test_stack.rendering.templates.kajiki_blocks')
+    def kajiki_blocks_cached(self, page=1):
+        return dict(page=page, tg_cache={'key': 'kajiki_blocks', 'expire': 20})
+
     @expose('kajiki:tests.test_stack.rendering.templates.missing')
     def kajiki_missing_template(self):
         return {}
@@ -296,6 +342,11 @@ class RootController(TGController):
         i18n.set_request_lang("de")
         return {}
 
+    @expose('kajiki:tests.test_stack.rendering.templates.kajiki_i18n_extends')
+    def kajiki_i18n_extends_de(self):
+        i18n.set_request_lang("de")
+        return {}
+
     @expose('kajiki:tests.test_stack.rendering.templates.index')
     def index_dotted(self):
         return {}
@@ -424,6 +475,23 @@ class RootController(TGController):
         return dict(tg_cache={'key':'TEMPLATE_CACHE_TEST2',
                               'expire':'never'})
 
+    @expose('genshi:index.html')
+    def template_caching_inprocess(self, expire='never'):
+        from datetime import datetime
+        tmpl_context.now = datetime.utcnow
+        return dict(tg_cache={'key':'TEMPLATE_CACHE_INPROCESS',
+                              'type':'inprocess',
+                              'expire':expire})
+
+    @expose('genshi:index.html', render_params={'auto_cache': 'never'})
+    def template_auto_caching(self, page=1, unserializable=False):
+        from datetime import datetime
+        tmpl_context.now = datetime.utcnow
+        result = dict(page=int(page), day=datetime(2020, 1, 1))
+        if unserializable:
+            result['value'] = object()
+        return result
+
     @expose('json')
     def template_caching_options(self, **kwargs):
         _cache_options = {}
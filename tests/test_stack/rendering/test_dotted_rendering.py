@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-import sys
 import pytest
 
+import tg
 from tests.test_stack import TestConfig, app_from_config
 from tg import expose
 from tg.configuration import milestones
@@ -66,6 +67,43 @@ def test_kajiki_i18n_de():
     resp = app.get('/kajiki_i18n_de')
     assert str("Ihre Anwendung läuft jetzt einwandfrei") in resp
 
+def _pretranslate_kajiki(app_config):
+    app_config['templating.kajiki.pretranslate'] = True
+
+def test_kajiki_pretranslated():
+    app = setup_noDB(_pretranslate_kajiki)
+    resp = app.get('/kajiki_i18n_de')
+    assert str("Ihre Anwendung läuft jetzt einwandfrei") in resp
+
+    resp = app.get('/kajiki_i18n')
+    assert str("Your application is now running") in resp
+
+    loader = tg.config['render_functions']['kajiki'].loader
+    template = loader.load('tests.test_stack.rendering.templates.kajiki_i18n')
+    variants = loader._translated[template]
+    variant = variants.get(('de', ))
+    assert variant is not None and variant is not template
+    main_consts = dict(variant.__methods__)['__main__']._func.__code__.co_consts
+    assert str("Ihre Anwendung läuft jetzt einwandfrei") in main_consts
+
+    # A variant is compiled only once per language
+    app.get('/kajiki_i18n_de')
+    assert loader._translated[template] is variants
+
+def test_kajiki_pretranslated_extends():
+    expected = setup_noDB().get('/kajiki_i18n_extends_de').text
+
+    app = setup_noDB(_pretranslate_kajiki)
+    resp = app.get('/kajiki_i18n_extends_de')
+    assert resp.text.count(str("Ihre Anwendung läuft jetzt einwandfrei")) == 2, resp
+    assert resp.text == expected
+
+    loader = tg.config['render_functions']['kajiki'].loader
+    layout = loader.load('tests.test_stack.rendering.templates.kajiki_i18n_layout')
+    variant = loader._translated[layout].get(('de', ))
+    for name, method in variant.__methods__:
+        assert method._func.__code__.co_filename == layout.filename
+
 def test_kajiki_missing_template():
     app = setup_noDB()
 
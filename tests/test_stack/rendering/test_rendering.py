@@ -9,6 +9,7 @@ import pytest
 import tg
 from tests.test_stack import TestConfig, app_from_config
 from tg import expose
+from tg.render import MissingTemplateBlockError
 from tg.configuration import milestones
 from tg.renderers.genshi import GenshiRenderer
 from tg.support.hooks import _TGGlobalHooksNamespace
@@ -646,6 +647,105 @@ def test_index_dotted_with_forced_extension():
     assert 'Welcome to TurboGears' in kresp
     assert 'NOW: IT WORKS' not in kresp
 
+@pytest.mark.parametrize('streamed, rendered', [('/kajiki_stream', '/'),
+                                               ('/jinja_stream', '/jinja_inherits'),
+                                               ('/genshi_stream', '/auto_doctype')])
+def test_streamed_rendering(streamed, rendered):
+    app = setup_noDB()
+    resp = app.get(streamed)
+    assert resp.text == app.get(rendered).text
+    assert resp.content_type == 'text/html'
+    assert resp.charset == 'utf-8'
+    assert resp.response.content_length is None
+    assert not isinstance(resp.response.app_iter, (list, tuple))
+    assert 'tg.locals' in resp.request.environ
+
+def test_streamed_rendering_chunks():
+    from tg.render import _STREAM_BUFFER_SIZE, _encode_stream
+
+    chunks = list(_encode_stream(['a' * (_STREAM_BUFFER_SIZE - 1), 'b', 'c', 'à'], 'utf-8'))
+    assert chunks == [('a' * (_STREAM_BUFFER_SIZE - 1) + 'b').encode('utf-8'), 'cà'.encode('utf-8')]
+
+def test_streamed_rendering_cached():
+    app = setup_noDB()
+    resp = app.get('/stream_cached')
+    assert 'Welcome' in resp
+    assert isinstance(resp.response.app_iter, list)
+
+@pytest.mark.parametrize('url, content', [
+    ('/jinja_block', 'Welcome on my awsome homepage'),
+    ('/kajiki_block?page=3', '<p>Page 3</p>'),
+])
+def test_render_block(url, content):
+    app = setup_noDB()
+    resp = app.get(url)
+    assert resp.text.strip().startswith('<'), resp
+    assert content in resp, resp
+    assert 'Copyright' not in resp
+    assert 'Footer' not in resp
+    assert '<body>' not in resp
+
+def test_render_block_header():
+    app = setup_noDB(extra={'templating.block_header': 'HX-Target'})
+    resp = app.get('/kajiki_blocks', params={'page': 2})
+    assert '<body>' in resp
+    assert 'Footer of page 2' in resp
+    assert 'HX-Target' in resp.headers['Vary']
+
+    resp = app.get('/kajiki_blocks', params={'page': 2}, headers={'HX-Target': 'footer'})
+    assert resp.text == '<p>Footer of page 2</p>'
+    assert 'HX-Target' in resp.headers['Vary']
+
+    # Blocks requested by render_params win over the header
+    resp = app.get('/kajiki_block', params={'page': 2}, headers={'HX-Target': 'footer'})
+    assert resp.text == '<p>Page 2</p>'
+
+    # Unknown blocks requested by the client get the whole page
+    resp = app.get('/kajiki_blocks', params={'page': 2}, headers={'HX-Target': 'missing'})
+    assert '<body>' in resp
+    assert 'Footer of page 2' in resp
+
+def test_render_missing_block():
+    app = setup_noDB()
+    with pytest.raises(MissingTemplateBlockError) as exc:
+        app.get('/kajiki_missing_block')
+    assert str(exc.value) == ('Template tests.test_stack.rendering.templates.kajiki_blocks '
+                              'has no block missing')
+    assert isinstance(exc.value, KeyError)
+
+@pytest.mark.parametrize('url, block, content', [
+    ('/jinja_blocks_super', 'footer', '<p>Page 2</p>\n    &copy; Copyright 2006 by'),
+    ('/jinja_blocks_super', 'content', ''),
+    ('/kajiki_blocks_extends', 'content', '<p>Extended</p><p>Page 2</p>'),
+    ('/kajiki_blocks_extends', 'footer', '<p>Footer of page 2</p>'),
+])
+def test_render_block_extends(url, block, content):
+    app = setup_noDB(extra={'templating.block_header': 'HX-Target'})
+    resp = app.get(url, params={'page': 2}, headers={'HX-Target': block})
+    assert resp.text.strip().startswith(content), resp.text
+    assert '<body>' not in resp
+
+def test_render_block_header_disabled():
+    app = setup_noDB()
+    resp = app.get('/kajiki_blocks', headers={'HX-Target': 'footer'})
+    assert '<body>' in resp
+    assert 'Vary' not in resp.headers
+
+def test_render_block_cached():
+    app = setup_noDB(extra={'templating.block_header': 'HX-Target',
+                            'templating.fragment_cache': 'inprocess'})
+    resp = app.get('/kajiki_blocks_cached', params={'page': 1})
+    assert '<body>' in resp
+
+    resp = app.get('/kajiki_blocks_cached', params={'page': 2}, headers={'HX-Target': 'footer'})
+    assert resp.text == '<p>Footer of page 2</p>'
+
+    resp = app.get('/kajiki_blocks_cached', params={'page': 3}, headers={'HX-Target': 'footer'})
+    assert resp.text == '<p>Footer of page 2</p>'
+
+    resp = app.get('/kajiki_blocks_cached', params={'page': 3})
+    assert 'Page 1' in resp
+
 def test_render_hooks():
     old_hooks, tg.hooks = tg.hooks, _TGGlobalHooksNamespace()
 
@@ -731,6 +831,72 @@ class TestTemplateCaching(object):
         resp = json.loads(resp.text)
         assert resp['cls'] == 'NoImplementation', resp
 
+    def test_inprocess_type(self):
+        fragment_cache = tg.config['tg.fragment_cache']
+        resp = self.app.get('/template_caching_inprocess')
+        current_date = resp.text.split('NOW:')[1].split('\n')[0].strip()
+
+        resp = self.app.get('/template_caching_inprocess')
+        assert current_date in resp, (current_date, resp.body)
+
+        stats = fragment_cache.stats()
+        assert stats['entries'] == 1
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['size'] == 1000
+        assert stats['memory'] > len(current_date)
+
+    def test_inprocess_expiration(self):
+        fragment_cache = tg.config['tg.fragment_cache']
+        fragment_cache.get_value('ns', 'key', lambda: 'VALUE', expiretime=-1)
+        assert fragment_cache.get_value('ns', 'key', lambda: 'NEW', expiretime=60) == 'NEW'
+        assert fragment_cache.get_value('ns', 'key', lambda: 'OTHER') == 'NEW'
+        assert len(fragment_cache) == 1
+
+    def test_inprocess_without_beaker(self):
+        base_config = TestConfig(folder='rendering', values={
+            'use_sqlalchemy': False,
+            'use_legacy_renderer': False,
+            'use_dotted_templatenames': False,
+            'use_toscawidgets': False,
+            'use_toscawidgets2': False,
+            'cache.enabled': False,
+        })
+        app = app_from_config(base_config)
+        resp = app.get('/template_caching_default_type')
+        current_date = resp.text.split('NOW:')[1].split('\n')[0].strip()
+
+        resp = app.get('/template_caching_default_type')
+        assert current_date in resp, (current_date, resp.body)
+        assert tg.config['tg.fragment_cache'].stats()['hits'] == 1
+
+    def test_auto_cache(self):
+        from tg.render import auto_cache_stats
+
+        def _now(resp):
+            return resp.text.split('NOW:')[1].split('\n')[0].strip()
+
+        stats = auto_cache_stats()
+        first_page = _now(self.app.get('/template_auto_caching', params={'page': 1}))
+        assert first_page == _now(self.app.get('/template_auto_caching', params={'page': 1}))
+        assert first_page != _now(self.app.get('/template_auto_caching', params={'page': 2}))
+
+        resp = self.app.get('/template_auto_caching', params={'unserializable': 1})
+        assert _now(resp) != first_page
+
+        new_stats = auto_cache_stats()
+        assert new_stats['cached'] - stats['cached'] == 3
+        assert new_stats['skipped'] - stats['skipped'] == 1
+
+    def test_unsupported_fragment_cache(self):
+        from tg.configuration.utils import TGConfigError
+        base_config = TestConfig(folder='rendering', values={
+            'use_sqlalchemy': False,
+            'templating.fragment_cache': 'redis',
+        })
+        with pytest.raises(TGConfigError):
+            app_from_config(base_config)
+
 
 class TestJSONRendering(object):
     def setup_method(self):
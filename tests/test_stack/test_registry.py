@@ -410,3 +410,85 @@ def test_stacked_object_twice():
         # Looping again will crash because we already popped
         # The registered object and cleanup will fail.
         pass
+
+
+def test_contextvars_backend():
+    so = StackedObjectProxy(name='cvobj')
+    so._set_backend('contextvars')
+    assert not so._object_stack()
+
+    so._push_object({'hi': 'people'})
+    assert so['hi'] == 'people'
+    assert len(so._object_stack()) == 1
+
+    so._preserve_object()
+    assert so._is_preserved
+
+    so._pop_object()
+    assert not so._object_stack()
+    with pytest.raises(TypeError):
+        so._current_obj()
+
+
+def test_contextvars_backend_isolates_tasks():
+    so = StackedObjectProxy(name='cvtasks')
+    so._set_backend('contextvars')
+
+    async def task(value):
+        so._push_object(value)
+        await asyncio.sleep(0)
+        try:
+            return so._current_obj()
+        finally:
+            so._pop_object(value)
+
+    async def main():
+        return await asyncio.gather(task('a'), task('b'), task('c'))
+
+    assert asyncio.run(main()) == ['a', 'b', 'c']
+    assert not so._object_stack()
+
+
+def test_contextvars_backend_copied_context():
+    import contextvars
+
+    so = StackedObjectProxy(name='cvcopied')
+    so._set_backend('contextvars')
+    so._push_object('outer')
+    try:
+        ctx = contextvars.copy_context()
+
+        def in_copy():
+            assert so._current_obj() == 'outer'
+            so._push_object('inner')
+            return so._current_obj()
+
+        assert ctx.run(in_copy) == 'inner'
+        assert so._current_obj() == 'outer'
+    finally:
+        so._pop_object('outer')
+
+
+def test_switch_backend_moves_objects():
+    so = StackedObjectProxy(name='switched')
+    so._push_object('value')
+
+    so._set_backend('contextvars')
+    assert so._current_obj() == 'value'
+
+    so._set_backend('threadlocal')
+    assert so._current_obj() == 'value'
+    so._pop_object('value')
+
+    with pytest.raises(ValueError):
+        so._set_backend('greenlets')
+
+
+def test_dispatch_config_contextvars():
+    conf = DispatchingConfig()
+    conf._set_backend('contextvars')
+    conf.push_process_config({'key': 'default'})
+    conf.push_thread_config({'key': 'value'})
+    assert conf['key'] == 'value'
+    conf.pop_thread_config()
+    assert conf['key'] == 'default'
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import json
+from mimetypes import MimeTypes
 from wsgiref.validate import validator
 
 import pytest
 from webob import Request, Response
+from webtest import TestApp
 
 from tests.test_validation import IntValidator
 
@@ -33,10 +37,15 @@ from tests.base import (
     setup_session_dir,
     teardown_session_dir,
 )
-from tg import config, tmpl_context
-from tg.controllers import TGController, WSGIAppController
+from tg import MinimalApplicationConfigurator, config, milestones, tmpl_context
+from tg.controllers import TGController, WSGIAppController, dispatcher
 from tg.decorators import expose, validate
-from tg.util import no_warn
+from tg.predicates import not_anonymous
+from tg.support.controllers_index import ControllersIndex
+from tg.support.dispatch_options import DispatchOptions
+from tg.util import Bunch, no_warn
+from tg.util.webtest import test_context
+from tg.wsgiapp import TGApp
 
 config['renderers'] = ['genshi', 'mako', 'json']
 
@@ -510,6 +519,12 @@ class BasicTGController(TGController):
     def with_routing_args(self, **kw):
         return str(tg.request.dispatch_state.routing_args)
 
+    @expose('json')
+    @validate(validators=dict(value=IntValidator))
+    async def async_action(self, value=1):
+        await asyncio.sleep(0)
+        return dict(value=value + 1, path=tg.request.path)
+
     @expose('json')
     def get_response_type(self):
         return dict(ctype=tg.request.response_type)
@@ -613,6 +628,14 @@ class TestTGController(TestWSGIController):
         assert 'b' in str(r)
         assert 'c' in str(r)
 
+    def test_async_action(self):
+        r = self.app.get('/async_action', params={'value': '3'})
+        assert json.loads(r.text) == {'value': 4, 'path': '/async_action'}
+
+        # Event loop of the thread is reused by following requests
+        r = self.app.get('/async_action')
+        assert json.loads(r.text) == {'value': 2, 'path': '/async_action'}
+
     def test_unexpected_arguments_are_discarded(self):
         r = self.app.get('/hello/YourName/silly?unexpected=1&more=1')
         assert 'Hello YourName' in r, r
@@ -926,3 +949,364 @@ class TestNestedWSGIAppWithoutSeekable(TestWSGIController):
     def test_missing_body_seekable_trapped(self):
         with pytest.raises(RuntimeError):
             self.app.get('/mounted_app')
+
+
+class TestDispatchCache(object):
+    def setup_method(self):
+        milestones._reset_all()
+        visits = self.visits = []
+
+        class SubController(TGController):
+            def _visit(self, *args, **kw):
+                visits.append(args)
+
+            @expose()
+            def index(self):
+                return 'SUBINDEX'
+
+            @expose()
+            def view(self, uid):
+                return 'VIEW %s' % uid
+
+        class SecureController(TGController):
+            allow_only = not_anonymous()
+
+            @expose()
+            def index(self):
+                return 'SECURE'
+
+        class LookupController(TGController):
+            @expose()
+            def _lookup(self, *args):
+                return SubController(), args
+
+        class RootController(TGController):
+            sub = SubController()
+            secure = SecureController()
+            looked = LookupController()
+
+            @expose()
+            def index(self):
+                return 'INDEX'
+
+        self.tgapp = None
+
+        def save_app(app):
+            self.tgapp = app
+            return app
+
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController(),
+                              'enable_dispatch_cache': True})
+        self.app = TestApp(cfg.make_wsgi_app({}, {}, wrap_app=save_app))
+        self.cache = self.tgapp.config['tg.dispatch_cache']
+
+    def teardown_method(self):
+        milestones._reset_all()
+
+    def test_disabled_by_default(self):
+        cfg = MinimalApplicationConfigurator()
+        conf = cfg.configure({}, {})
+        cfg.setup(conf)
+        assert conf['tg.dispatch_cache'] is None
+
+    def test_cache_hit(self):
+        assert self.app.get('/sub/index.html').text == 'SUBINDEX'
+        assert self.cache.hits == 0
+        assert self.app.get('/sub/index.json').text == 'SUBINDEX'
+        assert self.cache.hits == 1
+        assert self.visits == [('index',), ('index',)]
+
+    def test_cache_with_remainder(self):
+        assert self.app.get('/sub/view/1').text == 'VIEW 1'
+        assert self.app.get('/sub/view/1').text == 'VIEW 1'
+        assert self.cache.hits == 1
+
+    def test_cache_hit_with_parameters(self):
+        assert self.app.get('/sub/view?uid=1').text == 'VIEW 1'
+        assert self.app.get('/sub/view?uid=2').text == 'VIEW 2'
+        assert self.cache.hits == 1
+
+        # Missing arguments lead to a full dispatch.
+        self.app.get('/sub/view', status=404)
+
+    def test_cache_hit_checks_security(self):
+        credentials = {'repoze.what.userid': 'someone'}
+        environ = {'repoze.what.credentials': credentials}
+        assert self.app.get('/secure', extra_environ=environ).text == 'SECURE'
+        assert self.app.get('/secure', extra_environ=environ).text == 'SECURE'
+        assert self.cache.hits == 1
+
+        self.app.get('/secure', status=401)
+        assert self.cache.hits == 2
+
+    def test_lookup_not_cached(self):
+        assert self.app.get('/looked/index').text == 'SUBINDEX'
+        assert self.app.get('/looked/index').text == 'SUBINDEX'
+        assert self.cache.hits == 0
+        assert self.cache.get('looked/index') is None
+
+
+class TestNotFoundCache(object):
+    def setup_method(self):
+        milestones._reset_all()
+
+        class SubController(TGController):
+            @expose()
+            def index(self):
+                return 'SUBINDEX'
+
+            @expose()
+            def view(self, uid):
+                return 'VIEW %s' % uid
+
+        class SecureController(TGController):
+            allow_only = not_anonymous()
+
+        class RootController(TGController):
+            sub = SubController()
+            secure = SecureController()
+
+            @expose()
+            def wp_login_php(self, *args):
+                return 'WPLOGIN'
+
+            @expose()
+            def index(self):
+                return 'INDEX'
+
+        self.tgapp = None
+
+        def save_app(app):
+            self.tgapp = app
+            return app
+
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController(),
+                              'enable_notfound_cache': True})
+        self.app = TestApp(cfg.make_wsgi_app({}, {}, wrap_app=save_app))
+        self.cache = self.tgapp.notfound_cache
+
+    def teardown_method(self):
+        milestones._reset_all()
+
+    def test_disabled_by_default(self):
+        cfg = MinimalApplicationConfigurator()
+        conf = cfg.configure({}, {})
+        cfg.setup(conf)
+        assert conf['tg.notfound_cache'] is None
+
+    def test_prefix_cached(self):
+        self.app.get('/wp-admin/setup.php', status=404)
+        assert len(self.cache) == 1
+        assert (self.cache.hits, self.cache.misses) == (0, 1)
+
+        resp = self.app.get('/wp-admin/other', status=404)
+        assert 'The resource could not be found' in resp.text
+        resp = self.app.get('/wp-admin', status=404)
+        assert (self.cache.hits, self.cache.misses) == (2, 1)
+
+        assert self.app.get('/sub').text == 'SUBINDEX'
+        assert (self.cache.hits, self.cache.misses) == (2, 2)
+
+    def test_nested_prefix_cached(self):
+        self.app.get('/sub/missing/path', status=404)
+        self.app.get('/sub/missing', status=404)
+        assert self.cache.hits == 1
+        assert self.app.get('/sub/view/5').text == 'VIEW 5'
+
+    def test_extension_cached_exactly(self):
+        self.app.get('/wp-login.php', status=404)
+        self.app.get('/wp-login.php', status=404)
+        assert self.cache.hits == 1
+
+        # Without extension stripping the piece resolves to something else.
+        assert self.app.get('/wp-login.php/more').text == 'WPLOGIN'
+
+    def test_parameters_dependent_not_cached(self):
+        self.app.get('/sub/view', status=404)
+        assert len(self.cache) == 0
+        assert self.app.get('/sub/view?uid=1').text == 'VIEW 1'
+
+    def test_secured_not_cached(self):
+        self.app.get('/secure/missing', status=401)
+        assert len(self.cache) == 0
+
+    def test_invalidated_on_new_app(self):
+        self.app.get('/wp-admin', status=404)
+        assert len(self.cache) == 1
+
+        TGApp(self.tgapp.config)
+        assert len(self.cache) == 0
+        assert self.cache.hits == 0
+
+
+class TestControllersIndex(object):
+    def setup_method(self):
+        milestones._reset_all()
+
+    def teardown_method(self):
+        milestones._reset_all()
+
+    def test_index_mount_points(self):
+        class NestedController(TGController):
+            pass
+
+        class SubController(TGController):
+            nested = NestedController()
+
+        class RootController(TGController):
+            sub = SubController()
+            alias = sub
+
+        root = RootController()
+        index = ControllersIndex()
+        assert index.built is False
+
+        index.build(root)
+        assert index.built is True
+        # Attributes are visited in dir() order, the first path wins.
+        assert index.mount_point(root.sub) == '/alias'
+        assert index.mount_point(root.sub.nested) == '/alias/nested'
+        assert index.mount_steps(root.sub.nested) == [('/', root), ('alias', root.sub),
+                                                     ('nested', root.sub.nested)]
+        assert index.mount_point(NestedController()) == ''
+        assert index.mount_steps(root) == []
+        assert index.children(root) == {'sub': root.sub, 'alias': root.sub}
+        assert index.children(root.sub) == {'nested': root.sub.nested}
+        assert index.controllers() == [root, root.sub, root.sub.nested]
+
+    def test_index_skips_properties(self):
+        class SubController(TGController):
+            pass
+
+        class RootController(TGController):
+            sub = SubController()
+
+            @property
+            def broken(self):
+                raise RuntimeError('Properties must not be evaluated')
+
+            @property
+            def dynamic(self):
+                return SubController()
+
+        root = RootController()
+        root.instance_sub = SubController()
+        index = ControllersIndex()
+        index.build(root)
+        assert index.children(root) == {'sub': root.sub, 'instance_sub': root.instance_sub}
+        assert index.mount_point(root.instance_sub) == '/instance_sub'
+        assert index.mount_point(root.dynamic) == ''
+
+    def test_mount_steps_of_properties(self):
+        class SubController(TGController):
+            pass
+
+        class RootController(TGController):
+            _sub = SubController()
+
+            @property
+            def dynamic(self):
+                return self._sub
+
+        root = RootController()
+        index = ControllersIndex()
+        index.build(root)
+        with test_context(None):
+            tg.config['tg.root_controller'] = root
+            tg.config['tg.controllers_index'] = index
+            # Not indexed, but still found searching the tree.
+            assert index.mount_point(root._sub) == ''
+            assert root._sub.mount_point == '/dynamic'
+
+    def test_mount_steps_without_index(self):
+        class SubController(TGController):
+            pass
+
+        class RootController(TGController):
+            sub = SubController()
+            other = SubController()
+
+        root = RootController()
+        with test_context(None):
+            tg.config['tg.root_controller'] = root
+            tg.config['tg.controllers_index'] = None
+            assert root.sub.mount_steps == [('/', root), ('sub', root.sub)]
+            assert root.sub.mount_point == '/sub'
+
+            # The index built for the tree is reused by other controllers.
+            fallback_index = dispatcher._fallback_indexes[root]
+            assert root.other.mount_point == '/other'
+            assert dispatcher._fallback_indexes[root] is fallback_index
+
+    def test_index_built_by_app(self):
+        class SubController(TGController):
+            @expose()
+            def index(self):
+                return self.mount_point
+
+        class RootController(TGController):
+            sub = SubController()
+
+        tgapp = Bunch(app=None)
+
+        def save_app(app):
+            tgapp.app = app
+            return app
+
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController()})
+        app = TestApp(cfg.make_wsgi_app({}, {}, wrap_app=save_app))
+        assert tgapp.app.controllers_index.built is True
+        assert app.get('/sub').text == '/sub'
+
+
+class TestDispatchOptions(object):
+    def setup_method(self):
+        milestones._reset_all()
+
+    def teardown_method(self):
+        milestones._reset_all()
+
+    def _make_app(self, **options):
+        class RootController(TGController):
+            @expose()
+            def index(self):
+                return str(tg.request.response_type)
+
+        cfg = MinimalApplicationConfigurator()
+        cfg.update_blueprint({'root_controller': RootController()})
+        cfg.update_blueprint(options)
+        return TestApp(cfg.make_wsgi_app({}, {}))
+
+    def test_options_resolved_once(self):
+        app = self._make_app(ignore_parameters=['_'],
+                             mimetype_lookup={'.custom': 'text/x-custom'})
+
+        options = config['tg.dispatch_options']
+        assert options.enable_request_extensions is True
+        assert options.ignore_parameters == ('_', )
+        assert options.extensions_mimetypes['.json'] == 'application/json'
+        assert options.extensions_mimetypes['.custom'] == 'text/x-custom'
+
+        with pytest.raises(AttributeError):
+            options.enable_request_extensions = False
+
+        assert app.get('/index.json').text == 'application/json'
+        assert app.get('/index.custom').text == 'text/x-custom'
+        assert app.get('/index.CUSTOM').text == 'text/x-custom'
+        assert app.get('/index', params={'_': 1}).text == 'None'
+
+    def test_request_extensions_disabled(self):
+        app = self._make_app(disable_request_extensions=True)
+
+        assert config['tg.dispatch_options'].enable_request_extensions is False
+        app.get('/index.json', status=404)
+
+    def test_options_matches_mimetypes(self):
+        mimetypes = MimeTypes()
+        options = DispatchOptions({'mimetypes': mimetypes})
+
+        for ext in ('.html', '.json', '.tgz', '.gz', '.HTML', '.unknown'):
+            assert options.mimetype_for_extension(ext) == mimetypes.guess_type('file' + ext)[0]
@@ -0,0 +1,102 @@
+import os
+import time
+
+from tg.support import watcher as watcher_module
+from tg.support.watcher import FilesWatcher
+
+
+class TestFilesWatcher(object):
+    def setup_method(self):
+        self.watcher = FilesWatcher(interval=0.01, name='tg-test-watcher')
+
+    def teardown_method(self):
+        self.watcher.stop()
+
+    def _touch(self, path):
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_watch_returns_mtime(self, tmp_path):
+        path = tmp_path / 'template.html'
+        path.write_text('TEMPLATE')
+
+        assert self.watcher.watch(str(path)) == os.stat(str(path)).st_mtime
+        assert self.watcher.mtime(str(path)) == os.stat(str(path)).st_mtime
+        assert self.watcher.watch(str(tmp_path / 'missing.html')) is None
+        assert self.watcher.mtime('unwatched.html') is None
+
+    def test_check_notifies_changes(self, tmp_path):
+        path = tmp_path / 'template.html'
+        path.write_text('TEMPLATE')
+        filename = str(path)
+
+        changes = []
+        self.watcher.subscribe(lambda f: changes.append(('listener', f)))
+        self.watcher.watch(filename, changes.append)
+        self.watcher.watch(filename, changes.append)
+        assert self.watcher.check() == []
+
+        self._touch(filename)
+        assert self.watcher.check() == [filename]
+        assert changes == [('listener', filename), filename]
+        assert self.watcher.mtime(filename) == os.stat(filename).st_mtime
+
+        path.unlink()
+        assert self.watcher.check() == [filename]
+        assert self.watcher.mtime(filename) is None
+
+    def test_callback_errors_are_trapped(self, tmp_path):
+        path = tmp_path / 'template.html'
+        path.write_text('TEMPLATE')
+
+        def fail(filename):
+            raise ValueError('FAIL')
+
+        changes = []
+        self.watcher.watch(str(path), fail)
+        self.watcher.subscribe(changes.append)
+        self._touch(str(path))
+        assert self.watcher.check() == [str(path)]
+        assert changes == [str(path)]
+
+    def test_background_thread(self, tmp_path):
+        path = tmp_path / 'template.html'
+        path.write_text('TEMPLATE')
+
+        changes = []
+        self.watcher.watch(str(path), changes.append)
+        assert self.watcher._thread.name == 'tg-test-watcher'
+        assert self.watcher._thread.daemon
+
+        self._touch(str(path))
+        deadline = time.time() + 5
+        while not changes and time.time() < deadline:
+            time.sleep(0.01)
+        assert changes == [str(path)]
+
+        self.watcher.stop()
+        assert self.watcher._thread is None
+
+    def test_stopped_at_exit(self, tmp_path):
+        self.watcher.watch(str(tmp_path / 'template.html'))
+        thread = self.watcher._thread
+        assert self.watcher in watcher_module._running_watchers
+
+        watcher_module._stop_running_watchers()
+        assert self.watcher._thread is None
+        assert not thread.is_alive()
+        assert self.watcher not in watcher_module._running_watchers
+
+    def test_restarted_after_fork(self, tmp_path):
+        stopped = FilesWatcher(interval=0.01)
+        self.watcher.watch(str(tmp_path / 'template.html'))
+        thread = self.watcher._thread
+
+        # Simulates the child process, where the thread doesn't exist anymore.
+        self.watcher._stopped.set()
+        thread.join()
+        watcher_module._restart_running_watchers()
+
+        assert self.watcher._thread is not thread
+        assert self.watcher._thread.is_alive()
+        assert stopped._thread is None
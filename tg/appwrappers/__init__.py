@@ -1,3 +1,3 @@
-from .base import ApplicationWrapper
+from .base import ApplicationWrapper, PhasedApplicationWrapper
 
-__all__ = ("ApplicationWrapper",)
+__all__ = ("ApplicationWrapper", "PhasedApplicationWrapper")
@@ -69,3 +69,47 @@ class ApplicationWrapper(metaclass=ABCMeta):
 
         """
         raise NotImplementedError
+
+
+class PhasedApplicationWrapper(ApplicationWrapper):
+    """Application Wrapper split in a ``before`` and an ``after`` phase.
+
+    Phased wrappers don't need to call the next handler themselves, so
+    when ``application_wrappers_pipeline`` option is enabled :class:`.TGApp`
+    runs all the consecutive phased wrappers from a flat list instead
+    of nesting a call for each one of them.
+    Subclasses that implement ``__call__`` are always nested like
+    any other :class:`ApplicationWrapper`.
+
+    A simple logging wrapper might look like::
+
+        class LogAppWrapper(PhasedApplicationWrapper):
+            def before(self, context):
+                print 'Going to run %s' % context.request.path
+
+            def after(self, context, response):
+                print 'Done with %s' % context.request.path
+                return response
+
+    """
+
+    def before(self, context):
+        """Runs before the next handler.
+
+        Returning a :class:`tg.request_local.Response` skips the next
+        handlers, which are not called, and the ``after`` phase
+        of this wrapper.
+        """
+        return None
+
+    def after(self, context, response):
+        """Runs after the next handler, must return the response."""
+        return response
+
+    def __call__(self, controller, environ, context):
+        response = self.before(context)
+        if response is None:
+            response = self.after(
+                context, self.next_handler(controller, environ, context)
+            )
+        return response
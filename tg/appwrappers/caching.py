@@ -1,7 +1,7 @@
 import logging
 
 from ..support.converters import asbool
-from .base import ApplicationWrapper
+from .base import PhasedApplicationWrapper
 
 try:
     from beaker.cache import CacheManager
@@ -12,7 +12,7 @@ except ImportError:  # pragma: no cover
 log = logging.getLogger(__name__)
 
 
-class CacheApplicationWrapper(ApplicationWrapper):
+class CacheApplicationWrapper(PhasedApplicationWrapper):
     """Provides Caching Support.
 
     The Cache Application Wrapper will make a CacheManager instance available
@@ -47,10 +47,9 @@ class CacheApplicationWrapper(ApplicationWrapper):
     def injected(self):
         return self.enabled
 
-    def __call__(self, controller, environ, context):
+    def before(self, context):
+        environ = context.request.environ
         environ["beaker.cache"] = context.cache = self.cache_manager
 
         if "paste.testing_variables" in environ:
             environ["paste.testing_variables"]["cache"] = context.cache
-
-        return self.next_handler(controller, environ, context)
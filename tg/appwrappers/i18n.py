@@ -3,12 +3,12 @@ import logging
 from ..configuration.utils import coerce_config
 from ..i18n import sanitize_language_code, set_request_lang
 from ..support.converters import asbool
-from .base import ApplicationWrapper
+from .base import PhasedApplicationWrapper
 
 log = logging.getLogger(__name__)
 
 
-class I18NApplicationWrapper(ApplicationWrapper):
+class I18NApplicationWrapper(PhasedApplicationWrapper):
     """Provides Language detection from request and session.
 
     The session language(s) take priority over the request languages.
@@ -55,7 +55,7 @@ class I18NApplicationWrapper(ApplicationWrapper):
     def injected(self):
         return self.enabled
 
-    def __call__(self, controller, environ, context):
+    def before(self, context):
         session_ = context.session
         if session_:
             session_existed = session_.accessed()
@@ -74,5 +74,3 @@ class I18NApplicationWrapper(ApplicationWrapper):
 
         languages.extend(map(sanitize_language_code, context.request.languages))
         set_request_lang(languages, tgl=context)
-
-        return self.next_handler(controller, environ, context)
@@ -2,12 +2,12 @@ import logging
 
 from ..configuration.utils import coerce_config
 from ..support.converters import asbool
-from .base import ApplicationWrapper
+from .base import PhasedApplicationWrapper
 
 log = logging.getLogger(__name__)
 
 
-class IdentityApplicationWrapper(ApplicationWrapper):
+class IdentityApplicationWrapper(PhasedApplicationWrapper):
     """Provides user identity when authentication is enabled.
 
     The repoze.who provided identity takes precedence over the identity
@@ -43,11 +43,12 @@ class IdentityApplicationWrapper(ApplicationWrapper):
     def injected(self):
         return self.enabled
 
-    def __call__(self, controller, environ, context):
+    def before(self, context):
+        environ = context.request.environ
         identity = environ.get("repoze.who.identity")
         if identity is None:
             context.request.identity = None
-            return self.next_handler(controller, environ, context)
+            return
 
         req_identity = {}
 
@@ -82,8 +83,6 @@ class IdentityApplicationWrapper(ApplicationWrapper):
         environ["repoze.who.identity"] = req_identity
         environ["repoze.what.credentials"] = req_identity
 
-        return self.next_handler(controller, environ, context)
-
 
 class Identity(dict):
     """dict subclass: prevent members from being rendered during print.
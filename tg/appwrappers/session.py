@@ -1,7 +1,7 @@
 import logging
 
 from ..support.converters import asbool
-from .base import ApplicationWrapper
+from .base import PhasedApplicationWrapper
 
 try:
     from beaker.session import Session, SessionObject
@@ -12,7 +12,7 @@ except ImportError:  # pragma: no cover
 log = logging.getLogger(__name__)
 
 
-class SessionApplicationWrapper(ApplicationWrapper):
+class SessionApplicationWrapper(PhasedApplicationWrapper):
     """Provides the Session Support
 
     The Session Application Wrapper will make a lazy session instance
@@ -63,7 +63,8 @@ class SessionApplicationWrapper(ApplicationWrapper):
     def injected(self):
         return self.enabled
 
-    def __call__(self, controller, environ, context):
+    def before(self, context):
+        environ = context.request.environ
         context.session = session = SessionObject(environ, **self.options)
         environ["beaker.session"] = session
         environ["beaker.get_session"] = self._get_session
@@ -71,8 +72,8 @@ class SessionApplicationWrapper(ApplicationWrapper):
         if "paste.testing_variables" in environ:
             environ["paste.testing_variables"]["session"] = session
 
-        response = self.next_handler(controller, environ, context)
-
+    def after(self, context, response):
+        session = context.session
         if session.accessed():
             session.persist()
             session_headers = session.__dict__["_headers"]
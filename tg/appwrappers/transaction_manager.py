@@ -1,7 +1,9 @@
 import logging
 import sys
+from functools import partial
 
 from ..configuration.utils import coerce_config
+from ..render import _TemplateStream
 from ..support.converters import asbool, asint
 from .base import ApplicationWrapper
 
@@ -26,6 +28,11 @@ class TransactionApplicationWrapper(ApplicationWrapper):
           if it should abort transaction or let it go. Function signature should be:
           ``function(environ, status_code, headers) -> bool``.
 
+    When a template is streamed, through ``render_params={'stream': True}``,
+    the transaction is committed or aborted only once the template has been
+    rendered, as it's rendered while sending the response. Those requests
+    are never retried. Other responses, like files, are sent after commit.
+
     """
 
     def __init__(self, handler, config):
@@ -90,6 +97,13 @@ class TransactionApplicationWrapper(ApplicationWrapper):
                         log.debug("Transaction vetoed")
                         raise AbortTransaction(response)
 
+                if isinstance(response.app_iter, _TemplateStream):
+                    # Streamed template, content is rendered while sending it.
+                    response.app_iter.on_close(
+                        partial(_end_streamed_transaction, transaction_manager)
+                    )
+                    return response
+
                 transaction_manager.commit()
                 log.debug("Transaction committed!")
                 return response
@@ -110,3 +124,18 @@ class TransactionApplicationWrapper(ApplicationWrapper):
                         raise
                 finally:
                     del exc_info
+
+
+def _end_streamed_transaction(manager, failed):
+    """Ends the transaction once a streamed template has been rendered."""
+    if failed or manager.isDoomed():
+        log.debug("Aborting transaction of streamed response")
+        manager.abort()
+        return
+
+    try:
+        manager.commit()
+    except Exception:
+        manager.abort()
+        raise
+    log.debug("Transaction committed!")
@@ -2,8 +2,10 @@
 import logging
 
 from .. import milestones
-from ..configuration.utils import DependenciesList
+from ..configuration.utils import DependenciesList, TGConfigError
 from ..request_local import config as reqlocal_config
+from ..support.asgi import ASGIApplication
+from ..support.converters import asint
 from ..support.hooks import hooks
 from ..util import Bunch
 from ..wsgiapp import TGApp
@@ -136,6 +138,36 @@ class ApplicationConfigurator(Configurator):
         self.setup(conf)
         return self._make_app(conf, wrap_app=wrap_app)
 
+    def make_asgi_app(self, global_conf=None, app_conf=None, wrap_app=None):
+        """Creates a new ASGI TurboGears application with provided configuration.
+
+        The application is the same created by :meth:`.make_wsgi_app`,
+        with all its middlewares, served through :class:`.ASGIApplication`.
+        Requests are processed by a pool of threads of at most
+        ``asgi.max_workers`` threads, defaults to the Python
+        :class:`concurrent.futures.ThreadPoolExecutor` default.
+
+        Applications served through ASGI must use
+        ``registry_backend = contextvars``, as ``async def`` actions
+        run on the event loop thread where the request context
+        tracked by ``threadlocal`` is not available.
+        The thread serving a request is held for the whole request,
+        including while waiting for ``async def`` actions.
+        """
+        conf = self.configure(global_conf, app_conf)
+        if conf.get("registry_backend") != "contextvars":
+            raise TGConfigError(
+                "make_asgi_app requires registry_backend = contextvars, "
+                "%s was configured" % conf.get("registry_backend")
+            )
+        self.setup(conf)
+        app = self._make_app(conf, wrap_app=wrap_app)
+
+        max_workers = conf.get("asgi.max_workers")
+        if max_workers is not None:
+            max_workers = asint(max_workers)
+        return ASGIApplication(app, max_workers=max_workers)
+
     def register_application_wrapper(self, wrapper, after=None):
         """Registers a TurboGears application wrapper.
 
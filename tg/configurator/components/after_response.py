@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from tg.configuration.utils import TGConfigError
+from tg.support.background import BackgroundRunner
+from tg.support.converters import asint
+
+from ..base import ConfigReadyConfigurationAction, ConfigurationComponent
+
+__all__ = ("AfterResponseConfigurationComponent",)
+
+
+class AfterResponseConfigurationComponent(ConfigurationComponent):
+    """Run ``after_response`` hooks in background threads.
+
+    Functions registered for the ``after_response`` hook are notified
+    once the response has been fully sent, in background threads
+    so that they don't add to the response latency. They receive a
+    copy of the request, which has no body, and the response status::
+
+        def audit_log(request, status):
+            log.info('%s %s -> %s', request.method, request.path, status)
+
+        tg.hooks.register('after_response', audit_log)
+
+    As they run outside of the request, ``tg.request``, ``tg.response``
+    and the other request locals are not available to the hooks.
+
+    Options:
+
+        * ``after_response.workers``: Number of threads running
+                                      the hooks, by default 1.
+        * ``after_response.queue_size``: Hooks waiting to run,
+                                         by default 100.
+        * ``after_response.overflow``: What to do when the queue is full, ``drop``
+                                       the hooks (the default), ``block`` the
+                                       request until there is room or ``run``
+                                       the hooks in the request thread.
+
+    The runner is available as ``config['tg.after_response']``,
+    each hook is queued separately and its ``stats()`` method reports
+    how many hooks completed, failed or were dropped and how long
+    they waited in queue. Exceptions raised by hooks are logged.
+    """
+
+    id = "after_response"
+
+    def get_defaults(self):
+        return {
+            "after_response.workers": 1,
+            "after_response.queue_size": 100,
+            "after_response.overflow": "drop",
+        }
+
+    def get_coercion(self):
+        return {
+            "after_response.workers": asint,
+            "after_response.queue_size": asint,
+        }
+
+    def get_actions(self):
+        return (ConfigReadyConfigurationAction(self._setup_runner),)
+
+    def _setup_runner(self, conf, app):
+        try:
+            conf["tg.after_response"] = BackgroundRunner(
+                workers=conf["after_response.workers"],
+                queue_size=conf["after_response.queue_size"],
+                overflow=conf["after_response.overflow"],
+                name="tg-after-response",
+            )
+        except ValueError as e:
+            raise TGConfigError(str(e))
@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
+from inspect import iscoroutine
 from logging import getLogger
 
+from repoze.lru import LRUCache
+
 from ...configuration import milestones
+from ...request_local import request as tg_request
+from ...support.asgi import run_coroutine
+from ...support.converters import asbool, asint
+from ...support.dispatch_options import DispatchOptions
+from ...support.notfound import NotFoundCache
 from ..base import (
     BeforeConfigConfigurationAction,
     ConfigurationComponent,
@@ -34,6 +42,25 @@ class DispatchConfigurationComponent(ConfigurationComponent):
         - ``enable_routing_args``: Set routing args in dispatcher state during dispatch and
                                    call ``_setup_wsgiorg_routing_args`` on root controller to
                                    to allow trapping routing arguments.
+        - ``enable_dispatch_cache``: Cache the controller and action resolved for each
+                                     request path, so that following requests for the
+                                     same path skip the object dispatch walk.
+                                     Controllers providing ``_lookup``, ``_default`` or
+                                     a custom ``_dispatch`` are never cached.
+                                     Only enable it when the controllers tree doesn't
+                                     change at runtime.
+        - ``dispatch_cache_size``: Maximum number of paths kept in the dispatch cache.
+        - ``enable_notfound_cache``: Remember paths that object dispatch was unable to
+                                     resolve, so that further requests for them are
+                                     answered with a prerendered 404 response, without
+                                     going through dispatch and application wrappers
+                                     (so no custom error page is involved).
+                                     Only enable it when the controllers tree doesn't
+                                     change at runtime.
+        - ``notfound_cache_size``: Maximum number of paths kept in the not found cache.
+        - ``application_wrappers_pipeline``: Run consecutive :class:`.PhasedApplicationWrapper`
+                                             from a flat list instead of nesting a call
+                                             for each one of them.
 
     Controller wrappers can be registered by using :meth:`.register_controller_wrapper`::
 
@@ -48,17 +75,54 @@ class DispatchConfigurationComponent(ConfigurationComponent):
         self._controller_wrappers = []
 
     def get_defaults(self):
-        return {"enable_routing_args": False, "disable_request_extensions": False}
+        return {
+            "enable_routing_args": False,
+            "disable_request_extensions": False,
+            "enable_dispatch_cache": False,
+            "dispatch_cache_size": 1024,
+            "enable_notfound_cache": False,
+            "notfound_cache_size": 1024,
+            "application_wrappers_pipeline": False,
+        }
+
+    def get_coercion(self):
+        return {
+            "enable_dispatch_cache": asbool,
+            "dispatch_cache_size": asint,
+            "enable_notfound_cache": asbool,
+            "notfound_cache_size": asint,
+            "application_wrappers_pipeline": asbool,
+        }
 
     def get_actions(self):
         return (
             BeforeConfigConfigurationAction(self._configure_explicit_root_controller),
             EnvironmentLoadedConfigurationAction(self._setup_controller_wrappers),
+            EnvironmentLoadedConfigurationAction(self._setup_dispatch_options),
+            EnvironmentLoadedConfigurationAction(self._setup_dispatch_cache),
         )
 
     def _configure_explicit_root_controller(self, conf, app):
         conf["tg.root_controller"] = conf.pop("root_controller", None)
 
+    def _setup_dispatch_options(self, conf, app):
+        # Dispatch options are resolved once, so that dispatching
+        # a request doesn't need to look them up in configuration.
+        conf["tg.dispatch_options"] = DispatchOptions(conf)
+
+    def _setup_dispatch_cache(self, conf, app):
+        # The cache is filled lazily by CoreDispatcher the first time
+        # each path gets dispatched.
+        if conf["enable_dispatch_cache"]:
+            conf["tg.dispatch_cache"] = LRUCache(conf["dispatch_cache_size"])
+        else:
+            conf["tg.dispatch_cache"] = None
+
+        if conf["enable_notfound_cache"]:
+            conf["tg.notfound_cache"] = NotFoundCache(conf["notfound_cache_size"])
+        else:
+            conf["tg.notfound_cache"] = None
+
     def _setup_controller_wrappers(self, conf, app):
         # This trashes away the current config['controller_caller']
         # so that the call is idempotent.
@@ -120,4 +184,9 @@ class DispatchConfigurationComponent(ConfigurationComponent):
 
 
 def _call_controller(tg_config, controller, remainder, params):
-    return controller(*remainder, **params)
+    output = controller(*remainder, **params)
+    if iscoroutine(output):
+        # async def actions, wait for them so that wrappers,
+        # hooks and rendering receive their actual output.
+        output = run_coroutine(output, tg_request.environ.get("asgi.loop"))
+    return output
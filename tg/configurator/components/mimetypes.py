@@ -14,6 +14,10 @@ class MimeTypesConfigurationComponent(ConfigurationComponent):
     :class:`.DispatchConfigurationComponent` request extensions
     to serve the right content based on URL path extension.
 
+    The mimetype of each known extension is resolved once
+    when the environment is loaded, so changes to ``config['mimetypes']``
+    performed after that are not seen by request extensions.
+
     Options:
 
         * ``mimetype_lookup``: Additional mapping from extensions to
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 from logging import getLogger
 
+from tg import request_local
+from tg.configuration.utils import TGConfigError
 from tg.support.converters import asbool
 from tg.support.registry import RegistryManager
 
-from ..base import AppReadyConfigurationAction, ConfigurationComponent
+from ..base import (
+    AppReadyConfigurationAction,
+    ConfigReadyConfigurationAction,
+    ConfigurationComponent,
+)
 
 log = getLogger(__name__)
 
@@ -25,6 +31,12 @@ class RegistryConfigurationComponent(ConfigurationComponent):
                                   the registry at the end of the stream instead of
                                   as soon as the controller action returned.
                                   This is enabled by default.
+        * ``registry_backend``: How the request context is tracked, ``threadlocal``
+                                (the default) or ``contextvars``. The latter
+                                is required when serving requests through ASGI.
+                                The backend is shared by all the applications
+                                in the process and can't be changed anymore
+                                once a request has been served.
         * ``debug``: Ensures that the registry is not discarded in case of an
                      exception. So that after the exception is possible to inspect
                      the state of the request that caused the exception.
@@ -39,10 +51,24 @@ class RegistryConfigurationComponent(ConfigurationComponent):
     def get_defaults(self):
         return {
             "registry_streaming": True,
+            "registry_backend": "threadlocal",
         }
 
     def get_actions(self):
-        return (AppReadyConfigurationAction(self._add_registry_middleware),)
+        return (
+            ConfigReadyConfigurationAction(self._setup_context_backend),
+            AppReadyConfigurationAction(self._add_registry_middleware),
+        )
+
+    def _setup_context_backend(self, conf, app):
+        backend = conf["registry_backend"]
+        if backend not in ("threadlocal", "contextvars"):
+            raise TGConfigError("Unsupported registry_backend: %s" % backend)
+
+        try:
+            request_local._set_context_backend(backend)
+        except RuntimeError as e:
+            raise TGConfigError(str(e))
 
     def _add_registry_middleware(self, conf, app):
         # Establish the registry for this application
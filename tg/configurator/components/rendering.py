@@ -4,7 +4,9 @@ from logging import getLogger
 
 from tg.configuration import milestones
 from tg.configuration.utils import TGConfigError
-from tg.support.converters import asbool
+from tg.support.converters import asbool, asint
+from tg.support.fragment_cache import FragmentCache
+from tg.support.watcher import FilesWatcher
 
 from ..base import (
     BeforeConfigConfigurationAction,
@@ -27,12 +29,60 @@ class TemplateRenderingConfigurationComponent(ConfigurationComponent):
           in Minimal Mode.
         - ``auto_reload_templates`` -> (``True``/``False``) Automatically reload template files
           if they change. Should usually be disabled on production for performance reasons.
+        - ``templating.watch_templates`` -> (``True``/``False``) When ``auto_reload_templates``
+          is enabled, detect changed templates through a :class:`.FilesWatcher` thread instead
+          of checking the template files on each render. Applies to dotted templates of Mako,
+          Jinja and Kajiki, Genshi templates are still checked on each render. The watcher is
+          available as ``config['tg.templates_watcher']``, its thread is started by the first
+          loaded template, stopped at exit and started again in forked worker processes.
+        - ``templating.watch_interval`` -> (``float``) Seconds between each check of the
+          templates performed by the watcher, by default 1.
+        - ``templating.block_header`` -> (``str``) Name of the request header that requests
+          to render only a block of the template, see below. Disabled by default.
         - ``tg.strict_tmpl_context`` -> (``True``/``False``) Should ``tg.tmpl_context`` be
           strict and complain about missing value or should it always just return empty values
           for missing ones?
         - ``renderers`` -> (``list(str)``) List of template engines that should be enabled.
         - ``default_renderer`` -> (``str``) The default template engine to use when not explicitly
           specified by ``@expose`` decorations.
+        - ``templating.warmup`` -> (``True``/``False``) Load and compile all the templates exposed
+          by the controllers when the application is created, instead of on first render.
+          Compile time of each template is logged at INFO level. The templates watcher, when
+          enabled, is only started by the first request, so that it's not running in the
+          process that forks the workers of prefork servers.
+        - ``templating.warmup_workers`` -> (``int``) Number of threads loading templates
+          concurrently during warm up, by default templates are loaded one by one.
+        - ``templating.fragment_cache`` -> (``str``) Where templates cached through ``tg_cache``
+          are stored, ``beaker`` (the default) uses ``tg.cache`` while ``inprocess`` uses
+          a :class:`.FragmentCache` kept in process memory. The in-process cache is also
+          used when Beaker caching is not available or when ``tg_cache`` type is ``inprocess``.
+        - ``templating.fragment_cache_size`` -> (``int``) Maximum number of templates kept
+          by the in-process cache, by default 1000. The cache is available as
+          ``config['tg.fragment_cache']``.
+
+    Kajiki, Jinja and Genshi templates can also be streamed to the client
+    while they are being rendered, instead of being rendered in memory
+    first, by exposing them with ``render_params={'stream': True}``.
+    This requires ``registry_streaming`` to be enabled (the default) for
+    ``tg.request`` and the other request locals to be available while
+    rendering. As the response has already started, errors that happen
+    during rendering can't be reported by error pages and will just
+    truncate the response. Streaming is ignored when template caching is used.
+    The request context and the transaction of the transaction manager are
+    kept until the streamed template has been rendered, requests that stream
+    templates are never retried by the transaction manager.
+
+    Kajiki and Jinja can also render a single block of the template, instead
+    of the whole page with its layout, when exposed with ``render_params={'block': name}``.
+    The block is rendered with the same variables the whole template would get and
+    ``tg_cache`` caches it separately from the whole template. Blocks defined
+    by the templates it extends can be rendered too, and can be reached through
+    ``super()`` in Jinja or ``parent_block()`` in Kajiki, as long as the extended
+    template name is a literal.
+    Rendering a block that doesn't exist raises :class:`.MissingTemplateBlockError`.
+    When ``templating.block_header`` is set to the name of an HTTP header, like
+    ``HX-Target``, requests providing that header get only the block named by the
+    header rendered, or the whole page when the template has no such block.
 
     Refer to each template engine renderer for specific configuration options.
     """
@@ -50,6 +100,11 @@ class TemplateRenderingConfigurationComponent(ConfigurationComponent):
             "auto_reload_templates": asbool,
             "use_dotted_templatenames": asbool,
             "tg.strict_tmpl_context": asbool,
+            "templating.warmup": asbool,
+            "templating.warmup_workers": asint,
+            "templating.fragment_cache_size": asint,
+            "templating.watch_templates": asbool,
+            "templating.watch_interval": float,
         }
 
     def get_defaults(self):
@@ -59,6 +114,13 @@ class TemplateRenderingConfigurationComponent(ConfigurationComponent):
             "use_dotted_templatenames": False,
             "renderers": [],
             "default_renderer": "kajiki",
+            "templating.warmup": False,
+            "templating.warmup_workers": 0,
+            "templating.fragment_cache": "beaker",
+            "templating.fragment_cache_size": 1000,
+            "templating.watch_templates": False,
+            "templating.watch_interval": 1.0,
+            "templating.block_header": None,
             "render_functions": {},
             "rendering_engines": {},
             "rendering_engines_without_vars": set(),
@@ -117,6 +179,21 @@ class TemplateRenderingConfigurationComponent(ConfigurationComponent):
         )
 
     def _setup_renderers(self, conf, app):
+        if conf["templating.fragment_cache"] not in ("beaker", "inprocess"):
+            raise TGConfigError(
+                "Unsupported templating.fragment_cache: %s"
+                % conf["templating.fragment_cache"]
+            )
+        conf["tg.fragment_cache"] = FragmentCache(
+            conf["templating.fragment_cache_size"]
+        )
+
+        watcher = None
+        if conf["auto_reload_templates"] and conf["templating.watch_templates"]:
+            watcher = FilesWatcher(conf["templating.watch_interval"])
+            watcher.subscribe(conf["tg.app_globals"].dotted_filename_finder.invalidate)
+        conf["tg.templates_watcher"] = watcher
+
         renderers = conf["renderers"]
         rendering_engines = conf["rendering_engines"]
 
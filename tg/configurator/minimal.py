@@ -2,6 +2,7 @@
 import logging
 
 from .application import ApplicationConfigurator
+from .components.after_response import AfterResponseConfigurationComponent
 from .components.app_globals import AppGlobalsConfigurationComponent
 from .components.dispatch import DispatchConfigurationComponent
 from .components.helpers import HelpersConfigurationComponent
@@ -30,6 +31,7 @@ class MinimalApplicationConfigurator(ApplicationConfigurator):
         - provide helpers in templates
         - support templates rendering
         - enable requests local registry for tg.request, tg.response, etc...
+        - run after_response hooks in background threads
 
     """
 
@@ -44,3 +46,4 @@ class MinimalApplicationConfigurator(ApplicationConfigurator):
         self.register(TemplateRenderingConfigurationComponent)
         self.register(RegistryConfigurationComponent, after=True)
         self.register(ValidationConfigurationComponent)
+        self.register(AfterResponseConfigurationComponent)
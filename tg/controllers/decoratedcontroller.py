@@ -6,15 +6,13 @@ decorators to effect a rendered page.
 """
 
 import inspect
-import urllib.request
 from functools import partial
 
-from crank.util import flatten_arguments, get_params_with_argspec
-
 import tg
 from tg.configuration.utils import TGConfigError
 from tg.flash import flash
 from tg.predicates import NotAuthorizedError, not_anonymous
+from tg.render import MissingTemplateBlockError
 from tg.render import render as tg_render
 from tg.request_local import request as tg_request
 from tg.request_local import response as tg_response
@@ -71,6 +69,14 @@ class DecoratedController(object, metaclass=_DecoratedControllerMeta):
         The after_render hook can act upon and modify the response out of
         rendering.
 
+        Controller methods can also be declared ``async def``, in such case
+        their coroutine is awaited before the before_render hook, on the
+        event loop of :class:`.ASGIApplication` when served through ASGI
+        or on an event loop owned by the current thread otherwise.
+        In both cases the thread serving the request is held until the
+        coroutine completes, so the number of concurrent requests is still
+        limited by the number of worker threads.
+
         """
         if context is None:  # pragma: no cover
             # compatibility with old code that didn't pass request locals explicitly
@@ -87,14 +93,12 @@ class DecoratedController(object, metaclass=_DecoratedControllerMeta):
         if not resp_headers.get("Content-Type"):
             resp_headers.pop("Content-Type", None)
 
-        if remainder:
-            remainder = tuple(map(urllib.request.url2pathname, remainder or []))
-        else:
-            remainder = tuple()
+        arguments_binder = action.decoration.arguments_binder
+        remainder = arguments_binder.unquote_remainder(remainder)
 
         hooks.notify("before_validate", args=(remainder, params), controller=action)
 
-        validate_params = get_params_with_argspec(action, params, remainder)
+        validate_params = arguments_binder.params_with_remainder(params, remainder)
         context.request.args_params = (
             validate_params  # Update args_params with positional args
         )
@@ -128,7 +132,7 @@ class DecoratedController(object, metaclass=_DecoratedControllerMeta):
         else:
             bound_controller_callable = action
             context.request.validation.values = params
-            remainder, params = flatten_arguments(action, params, remainder)
+            remainder, params = arguments_binder.flatten(action, params, remainder)
 
         hooks.notify("before_call", args=(remainder, params), controller=action)
 
@@ -216,6 +220,18 @@ class DecoratedController(object, metaclass=_DecoratedControllerMeta):
             render_params,
         ) = controller.decoration.lookup_template_engine(tgl)
 
+        requested_block = False
+        block_header = tgl.config.get("templating.block_header")
+        if block_header and "block" not in render_params:
+            engines_options = tgl.config.get("rendering_engines_options", {})
+            if engines_options.get(engine_name, {}).get("blocks"):
+                # The same url provides different content depending on the header
+                resp.vary = (resp.vary or ()) + (block_header,)
+                block = req.headers.get(block_header)
+                if block:
+                    render_params = dict(render_params, block=block)
+                    requested_block = True
+
         result = dict(
             response=response,
             content_type=engine_content_type,
@@ -257,12 +273,26 @@ class DecoratedController(object, metaclass=_DecoratedControllerMeta):
             testing_variables["controller_output"] = response
 
         # Render the result.
-        rendered = tg_render(
-            template_vars=namespace,
-            template_engine=engine_name,
-            template_name=template_name,
-            **render_params,
-        )
+        try:
+            rendered = tg_render(
+                template_vars=namespace,
+                template_engine=engine_name,
+                template_name=template_name,
+                **render_params,
+            )
+        except MissingTemplateBlockError:
+            if not requested_block:
+                raise
+
+            # Blocks requested by the client might not exist, send the whole page.
+            render_params = dict(render_params)
+            del render_params["block"]
+            rendered = tg_render(
+                template_vars=namespace,
+                template_engine=engine_name,
+                template_name=template_name,
+                **render_params,
+            )
 
         result["response"] = rendered
         return result
@@ -16,15 +16,18 @@ class which provides the ordinary TurboGears mechanism.
 
 """
 
-import mimetypes as default_mimetypes
 import weakref
 
 from crank.dispatchstate import DispatchState
-from webob.exc import HTTPException
+from crank.objectdispatcher import ObjectDispatcher
+from crank.util import method_matches_args
+from webob.exc import HTTPException, HTTPNotFound
 
 import tg
 from tg.caching import cached_property
 from tg.request_local import WebObResponse
+from tg.support.controllers_index import ControllersIndex, mount_point_from_steps
+from tg.support.dispatch_options import DispatchOptions
 
 from ..wsgiapp import TGApp
 
@@ -52,38 +55,54 @@ class CoreDispatcher(object):
         req = context.request
         conf = context.config
 
-        enable_request_extensions = not conf.get("disable_request_extensions", False)
-        dispatch_path_translator = conf.get("dispatch_path_translator", True)
+        try:
+            options = conf["tg.dispatch_options"]
+        except KeyError:
+            # Configuration not created by an ApplicationConfigurator
+            options = DispatchOptions(conf)
 
         state = DispatchState(
             weakref.proxy(req),
             self,
             req.args_params,
             url_path.split("/"),
-            conf.get("ignore_parameters", []),
-            strip_extension=enable_request_extensions,
-            path_translator=dispatch_path_translator,
+            options.ignore_parameters,
+            strip_extension=options.enable_request_extensions,
+            path_translator=options.path_translator,
         )
 
-        if enable_request_extensions:
-            try:
-                mimetypes = conf["mimetypes"]
-            except KeyError:
-                mimetypes = default_mimetypes
-
+        if options.enable_request_extensions:
             ext = state.extension
             if ext is not None:
                 ext = "." + ext
-                mime_type, encoding = mimetypes.guess_type("file" + ext)
-                req._fast_setattr("_response_type", mime_type)
+                req._fast_setattr("_response_type", options.mimetype_for_extension(ext))
             req._fast_setattr("_response_ext", ext)
 
-        state = state.resolve()
+        try:
+            dispatch_cache = conf.get("tg.dispatch_cache")
+            if dispatch_cache is not None:
+                state = self._resolve_with_cache(dispatch_cache, state)
+            else:
+                state = state.resolve()
+        except HTTPNotFound:
+            notfound_cache = conf.get("tg.notfound_cache")
+            if notfound_cache is not None:
+                unresolvable_pieces = _unresolvable_path_length(state)
+                if unresolvable_pieces is not None:
+                    notfound_cache.add(
+                        req.environ["PATH_INFO"],
+                        unresolvable_pieces,
+                        exact=(
+                            unresolvable_pieces == len(state.path)
+                            and state.extension is not None
+                        ),
+                    )
+            raise
 
         # Save the dispatch state for possible use within the controller methods
         req._fast_setattr("_dispatch_state", state)
 
-        if conf.get("enable_routing_args", False):
+        if options.enable_routing_args:
             state.routing_args.update(state.params)
             if hasattr(state.root_dispatcher, "_setup_wsgiorg_routing_args"):
                 state.root_dispatcher._setup_wsgiorg_routing_args(
@@ -92,6 +111,42 @@ class CoreDispatcher(object):
 
         return state
 
+    def _resolve_with_cache(self, dispatch_cache, state):
+        """Resolves the ``state`` reusing a previous resolution of the same path.
+
+        On cache hits the controllers along the path are still entered,
+        so that security checks and ``_visit`` are performed like for
+        a regular dispatch, but there is no lookup of the path pieces.
+        """
+        path = state.path
+        cache_key = "/".join(path)
+
+        entry = dispatch_cache.get(cache_key)
+        if entry is not None:
+            controller_path, action, remainder = entry
+            dispatcher = controller_path[-1][1]
+            # The same path might resolve differently when parameters required
+            # by the action are missing, in such case perform a full dispatch.
+            if method_matches_args(
+                action, state.params, remainder, dispatcher._use_lax_params
+            ):
+                for depth, (location, controller) in enumerate(controller_path):
+                    if depth:
+                        state.add_controller(location, controller)
+                    controller._enter_controller(state, path[depth:])
+                state.set_action(action, list(remainder))
+                return state
+
+        state = state.resolve()
+
+        if entry is None and _is_dispatch_cacheable(state):
+            dispatch_cache.put(
+                cache_key,
+                (state.controller_path, state.action, tuple(state.remainder)),
+            )
+
+        return state
+
     def _enter_controller(self, state, remainder):
         if hasattr(state.controller, "_visit"):
             state.controller._visit(*remainder, **state.params)
@@ -165,30 +220,128 @@ class CoreDispatcher(object):
 
     @cached_property
     def mount_point(self):
-        if not self.mount_steps:
-            return ""
-        return "/" + "/".join((x[0] for x in self.mount_steps[1:]))
+        return mount_point_from_steps(self.mount_steps)
 
     @cached_property
     def mount_steps(self):
-        def find_url(root, item, parents):
-            for i in dir(root):
-                if i.startswith("_") or i in ("mount_steps", "mount_point"):
-                    continue
-
-                controller = getattr(root, i)
-                if controller is item:
-                    return parents + [(i, item)]
-                if hasattr(controller, "_dispatch"):
-                    v = find_url(
-                        controller.__class__, item, parents + [(i, controller)]
-                    )
-                    if v:
-                        return v
-            return []
-
-        root_controller = tg.config.get("tg.root_controller")
+        root_controller = None
+        controllers_index = tg.config.get("tg.controllers_index")
+        if controllers_index is None or not controllers_index.built:
+            # Controllers tree was not indexed by the application yet.
+            root_controller = _root_controller()
+            controllers_index = _fallback_index(root_controller)
+
+        mount_steps = controllers_index.mount_steps(self)
+        if mount_steps:
+            return mount_steps
+
+        # Not indexed, like controllers returned by properties or attached
+        # after the index was built, search for the controller.
         if root_controller is None:
-            root_controller = TGApp.lookup_controller(tg.config, "root")
-
-        return find_url(root_controller, self, [("/", root_controller)])
+            root_controller = _root_controller()
+        return _find_mount_steps(root_controller, self, [("/", root_controller)])
+
+
+def _root_controller():
+    root_controller = tg.config.get("tg.root_controller")
+    if root_controller is None:
+        root_controller = TGApp.lookup_controller(tg.config, "root")
+    return root_controller
+
+
+# Indexes of the controllers trees not indexed by an application, by root controller
+_fallback_indexes = weakref.WeakKeyDictionary()
+
+
+def _fallback_index(root_controller):
+    try:
+        return _fallback_indexes[root_controller]
+    except KeyError:
+        pass
+
+    controllers_index = ControllersIndex()
+    controllers_index.build(root_controller)
+    _fallback_indexes[root_controller] = controllers_index
+    return controllers_index
+
+
+def _find_mount_steps(root, item, parents):
+    """Searches ``item`` in the controllers tree, evaluating properties too."""
+    for i in dir(root):
+        if i.startswith("_") or i in ("mount_steps", "mount_point"):
+            continue
+
+        controller = getattr(root, i)
+        if controller is item:
+            return parents + [(i, item)]
+        if hasattr(controller, "_dispatch"):
+            v = _find_mount_steps(
+                controller.__class__, item, parents + [(i, controller)]
+            )
+            if v:
+                return v
+    return []
+
+
+def _is_object_dispatcher(controller):
+    """Whenever the controller relies on plain object dispatch.
+
+    That is the case when it doesn't provide any ``_lookup``,
+    ``_default`` or custom ``_dispatch``.
+    """
+    if not isinstance(controller, CoreDispatcher):
+        return False
+    if hasattr(controller, "_lookup") or hasattr(controller, "_default"):
+        return False
+    controller_dispatch = getattr(type(controller), "_dispatch", None)
+    return controller_dispatch is ObjectDispatcher._dispatch
+
+
+def _is_dispatch_cacheable(state):
+    """Whenever the resolution of the dispatch state only depends on its path."""
+    if "" in state.path:
+        # Empty path pieces are skipped during dispatch, so the controllers
+        # depth would not match the path position.
+        return False
+
+    for location, controller in state.controller_path:
+        if not _is_object_dispatcher(controller):
+            return False
+
+    return True
+
+
+def _unresolvable_path_length(state):
+    """Number of path pieces that made the dispatch of ``state`` fail.
+
+    Returns ``None`` unless the dispatch failed because a path piece
+    was not available at all on a controller reached through plain
+    object dispatch, in which case no request starting with the same
+    pieces can ever be resolved. Controllers that might behave
+    differently depending on the request (because they have
+    ``allow_only`` or ``_visit``) are never considered.
+    """
+    path = state.path
+    if "" in path:
+        return None
+
+    controller_path = state.controller_path
+    missing_piece_idx = len(controller_path) - 1
+    if missing_piece_idx >= len(path):
+        # Dispatch failed for lack of an index, which depends on parameters.
+        return None
+
+    for location, controller in controller_path:
+        if not _is_object_dispatcher(controller) or controller._use_index_fallback:
+            return None
+        if hasattr(controller, "_visit"):
+            return None
+        if getattr(controller, "allow_only", None) is not None:
+            return None
+
+    controller = controller_path[-1][1]
+    missing_piece = state.translate_path_piece(path[missing_piece_idx])
+    if getattr(controller, missing_piece, None) is not None:
+        return None
+
+    return missing_piece_idx + 1
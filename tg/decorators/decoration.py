@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import urllib.request
 
+from crank.util import get_argspec
+from repoze.lru import LRUCache
 from webob.acceptparse import create_accept_header
 
 from ..configuration import config, milestones
 
 log = logging.getLogger(__name__)
 
+# Number of distinct Accept headers for which each decoration
+# remembers the negotiated content type.
+_NEGOTIATED_CONTENT_TYPES_SIZE = 64
+_NOT_NEGOTIATED = object()
+
 
 def _decorated_controller_caller(tg_config, controller, remainder, params):
     try:
@@ -21,9 +29,88 @@ def _decorated_controller_caller(tg_config, controller, remainder, params):
     return application_controller_caller(tg_config, controller, remainder, params)
 
 
+class _NotFound(object):
+    pass
+
+
+class _ArgumentsBinder(object):
+    """Binds request parameters to the arguments of an action.
+
+    Signature of the action is inspected only once, when the binder
+    is created, so that binding arguments on each request only requires
+    a few dictionary operations. Behaves like
+    ``crank.util.get_params_with_argspec`` and ``crank.util.flatten_arguments``.
+    """
+
+    __slots__ = ("positional", "defaults", "first_default", "varargs", "varkw")
+
+    def __init__(self, func):
+        positional, varargs, varkw, defaults = get_argspec(func)
+        self.positional = tuple(positional)
+        self.defaults = tuple(defaults)
+        self.first_default = len(self.positional) - len(self.defaults)
+        self.varargs = bool(varargs)
+        self.varkw = bool(varkw)
+
+    @staticmethod
+    def unquote_remainder(remainder):
+        """Converts the remainder of the url to the positional arguments values."""
+        if remainder:
+            return tuple(map(urllib.request.url2pathname, remainder))
+        return tuple()
+
+    def params_with_remainder(self, params, remainder):
+        """Returns the params with positional arguments added by name."""
+        positional = self.positional
+        if positional and remainder:
+            params = params.copy()
+            for name, value in zip(positional, remainder):
+                params[name] = value
+        return params
+
+    def flatten(self, func, params, remainder):
+        """Returns the positional and keyword arguments to call ``func`` with.
+
+        Keyword arguments are only provided if the action accepts ``**kwargs``.
+        """
+        positional = self.positional
+
+        if not params:
+            if self.varargs:
+                return tuple(remainder), params
+            return tuple(remainder[: len(positional)]), params
+
+        args = []
+        kwargs = params.copy()
+        remainder_len = len(remainder)
+        for idx, name in enumerate(positional):
+            value = kwargs.pop(name, _NotFound)
+            if value is not _NotFound:
+                args.append(value)
+            elif idx < remainder_len:
+                args.append(remainder[idx])
+            elif idx >= self.first_default:
+                args.append(self.defaults[idx - self.first_default])
+            else:
+                raise TypeError(
+                    '{0} missing "{1}" required argument'.format(func, name)
+                )
+
+        if self.varargs:
+            args.extend(remainder[len(args) :])
+
+        if not self.varkw:
+            kwargs = {}
+
+        return tuple(args), kwargs
+
+
 class Decoration(object):
     """Simple class to support 'simple registration' type decorators"""
 
+    # Incremented whenever hooks of any controller change
+    _hooks_generation = 0
+
     def __init__(self, controller):
         self.controller = controller
         self.controller_caller = _decorated_controller_caller
@@ -39,6 +126,8 @@ class Decoration(object):
         self.hooks = dict(
             before_validate=[], before_call=[], before_render=[], after_render=[]
         )
+        self._arguments_binder = None
+        self._negotiated_content_types = None
 
     def __repr__(self):  # pragma: no cover
         return "<Decoration %s for %r>" % (id(self), self.controller)
@@ -77,6 +166,18 @@ class Decoration(object):
             except IndexError:
                 break
 
+        if self.exposed:
+            # Prepare the binder now, so that first request doesn't pay for it.
+            self.arguments_binder
+
+    @property
+    def arguments_binder(self):
+        """Binds the request parameters to the controller arguments."""
+        binder = self._arguments_binder
+        if binder is None:
+            binder = self._arguments_binder = _ArgumentsBinder(self.controller)
+        return binder
+
     @property
     def exposed(self):
         return bool(self.engines) or bool(self.custom_engines)
@@ -85,6 +186,7 @@ class Decoration(object):
         # This merges already registered template engines
         self.engines = dict(tuple(deco.engines.items()) + tuple(self.engines.items()))
         self.engines_keys = sorted(self.engines, reverse=True)
+        self._negotiated_content_types = None
         self.custom_engines = dict(
             tuple(deco.custom_engines.items()) + tuple(self.custom_engines.items())
         )
@@ -97,6 +199,7 @@ class Decoration(object):
         # parent hooks before current hooks so that they get called before
         for hook_name, hooks in deco.hooks.items():
             self.hooks[hook_name] = hooks + self.hooks[hook_name]
+        self._hooks_changed()
 
         # Inherit al validators registered on parent.
         self.validations = deco.validations + self.validations
@@ -171,6 +274,7 @@ class Decoration(object):
         # precedent to text/html, and so sorting engine keys alphabetically reversed
         # should make text/html the first choice when no other better choices are available.
         self.engines_keys = sorted(self.engines, reverse=True)
+        self._negotiated_content_types = None
 
     def register_custom_template_engine(
         self,
@@ -237,21 +341,13 @@ class Decoration(object):
             elif self.engines:
                 if response.content_type is not None:
                     # Check for overridden content type from the controller call
-                    accept_types = create_accept_header(response.content_type)
+                    accept = response.content_type
                 elif request._response_type and request._response_type in self.engines:
                     # Check for content type detected by request extensions
-                    accept_types = create_accept_header(request._response_type)
+                    accept = request._response_type
                 else:
-                    accept_types = request.accept
-
-                best_matches = (
-                    accept_types.acceptable_offers(self.engines_keys)
-                    or
-                    # If none of the available engines matches with the
-                    # available options, just suggest usage of the first engine.
-                    ((self.engines_keys[0], None),)
-                )
-                content_type = best_matches[0][0]
+                    accept = request.environ.get("HTTP_ACCEPT")
+                content_type = self._negotiate_content_type(accept)
             else:
                 content_type = "text/html"
 
@@ -268,6 +364,31 @@ class Decoration(object):
 
         return content_type, engine, template, exclude_names, render_params
 
+    def _negotiate_content_type(self, accept):
+        """Content type of the engine that best matches the ``accept`` header.
+
+        As only a few distinct Accept headers are usually received, the
+        result is remembered for each header until engines change.
+        """
+        negotiated = self._negotiated_content_types
+        if negotiated is None:
+            negotiated = self._negotiated_content_types = LRUCache(
+                _NEGOTIATED_CONTENT_TYPES_SIZE
+            )
+
+        content_type = negotiated.get(accept, _NOT_NEGOTIATED)
+        if content_type is _NOT_NEGOTIATED:
+            best_matches = (
+                create_accept_header(accept).acceptable_offers(self.engines_keys)
+                or
+                # If none of the available engines matches with the
+                # available options, just suggest usage of the first engine.
+                ((self.engines_keys[0], None),)
+            )
+            content_type = best_matches[0][0]
+            negotiated.put(accept, content_type)
+        return content_type
+
     def _register_hook(self, hook_name, func):
         """Registers the specified function as a hook.
 
@@ -281,6 +402,16 @@ class Decoration(object):
         cycle.)
         """
         self.hooks.setdefault(hook_name, []).append(func)
+        self._hooks_changed()
+
+    @staticmethod
+    def _hooks_changed():
+        """Notifies that application or controller hooks changed.
+
+        Hooks namespaces compare the generation against the one their
+        compiled hooks were built for, and rebuild them when it changed.
+        """
+        Decoration._hooks_generation += 1
 
     def _register_requirement(self, requirement):
         self._register_hook("before_call", requirement._check_authorization)
@@ -1,9 +1,14 @@
+import hashlib
+import json
+import threading
+from datetime import date, datetime, time
+from decimal import Decimal
+
 try:
     from urllib import quote_plus
 except ImportError:  # pragma: no cover
     from urllib.parse import quote_plus
 
-
 import tg
 from tg import predicates
 from tg.util import Bunch
@@ -23,6 +28,18 @@ class MissingRendererError(Exception):
         self.template_engine = template_engine
 
 
+class MissingTemplateBlockError(KeyError):
+    """Raised by renderers when the requested block is not defined by the template."""
+
+    def __init__(self, template_name, block):
+        KeyError.__init__(self, "Template %s has no block %s" % (template_name, block))
+        self.template_name = template_name
+        self.block = block
+
+    def __str__(self):
+        return self.args[0]
+
+
 def _get_tg_vars():
     """Create a Bunch of variables that should be available in all templates.
 
@@ -59,64 +76,99 @@ def _get_tg_vars():
     """
 
     tgl = tg.request_local.context._current_obj()
+    root_vars = Bunch(_get_request_tg_vars(tgl))
+
+    # Allow users to provide a callable that defines extra vars to be
+    # added to the template namespace
+    variable_provider = tgl.config.get("variable_provider", None)
+    if variable_provider:
+        root_vars.update(variable_provider())
+    return root_vars
+
+
+def _get_request_tg_vars(tgl):
+    """Variables available in all templates rendered by the current request.
+
+    They are only created by the first render of each request
+    and then reused, the returned ``Bunch`` must not be modified
+    and must be copied before adding other variables.
+    Variables that might change during the request, like the
+    ``translator``, ``session``, ``locale``, ``identity`` and the
+    validation ``errors`` and ``inputs``, are refreshed on each call.
+    """
     req = tgl.request
-    conf = tgl.config
-    tmpl_context = tgl.tmpl_context
-    app_globals = tgl.app_globals
-    translator = tgl.translator
-    response = tgl.response
-    session = tgl.session
-    helpers = conf["helpers"]
 
     try:
         validation = req.validation
     except AttributeError:
         validation = {}
 
-    # TODO: Implement user_agent and other missing features.
-    tg_vars = Bunch(
-        config=tg.config,
-        flash_obj=tg.flash,
-        quote_plus=quote_plus,
-        url=tg.url,
-        # this will be None if no identity
-        identity=req.environ.get("repoze.who.identity"),
-        session=session,
-        locale=req.plain_languages,
-        errors=validation and validation.errors,
-        inputs=validation and validation.values,
-        request=req,
-        auth_stack_enabled="repoze.who.plugins" in req.environ,
-        predicates=predicates,
-    )
+    try:
+        root_vars = tgl._tg_vars
+    except AttributeError:
+        root_vars = None
+
+    if root_vars is None:
+        conf = tgl.config
+        tmpl_context = tgl.tmpl_context
+        app_globals = tgl.app_globals
+        helpers = conf["helpers"]
+
+        # TODO: Implement user_agent and other missing features.
+        tg_vars = Bunch(
+            config=tg.config,
+            flash_obj=tg.flash,
+            quote_plus=quote_plus,
+            url=tg.url,
+            identity=None,
+            session=None,
+            locale=None,
+            errors=None,
+            inputs=None,
+            request=req,
+            auth_stack_enabled="repoze.who.plugins" in req.environ,
+            predicates=predicates,
+        )
 
-    root_vars = Bunch(
-        c=tmpl_context,
-        tmpl_context=tmpl_context,
-        response=response,
-        request=req,
-        config=conf,
-        app_globals=app_globals,
-        g=app_globals,
-        session=session,
-        url=tg.url,
-        helpers=helpers,
-        h=helpers,
-        tg=tg_vars,
-        translator=translator,
-        ungettext=tg.i18n.ungettext,
-        _=tg.i18n.ugettext,
-        N_=tg.i18n.gettext_noop,
-    )
+        root_vars = Bunch(
+            c=tmpl_context,
+            tmpl_context=tmpl_context,
+            response=tgl.response,
+            request=req,
+            config=conf,
+            app_globals=app_globals,
+            g=app_globals,
+            session=None,
+            url=tg.url,
+            helpers=helpers,
+            h=helpers,
+            tg=tg_vars,
+            translator=None,
+            ungettext=tg.i18n.ungettext,
+            _=tg.i18n.ugettext,
+            N_=tg.i18n.gettext_noop,
+        )
 
-    # If there is an identity, push it to the Pylons template context
-    tmpl_context.identity = tg_vars["identity"]
+        try:
+            tgl._tg_vars = root_vars
+        except AttributeError:  # pragma: no cover
+            # Context doesn't allow to store the vars, build them each time.
+            pass
 
-    # Allow users to provide a callable that defines extra vars to be
-    # added to the template namespace
-    variable_provider = conf.get("variable_provider", None)
-    if variable_provider:
-        root_vars.update(variable_provider())
+    session = tgl.session
+    root_vars["session"] = session
+    root_vars["translator"] = tgl.translator
+
+    tg_vars = root_vars["tg"]
+    # this will be None if no identity
+    tg_vars["identity"] = req.environ.get("repoze.who.identity")
+    tg_vars["session"] = session
+    tg_vars["locale"] = req.plain_languages
+    tg_vars["errors"] = validation and validation.errors
+    tg_vars["inputs"] = validation and validation.values
+
+    # If there is an identity, push it to the Pylons template context
+    root_vars["tmpl_context"].identity = tg_vars["identity"]
     return root_vars
 
 
@@ -175,6 +227,15 @@ def render(template_vars, template_engine=None, template_name=None, **kwargs):
         - translator -> The current gettext translator
         - _ -> like tg.i18n.ugettext
 
+    When ``render_params={'auto_cache': expire}`` is provided to ``@expose``
+    the rendered template is cached for ``expire`` seconds (or ``never``)
+    under a key derived from the template, the active languages and the
+    template vars, through the same mechanism used by ``tg_cache``.
+    Template vars that can't be serialized deterministically (only dicts
+    with string keys, lists, tuples, strings, numbers, booleans, ``None``,
+    dates and decimals can) are rendered without caching. It should only be used for templates
+    whose output only depends on the values returned by the controller.
+
     Additional variables can be added to every template by a
     ``variable_provider`` function inside the application
     configuration. This function is expected to return
@@ -197,6 +258,20 @@ def render(template_vars, template_engine=None, template_name=None, **kwargs):
         template_vars = {}
 
     caching_options = template_vars.get("tg_cache", {})
+
+    auto_cache = kwargs.pop("auto_cache", None)
+    if auto_cache is not None and not caching_options:
+        cache_key = _auto_cache_key(
+            template_engine, template_name, template_vars, kwargs.get("block")
+        )
+        with _auto_cache_stats_lock:
+            if cache_key is None:
+                _auto_cache_stats["skipped"] += 1
+            else:
+                _auto_cache_stats["cached"] += 1
+        if cache_key is not None:
+            caching_options = {"key": cache_key, "expire": auto_cache}
+
     kwargs["cache_key"] = caching_options.get("key")
     kwargs["cache_expire"] = caching_options.get("expire")
     kwargs["cache_type"] = caching_options.get("type")
@@ -209,7 +284,8 @@ def render(template_vars, template_engine=None, template_name=None, **kwargs):
 
     engines_without_vars = config["rendering_engines_without_vars"]
     if template_engine not in engines_without_vars:
-        # Get the extra vars, and merge in the vars from the controller
+        # Get the extra vars, which are built once per request,
+        # and merge in the vars from the controller
         tg_vars = _get_tg_vars()
         tg_vars.update(template_vars)
 
@@ -221,6 +297,154 @@ def render(template_vars, template_engine=None, template_name=None, **kwargs):
     return kwargs["result"]
 
 
+# Rendered text is sent in chunks of at least this many characters
+_STREAM_BUFFER_SIZE = 8192
+
+
+def _encode_stream(chunks, encoding=None):
+    """Encodes text chunks generated by a template for ``response.app_iter``.
+
+    Small chunks are buffered, so that the response isn't sent a few
+    bytes at time. When no ``encoding`` is provided the charset of
+    the current response is used. Returns a :class:`_TemplateStream`.
+    """
+    if encoding is None:
+        encoding = tg.response.charset or "utf-8"
+
+    def _encoded_chunks():
+        buffer = []
+        buffered = 0
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= _STREAM_BUFFER_SIZE:
+                yield "".join(buffer).encode(encoding)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield "".join(buffer).encode(encoding)
+
+    return _TemplateStream(_encoded_chunks())
+
+
+class _TemplateStream(object):
+    """Response body of a template rendered while it's being sent.
+
+    Identifies responses that still need the request resources, like
+    the transaction, while they are sent. Callbacks registered through
+    :meth:`on_close` are called once, with ``True`` when rendering failed,
+    as soon as the template has been rendered or the response is closed.
+    """
+
+    __slots__ = ("_chunks", "_close_callbacks")
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._close_callbacks = []
+
+    def on_close(self, callback):
+        self._close_callbacks.append(callback)
+
+    def __iter__(self):
+        try:
+            for chunk in self._chunks:
+                yield chunk
+        except Exception:
+            self._finished(True)
+            raise
+        self._finished(False)
+
+    def close(self):
+        try:
+            self._chunks.close()
+        except Exception:
+            self._finished(True)
+            raise
+        self._finished(False)
+
+    def _finished(self, failed):
+        callbacks, self._close_callbacks = self._close_callbacks, []
+        for callback in callbacks:
+            callback(failed)
+
+
+# Renders cached and skipped due to vars that couldn't be serialized by auto_cache
+_auto_cache_stats = {"cached": 0, "skipped": 0}
+_auto_cache_stats_lock = threading.Lock()
+
+# Types serialized by auto_cache as they are, everything else is tagged with its type
+_AUTO_CACHE_PLAIN_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _auto_cache_serialize(value):
+    """Converts ``value`` to JSON where values of different types never match.
+
+    Values that aren't plain JSON types become ``[type, value]`` lists,
+    so ``Markup`` and ``str`` or tuples and lists lead to different keys.
+    """
+    value_type = type(value)
+    if value_type in _AUTO_CACHE_PLAIN_TYPES:
+        return value
+
+    tag = "%s.%s" % (value_type.__module__, value_type.__qualname__)
+    if isinstance(value, dict):
+        keys = list(value)
+        for key in keys:
+            if not isinstance(key, str):
+                raise TypeError("Unable to serialize %r key for auto_cache" % key)
+        keys.sort()
+        return [
+            tag,
+            [[_auto_cache_serialize(k), _auto_cache_serialize(value[k])] for k in keys],
+        ]
+    elif isinstance(value, (list, tuple)):
+        return [tag, [_auto_cache_serialize(item) for item in value]]
+    elif isinstance(value, (str, int, float)):
+        return [tag, value]
+    elif isinstance(value, (datetime, date, time)):
+        return [tag, value.isoformat()]
+    elif isinstance(value, Decimal):
+        return [tag, str(value)]
+    raise TypeError("Unable to serialize %r for auto_cache" % value_type)
+
+
+def _auto_cache_key(template_engine, template_name, template_vars, block=None):
+    """Digest identifying a render, ``None`` when vars can't be serialized."""
+    lang = getattr(tg.request_local.context._current_obj().translator, "tg_lang", None)
+    try:
+        serialized = json.dumps(
+            _auto_cache_serialize(
+                [template_engine, template_name, block, lang, template_vars]
+            ),
+            separators=(",", ":"),
+        )
+    except (TypeError, ValueError, RecursionError):
+        return None
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+def auto_cache_stats():
+    """How many renders were cached or skipped by ``auto_cache``."""
+    with _auto_cache_stats_lock:
+        return dict(_auto_cache_stats)
+
+
+def _get_fragment_cache(cache_type):
+    """The in-process cache to use, ``None`` when Beaker should be used."""
+    conf = tg.config._current_obj()
+    fragment_cache = conf.get("tg.fragment_cache")
+    if fragment_cache is None:
+        return None
+
+    if (
+        cache_type == "inprocess"
+        or conf.get("templating.fragment_cache") == "inprocess"
+        or getattr(tg.request_local.context._current_obj(), "cache", None) is None
+    ):
+        return fragment_cache
+    return None
+
+
 def cached_template(
     template_name,
     render_func,
@@ -250,13 +474,14 @@ def cached_template(
         include it so that the cached copy for a template is not the
         same as the fragment version of it.
 
-    Caching options (uses Beaker caching middleware)
+    Caching options (uses Beaker caching middleware or the in-process
+    :class:`.FragmentCache`, depending on ``templating.fragment_cache``)
 
     ``cache_key``
         Key to cache this copy of the template under.
     ``cache_type``
         Valid options are ``dbm``, ``file``, ``memory``, ``database``,
-        or ``memcached``.
+        or ``memcached``, or ``inprocess`` to use the in-process cache.
     ``cache_expire``
         Time in seconds to cache this template with this ``cache_key``
         for. Or use 'never' to designate that the cache should never
@@ -282,6 +507,12 @@ def cached_template(
         for name in ns_options:
             namespace += str(kwargs.get(name))
 
+        fragment_cache = _get_fragment_cache(cache_type)
+        if fragment_cache is not None:
+            return fragment_cache.get_value(
+                namespace, cache_key, render_func, expiretime=cache_expire
+            )
+
         cache = tg.cache.get_cache(namespace, **get_cache_kw)
         content = cache.get_value(
             cache_key, createfunc=render_func, expiretime=cache_expire
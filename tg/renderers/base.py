@@ -1,3 +1,10 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+log = getLogger(__name__)
+
+
 class RendererFactory(object):
     """
     Factory that creates one or multiple rendering engines
@@ -13,7 +20,9 @@ class RendererFactory(object):
     #:
     #:   engines = {'json': {'content_type': 'application/json'}}
     #:
-    #: Currently only supported option is ``content_type``.
+    #: Supported options are ``content_type`` and ``blocks``, which
+    #: must be ``True`` when the engine can render a single block of the
+    #: template through the ``block`` render param.
     options = {}
 
     #: Here specify if turbogears variables have to be injected
@@ -42,5 +51,71 @@ class RendererFactory(object):
         ``render_params`` parameter will contain all the values
         provide through ``@expose(render_params={})``.
 
+        Rendering engines that load templates can also provide a
+        ``load_template(template_name)`` method that loads and compiles
+        the template without rendering it, which is used to warm up
+        templates when ``templating.warmup`` is enabled.
+
         """
         raise NotImplementedError()
+
+
+def warmup_templates(config, controllers, workers=0):
+    """Loads and compiles the templates exposed by ``controllers``.
+
+    All the templates registered by exposed methods of the given
+    controllers, including the ones for custom formats, are loaded
+    through the ``load_template`` method of their rendering engine,
+    so that the first request that renders them doesn't have to.
+
+    When ``workers`` is greater than zero templates are loaded
+    concurrently by a pool of that many threads.
+    Templates that fail to load are logged and skipped.
+    """
+    render_functions = config.get("render_functions", {})
+
+    templates = []
+    for controller in controllers:
+        controller_class = controller.__class__
+        for name in dir(controller_class):
+            decoration = getattr(
+                getattr(controller_class, name, None), "decoration", None
+            )
+            if decoration is None or not decoration.exposed:
+                continue
+
+            engines = [e[:2] for e in decoration.engines.values()]
+            engines.extend(e[1:3] for e in decoration.custom_engines.values())
+            for engine, template in engines:
+                load_template = getattr(
+                    render_functions.get(engine), "load_template", None
+                )
+                if template and load_template is not None:
+                    if (engine, template) not in templates:
+                        templates.append((engine, template))
+
+    def _load(engine_and_template):
+        engine, template = engine_and_template
+        start = time.perf_counter()
+        try:
+            render_functions[engine].load_template(template)
+        except Exception:
+            log.exception("Failed to warm up %s template %s", engine, template)
+        else:
+            log.info(
+                "Warmed up %s template %s in %.2fms",
+                engine,
+                template,
+                (time.perf_counter() - start) * 1000,
+            )
+
+    if workers > 0:
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="tg-warmup"
+        ) as executor:
+            list(executor.map(_load, templates))
+    else:
+        for engine_and_template in templates:
+            _load(engine_and_template)
+
+    return templates
@@ -5,7 +5,7 @@ from markupsafe import Markup
 import tg
 from tg.configuration.utils import coerce_config
 from tg.i18n import ugettext
-from tg.render import cached_template
+from tg.render import _encode_stream, cached_template
 from tg.support.converters import asbool, asint
 
 from .base import RendererFactory
@@ -41,6 +41,8 @@ class GenshiRenderer(RendererFactory):
         - Caching options supported by :func:`.cached_template`
         - ``doctype`` -> To override the global doctype
         - ``method`` -> To override the global rendering method
+        - ``stream`` -> Send the page to the client while it's being rendered,
+          see :class:`.TemplateRenderingConfigurationComponent`.
     """
 
     CONFIG_OPTIONS = {"max_cache_size": asint, "name_constant_patch": asbool}
@@ -224,6 +226,18 @@ class GenshiRenderer(RendererFactory):
                 method = methods[0]
             kwargs["method"] = method
 
+        stream = kwargs.pop("stream", False)
+        if stream and not any(
+            kwargs.get(o) is not None
+            for o in ("cache_key", "cache_type", "cache_expire")
+        ):
+            template = self.load_template(template_name)
+            return _encode_stream(
+                template.generate(**template_vars).serialize(
+                    doctype=doctype, method=method
+                )
+            )
+
         def render_template():
             template = self.load_template(template_name)
             return Markup(
@@ -1,11 +1,15 @@
 from __future__ import absolute_import
 
-from os.path import exists, getmtime
+import os
+import threading
+import weakref
+from os.path import getmtime
 
 from markupsafe import Markup
 
+from tg.configuration.utils import coerce_config
 from tg.i18n import ugettext, ungettext
-from tg.render import cached_template
+from tg.render import MissingTemplateBlockError, _encode_stream, cached_template
 
 from .base import RendererFactory
 
@@ -15,7 +19,8 @@ except ImportError:  # pragma: no cover
     jinja2 = None
 
 if jinja2 is not None:
-    from jinja2 import ChoiceLoader, Environment
+    from jinja2 import ChoiceLoader, Environment, nodes
+    from jinja2.bccache import FileSystemBytecodeCache
     from jinja2.exceptions import TemplateNotFound
     from jinja2.filters import FILTERS
     from jinja2.loaders import FileSystemLoader
@@ -24,6 +29,9 @@ else:  # pragma: no cover
     class FileSystemLoader(object):
         pass
 
+    class FileSystemBytecodeCache(object):
+        pass
+
 
 __all__ = ["JinjaRenderer"]
 
@@ -32,9 +40,28 @@ class JinjaRenderer(RendererFactory):
     """
     Currently Jinja2 support uses a bunch of options from ``tg.config``
     and doesn't provide its own namespace.
+
+    Supported ``render_params``:
+
+        - Caching options supported by :func:`.cached_template`
+        - ``stream`` -> Send the page to the client while it's being rendered,
+          see :class:`.TemplateRenderingConfigurationComponent`.
+        - ``block`` -> Render only the named ``{% block %}`` of the template,
+          see :class:`.TemplateRenderingConfigurationComponent`.
+
+    Configuration Options available as ``templating.jinja.*``:
+
+        - ``templating.jinja.bytecode_cache_dir`` -> Where to store the compiled
+          bytecode of templates, so that it can be reused after a restart and by
+          all the processes that share the directory. Files are written atomically
+          and are discarded when the template source changes.
     """
 
-    engines = {"jinja": {"content_type": "text/html"}}
+    #: Configuration Options that can be set as ``templating.jinja.*``.
+    CONFIG_OPTIONS = {
+        "bytecode_cache_dir": str,
+    }
+    engines = {"jinja": {"content_type": "text/html", "blocks": True}}
 
     @classmethod
     def create(cls, config, app_globals):
@@ -42,9 +69,14 @@ class JinjaRenderer(RendererFactory):
         if jinja2 is None:  # pragma: no cover
             return None
 
+        options = coerce_config(config, "templating.jinja.", cls.CONFIG_OPTIONS)
+
         if config.get("use_dotted_templatenames", True):
             TemplateLoader = DottedTemplateLoader
-            template_loader_args = {"dotted_finder": app_globals.dotted_filename_finder}
+            template_loader_args = {
+                "dotted_finder": app_globals.dotted_filename_finder,
+                "watcher": config.get("tg.templates_watcher"),
+            }
         else:
             TemplateLoader = FileSystemLoader
             template_loader_args = {}
@@ -66,11 +98,16 @@ class JinjaRenderer(RendererFactory):
             ]
         )
 
+        bytecode_cache = None
+        if options.get("bytecode_cache_dir"):
+            bytecode_cache = JinjaFileSystemBytecodeCache(options["bytecode_cache_dir"])
+
         jinja2_env = Environment(
             loader=loader,
             autoescape=True,
             auto_reload=config["auto_reload_templates"],
             extensions=config["jinja_extensions"],
+            bytecode_cache=bytecode_cache,
         )
 
         # Try to load custom filters module under app_package.lib.templatetools
@@ -112,6 +149,31 @@ class JinjaRenderer(RendererFactory):
 
     def __init__(self, jinja2_env):
         self.jinja2_env = jinja2_env
+        self._extended_templates = weakref.WeakKeyDictionary()
+
+    def _extended_template(self, template):
+        """Name of the template extended by ``template``.
+
+        ``None`` when it doesn't extend any template or the extended
+        one is chosen by an expression while rendering.
+        """
+        try:
+            return self._extended_templates[template]
+        except KeyError:
+            pass
+
+        env = self.jinja2_env
+        source = env.loader.get_source(env, template.name)[0]
+        extends = env.parse(source).find(nodes.Extends)
+        parent_name = None
+        if extends is not None and isinstance(extends.template, nodes.Const):
+            parent_name = extends.template.value
+        self._extended_templates[template] = parent_name
+        return parent_name
+
+    def load_template(self, template_name):
+        """Loads and compiles a template without rendering it."""
+        return self.jinja2_env.get_template(template_name)
 
     def __call__(
         self,
@@ -120,6 +182,8 @@ class JinjaRenderer(RendererFactory):
         cache_key=None,
         cache_type=None,
         cache_expire=None,
+        stream=False,
+        block=None,
     ):
         """Render a template with Jinja2
 
@@ -127,6 +191,14 @@ class JinjaRenderer(RendererFactory):
         ``cache_expire``.
 
         """
+        if block is not None:
+            return self._render_block(
+                template_name, template_vars, block, cache_key, cache_type, cache_expire
+            )
+
+        if stream and cache_key is None and cache_type is None and cache_expire is None:
+            template = self.jinja2_env.get_template(template_name)
+            return _encode_stream(template.generate(**template_vars))
 
         # Create a render callable for the cache function
         def render_template():
@@ -142,13 +214,51 @@ class JinjaRenderer(RendererFactory):
             cache_expire=cache_expire,
         )
 
+    def _render_block(
+        self, template_name, template_vars, block, cache_key, cache_type, cache_expire
+    ):
+        def render_block():
+            template = self.jinja2_env.get_template(template_name)
+            context = template.new_context(template_vars)
+
+            # Add the blocks of the extended templates, like {% extends %} does,
+            # so that blocks of the layout and super() are available.
+            parent_name = self._extended_template(template)
+            while parent_name is not None:
+                template = self.jinja2_env.get_template(parent_name, template.name)
+                for name, parent_block in template.blocks.items():
+                    context.blocks.setdefault(name, []).append(parent_block)
+                parent_name = self._extended_template(template)
+
+            try:
+                render_func = context.blocks[block][0]
+            except KeyError:
+                raise MissingTemplateBlockError(template_name, block)
+            return Markup(self.jinja2_env.concat(render_func(context)))
+
+        return cached_template(
+            template_name,
+            render_block,
+            ns_options=("block",),
+            cache_key=cache_key,
+            cache_type=cache_type,
+            cache_expire=cache_expire,
+            block=block,
+        )
+
 
 class DottedTemplateLoader(FileSystemLoader):
-    """Jinja template loader supporting dotted filenames. Based on Genshi Loader"""
+    """Jinja template loader supporting dotted filenames. Based on Genshi Loader
+
+    When a ``watcher`` is provided, templates are checked for changes
+    against the modification times known by the :class:`.FilesWatcher`
+    instead of accessing the template files.
+    """
 
     def __init__(self, *args, **kwargs):
         self.template_extension = kwargs.pop("template_extension", ".jinja")
         self.dotted_finder = kwargs.pop("dotted_finder")
+        self.watcher = kwargs.pop("watcher", None)
 
         super(DottedTemplateLoader, self).__init__(*args, **kwargs)
 
@@ -161,20 +271,73 @@ class DottedTemplateLoader(FileSystemLoader):
                 template_name=template, template_extension=self.template_extension
             )
         else:
-            return FileSystemLoader.get_source(self, environment, template)
-
-        # Check if the template exists
-        if not exists(template):
-            raise TemplateNotFound(template)
+            source, filename, uptodate = FileSystemLoader.get_source(
+                self, environment, template
+            )
+            if self.watcher is not None:
+                uptodate = self._watched_uptodate(filename)
+            return source, filename, uptodate
 
-        # Get modification time
-        mtime = getmtime(template)
+        if self.watcher is not None:
+            uptodate = self._watched_uptodate(template)
+        else:
+            uptodate = self._uptodate(template)
 
         # Read the source
-        fd = open(template, "rb")
-        try:
+        with open(template, "rb") as fd:
             source = fd.read().decode("utf-8")
-        finally:
-            fd.close()
 
-        return source, template, lambda: mtime == getmtime(template)
+        return source, template, uptodate
+
+    def _uptodate(self, filename):
+        # Get modification time, which also checks that the template exists
+        try:
+            mtime = getmtime(filename)
+        except OSError:
+            raise TemplateNotFound(filename)
+        return lambda: mtime == getmtime(filename)
+
+    def _watched_uptodate(self, filename):
+        watcher = self.watcher
+        mtime = watcher.watch(filename)
+        if mtime is None:
+            raise TemplateNotFound(filename)
+        return lambda: watcher.mtime(filename) == mtime
+
+
+class _BytecodeCacheStats(object):
+    """Counts hits and misses of a Jinja bytecode cache.
+
+    A lookup is a miss when no bytecode was stored for the template
+    or when the stored one was compiled from a different source.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_BytecodeCacheStats, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_bucket(self, environment, name, filename, source):
+        bucket = super(_BytecodeCacheStats, self).get_bucket(
+            environment, name, filename, source
+        )
+        with self._stats_lock:
+            if bucket.code is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return bucket
+
+    def stats(self):
+        """Returns the ``hits`` and ``misses`` of the cache."""
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class JinjaFileSystemBytecodeCache(_BytecodeCacheStats, FileSystemBytecodeCache):
+    """Stores templates bytecode in ``directory``, creating it when missing."""
+
+    def __init__(self, directory, pattern="__jinja2_%s.cache"):
+        os.makedirs(directory, exist_ok=True)
+        super(JinjaFileSystemBytecodeCache, self).__init__(directory, pattern)
@@ -1,14 +1,26 @@
 from __future__ import absolute_import
 
+import ast
+import bisect
+import dis
+import hashlib
+import importlib.util
+import logging
+import marshal
 import os
+import tempfile
+import threading
+import types
+import weakref
 
 from markupsafe import Markup
+from repoze.lru import LRUCache
 
-from tg.render import cached_template
+from tg.render import MissingTemplateBlockError, _encode_stream, cached_template
 
 from ..configuration.utils import coerce_config
-from ..i18n import ugettext
-from ..support.converters import asbool, aslist
+from ..i18n import get_lang, ugettext
+from ..support.converters import asbool, asint, aslist
 from .base import RendererFactory
 
 try:
@@ -26,6 +38,43 @@ else:  # pragma: no cover
 
 __all__ = ["KajikiRenderer"]
 
+log = logging.getLogger(__name__)
+
+
+# Compiled templates depend on the Python bytecode and on the Kajiki release.
+_KAJIKI_CODE_VERSION = importlib.util.MAGIC_NUMBER
+_KAJIKI_VERSION = None
+if kajiki is not None:
+    try:
+        from importlib.metadata import version
+
+        _KAJIKI_VERSION = version("kajiki")
+        _KAJIKI_CODE_VERSION += _KAJIKI_VERSION.encode("ascii")
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _kajiki_internals_supported():
+    """Whether the Kajiki release builds templates like Kajiki 0.9 and 1.x.
+
+    Compiled and pre-translated templates are created from the code
+    generated by Kajiki and rely on how templates classes are built.
+    """
+    if kajiki is None or _KAJIKI_VERSION is None:
+        return False
+
+    from kajiki.template import TplFunc
+
+    try:
+        major = int(_KAJIKI_VERSION.split(".")[0])
+    except ValueError:  # pragma: no cover
+        return False
+    return major < 2 and hasattr(TplFunc(None), "_func")
+
+
+# Name of the template extended by each template class, see _extended_template_name
+_extended_templates = weakref.WeakKeyDictionary()
+
 
 class KajikiRenderer(RendererFactory):
     """
@@ -37,10 +86,29 @@ class KajikiRenderer(RendererFactory):
         - ``templating.kajiki.cdata_scripts`` -> Automatically wrap scripts in CDATA.
         - ``templating.kajiki.html_optional_tags`` -> Allow unclosed html, head and body tags.
         - ``templating.kajiki.strip_text`` -> Strip leading/trailing spaces from text nodes.
+        - ``templating.kajiki.compiled_templates_dir`` -> Where to store compiled templates,
+          so that they can be reused after a restart and by all the processes that share
+          the directory. By default templates are only compiled in memory. Compiled
+          templates are loaded the way Kajiki builds template classes, when a Kajiki
+          release builds them differently a warning is logged and templates are
+          compiled in memory.
+        - ``templating.kajiki.pretranslate`` -> Render templates through variants with
+          their static text already translated, instead of translating it on each render.
+          A variant of each template is compiled the first time it's rendered for each
+          list of translated languages (``tg.i18n.get_lang(all=False)``), translations
+          done by ``_()`` in template expressions are still performed while rendering.
+          Ignored when templates are reloaded on each render, which happens when
+          ``auto_reload_templates`` is enabled and ``templating.watch_templates`` is not.
+        - ``templating.kajiki.pretranslate_cache_size`` -> Maximum number of translated
+          variants kept for each template, by default 10.
 
     Supported ``render_params``:
 
         - Caching options supported by :func:`.cached_template`
+        - ``stream`` -> Send the page to the client while it's being rendered,
+          see :class:`.TemplateRenderingConfigurationComponent`.
+        - ``block`` -> Render only the named ``py:block`` of the template,
+          see :class:`.TemplateRenderingConfigurationComponent`.
         - All arguments supported by :func:`kajiki.xml_template.XMLTemplate`
 
     """
@@ -53,8 +121,11 @@ class KajikiRenderer(RendererFactory):
         "cdata_scripts": asbool,
         "html_optional_tags": asbool,
         "strip_text": asbool,
+        "compiled_templates_dir": str,
+        "pretranslate": asbool,
+        "pretranslate_cache_size": asint,
     }
-    engines = {"kajiki": {"content_type": "text/html"}}
+    engines = {"kajiki": {"content_type": "text/html", "blocks": True}}
 
     @classmethod
     def create(cls, config, app_globals):
@@ -79,16 +150,49 @@ class KajikiRenderer(RendererFactory):
 
         i18n.gettext = ugettext
 
+        pretranslate = options.pop("pretranslate", False)
+        if not _kajiki_internals_supported():
+            if pretranslate or options.get("compiled_templates_dir"):
+                log.warning(
+                    "Kajiki %s is not supported by templating.kajiki.pretranslate "
+                    "and templating.kajiki.compiled_templates_dir, ignoring them",
+                    _KAJIKI_VERSION,
+                )
+            pretranslate = False
+            options.pop("compiled_templates_dir", None)
+
+        watcher = config.get("tg.templates_watcher")
+        reload = config["auto_reload_templates"] and watcher is None
+        if pretranslate and reload:
+            # Templates would be compiled again, and translated, on each render.
+            log.warning(
+                "templating.kajiki.pretranslate is ignored when templates "
+                "are reloaded on each render, enable templating.watch_templates"
+            )
+            pretranslate = False
+
         loader = KajikiTemplateLoader(
             config["paths"].templates[0],
             dotted_finder=app_globals.dotted_filename_finder,
-            reload=config["auto_reload_templates"],
+            reload=reload,
+            watcher=watcher,
             **options,
         )
-        return {"kajiki": cls(loader)}
+        return {"kajiki": cls(loader, pretranslate)}
 
-    def __init__(self, loader):
+    def __init__(self, loader, pretranslate=False):
         self.loader = loader
+        self.pretranslate = pretranslate
+
+    def _load(self, template_name, render_params):
+        template = self.loader.load(template_name, **render_params)
+        if self.pretranslate:
+            template = self.loader.translated(template)
+        return template
+
+    def load_template(self, template_name):
+        """Loads and compiles a template without rendering it."""
+        return self.loader.load(template_name)
 
     def __call__(
         self,
@@ -105,11 +209,27 @@ class KajikiRenderer(RendererFactory):
         ``cache_expire``.
 
         """
+        stream = render_params.pop("stream", False)
+        block = render_params.pop("block", None)
+        if block is not None:
+            return self._render_block(
+                template_name,
+                template_vars,
+                block,
+                cache_key,
+                cache_type,
+                cache_expire,
+                render_params,
+            )
+
+        if stream and cache_key is None and cache_type is None and cache_expire is None:
+            template = self._load(template_name, render_params)
+            return _encode_stream(template(template_vars))
 
         # Create a render callable for the cache function
         def render_template():
             # Grab a template reference
-            template = self.loader.load(template_name, **render_params)
+            template = self._load(template_name, render_params)
             return Markup(template(template_vars).render())
 
         return cached_template(
@@ -120,15 +240,85 @@ class KajikiRenderer(RendererFactory):
             cache_expire=cache_expire,
         )
 
+    def _render_block(
+        self,
+        template_name,
+        template_vars,
+        block,
+        cache_key,
+        cache_type,
+        cache_expire,
+        render_params,
+    ):
+        def render_block():
+            template = self._load(template_name, render_params)
+            render_func = _template_block(template(template_vars), block)
+            if render_func is None:
+                raise MissingTemplateBlockError(template_name, block)
+            return Markup("".join(str(chunk) for chunk in render_func()))
+
+        return cached_template(
+            template_name,
+            render_block,
+            ns_options=("block",),
+            cache_key=cache_key,
+            cache_type=cache_type,
+            cache_expire=cache_expire,
+            block=block,
+        )
+
 
 class KajikiTemplateLoader(FileLoader):
     """Kaijik template loader supporting dotted filenames.
     Solves also the issue of not supporting relative paths when using
     py:extends in Kaijiki
+
+    When a ``watcher`` is provided, loaded templates are kept until
+    the :class:`.FilesWatcher` notifies that they changed.
+
+    When ``compiled_templates_dir`` is provided, the code compiled from
+    each template is stored there, keyed on the template file, its
+    modification time and the loader options, and loaded from there
+    instead of compiling the template again. Files are written
+    atomically so that the directory can be shared by many processes.
+    When templates are reloaded, the directory is only read again
+    when the template file changed.
+
+    Variants of the loaded templates with the static text translated
+    in the current languages are provided by :meth:`translated`, up to
+    ``pretranslate_cache_size`` variants are kept for each template.
     """
 
-    def __init__(self, base, dotted_finder, reload=True, force_mode="html5", **kwargs):
+    def __init__(
+        self,
+        base,
+        dotted_finder,
+        reload=True,
+        force_mode="html5",
+        watcher=None,
+        compiled_templates_dir=None,
+        pretranslate_cache_size=10,
+        **kwargs,
+    ):
         self.dotted_finder = dotted_finder
+        self.watcher = watcher
+        self._translated = weakref.WeakKeyDictionary()
+        self._translated_cache_size = pretranslate_cache_size
+        self._translated_lock = threading.Lock()
+        self._translated_loader = _TranslatedTemplatesLoader(self)
+        self._compiled_stats = {}
+        self.compiled_templates_dir = None
+        if compiled_templates_dir:
+            try:
+                os.makedirs(compiled_templates_dir, exist_ok=True)
+            except OSError:
+                log.warning(
+                    "Unable to write compiled templates to %r, "
+                    "falling back to compiling them in memory.",
+                    compiled_templates_dir,
+                )
+            else:
+                self.compiled_templates_dir = compiled_templates_dir
         self.template_extension = kwargs.pop("template_extension", ".xhtml")
 
         super(KajikiTemplateLoader, self).__init__(base, reload, force_mode, **kwargs)
@@ -147,3 +337,320 @@ class KajikiTemplateLoader(FileLoader):
         if resolved_filename is None:
             raise IOError("Template %s not found in template paths" % filename)
         return resolved_filename
+
+    def _load(self, name, *args, **kwargs):
+        if self.compiled_templates_dir is not None and not args and not kwargs:
+            template = self._load_compiled(name)
+        else:
+            template = super(KajikiTemplateLoader, self)._load(name, *args, **kwargs)
+        if self.watcher is not None:
+            self.watcher.watch(template.filename, self._template_changed)
+        return template
+
+    def translated(self, template):
+        """Variant of ``template`` with static text translated in the current languages.
+
+        Variants are compiled once for each list of languages that have
+        a translation and load the templates they extend or import
+        translated too. When no translation is available,
+        ``template`` itself is returned.
+        """
+        langs = get_lang(all=False)
+        if not langs:
+            return template
+
+        langs = tuple(langs)
+        variants = self._translated.get(template)
+        variant = variants.get(langs) if variants is not None else None
+        if variant is None:
+            with self._translated_lock:
+                variants = self._translated.get(template)
+                if variants is None:
+                    variants = LRUCache(self._translated_cache_size)
+                    self._translated[template] = variants
+                variant = variants.get(langs)
+                if variant is None:
+                    try:
+                        variant = _translated_template(
+                            template, ugettext, self._translated_loader
+                        )
+                    except Exception:
+                        # Static text is still translated while rendering.
+                        log.warning(
+                            "Unable to pre-translate %s, rendering it untranslated",
+                            template.filename,
+                            exc_info=True,
+                        )
+                        variant = template
+                    variants.put(langs, variant)
+        return variant
+
+    def _template_changed(self, filename):
+        for name, template in list(self.modules.items()):
+            if template.filename == filename:
+                self.modules.pop(name, None)
+
+    def _load_compiled(self, name):
+        filename = str(self._find_resource(name))
+        stat = os.stat(filename)
+        template = self.modules.get(name)
+        if template is not None and self._compiled_stats.get(name) == (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            # Reloading a template that didn't change.
+            return template
+
+        compiled_filename = os.path.join(
+            self.compiled_templates_dir, self._compiled_key(filename, stat) + ".kajiki"
+        )
+
+        template = None
+        try:
+            with open(compiled_filename, "rb") as f:
+                compiled = marshal.load(f)
+            template = _template_from_compiled(compiled, self._template_options)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            log.warning("Discarding invalid compiled template %s", compiled_filename)
+
+        if template is None:
+            template = super(KajikiTemplateLoader, self)._load(name)
+            self._store_compiled(compiled_filename, template)
+        self._compiled_stats[name] = (stat.st_mtime_ns, stat.st_size)
+        return template
+
+    def _compiled_key(self, filename, stat):
+        # Only options with plain values change the generated code, others
+        # like base_globals are applied when the template is loaded and have
+        # a repr that changes in each process.
+        options = sorted(
+            (name, value)
+            for name, value in self._template_options.items()
+            if _is_plain_option(value)
+        )
+        key = (
+            filename,
+            stat.st_mtime_ns,
+            stat.st_size,
+            self._force_mode,
+            self._autoescape_text,
+            self._xml_autoblocks,
+            options,
+            _KAJIKI_CODE_VERSION,
+        )
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def _store_compiled(self, compiled_filename, template):
+        try:
+            compiled = _compiled_template(template)
+        except Exception:
+            # Kajiki doesn't build templates as expected, keep compiling in memory.
+            log.warning(
+                "Unable to compile templates of Kajiki %s to %s, disabling "
+                "templating.kajiki.compiled_templates_dir",
+                _KAJIKI_VERSION,
+                self.compiled_templates_dir,
+            )
+            self.compiled_templates_dir = None
+            return
+
+        # Write to a temporary file, then rename it, so that other
+        # processes never read a partially written file.
+        fd, tmp_filename = tempfile.mkstemp(
+            dir=self.compiled_templates_dir, suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(compiled, f)
+            os.replace(tmp_filename, compiled_filename)
+        except OSError:
+            log.warning("Unable to store compiled template %s", compiled_filename)
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+
+
+def _is_plain_option(value):
+    """Whether a template option has a value with a stable ``repr``."""
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain_option(item) for item in value)
+    return value is None or isinstance(value, (str, bytes, bool, int, float))
+
+
+def _template_from_code(code, py_text, filename, base_globals):
+    """Creates the template class like :func:`kajiki.template.from_ir` does."""
+    dct = {"kajiki": kajiki}
+    exec(code, dct)
+    template = dct["template"]
+    template.base_globals = dict(base_globals or {})
+    template.base_globals.update(dct)
+    template.py_text = py_text
+    template.filename = filename
+    return template
+
+
+def _compiled_template(template):
+    """Code of ``template`` as stored by :meth:`.KajikiTemplateLoader._store_compiled`."""
+    return (
+        compile(template.py_text, "<string>", "exec"),
+        template.py_text,
+        template.filename,
+        {name: method._func.__code__ for name, method in template.__methods__},
+    )
+
+
+def _template_from_compiled(compiled, template_options):
+    """Creates the template class stored by :meth:`.KajikiTemplateLoader._store_compiled`."""
+    code, py_text, filename, methods_code = compiled
+    template = _template_from_code(
+        code, py_text, filename, template_options.get("base_globals")
+    )
+    if set(methods_code) != set(name for name, __ in template.__methods__):
+        raise ValueError("Compiled template methods don't match")
+
+    # Restore line numbers of the template, as annotate_lnotab did when compiling.
+    for name, method in template.__methods__:
+        method._func.__code__ = methods_code[name]
+    return template
+
+
+def _template_block(instance, block):
+    """Function rendering ``block`` of the template ``instance``.
+
+    Templates extended by the instance are set up like rendering
+    does, so that blocks only defined by the layout and ``parent_block()``
+    are available. Returns ``None`` when no template defines the block.
+    """
+    instances = [instance]
+    extended = _extended_template_name(type(instance))
+    while extended is not None:
+        instance = instance.__kj__.extend(extended)
+        instances.append(instance)
+        extended = _extended_template_name(type(instance))
+
+    for instance in instances:
+        render_func = getattr(instance, "_kj_block_" + block, None)
+        if render_func is not None:
+            return render_func
+    return None
+
+
+def _kj_call_literal(node, name):
+    """Argument of ``node`` when it's a ``local.__kj__.<name>('literal')`` call."""
+    if not isinstance(node, ast.Call) or len(node.args) != 1 or node.keywords:
+        return None
+
+    func = node.func
+    if not (
+        isinstance(func, ast.Attribute)
+        and func.attr == name
+        and isinstance(func.value, ast.Attribute)
+        and func.value.attr == "__kj__"
+        and isinstance(func.value.value, ast.Name)
+        and func.value.value.id == "local"
+    ):
+        return None
+
+    arg = node.args[0]
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+        return arg.value
+    return None
+
+
+def _extended_template_name(template):
+    """Name of the template extended by ``template`` through ``py:extends``."""
+    try:
+        return _extended_templates[template]
+    except KeyError:
+        pass
+
+    name = None
+    for node in ast.walk(ast.parse(template.py_text)):
+        name = _kj_call_literal(node, "extend")
+        if name is not None:
+            break
+    _extended_templates[template] = name
+    return name
+
+
+class _StaticTextTranslator(ast.NodeTransformer):
+    """Replaces ``local.__kj__.gettext('text')`` calls with the translated text."""
+
+    def __init__(self, gettext):
+        self.gettext = gettext
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        text = _kj_call_literal(node, "gettext")
+        if text is None:
+            return node
+        return ast.copy_location(ast.Constant(self.gettext(text)), node)
+
+
+class _TranslatedTemplatesLoader(object):
+    """Loads translated variants of the templates of a :class:`.KajikiTemplateLoader`."""
+
+    def __init__(self, loader):
+        self._loader = weakref.proxy(loader)
+
+    def import_(self, name, **kwargs):
+        return self._loader.translated(self._loader.import_(name, **kwargs))
+
+    load = import_
+
+    def default_alias_for(self, name):
+        return self._loader.default_alias_for(name)
+
+
+def _translated_template(template, gettext, loader):
+    """Compiles a copy of ``template`` with the static text translated by ``gettext``.
+
+    Calls translating static text are found in the syntax tree of the
+    code generated by Kajiki, so text that only looks like them, as in
+    string literals, is left untouched. ``py_text`` of the copy is the
+    one of ``template``.
+    """
+    tree = _StaticTextTranslator(gettext).visit(ast.parse(template.py_text))
+    variant = _template_from_code(
+        compile(tree, "<string>", "exec"),
+        template.py_text,
+        template.filename,
+        template.base_globals,
+    )
+    if [name for name, __ in variant.__methods__] != [
+        name for name, __ in template.__methods__
+    ]:
+        raise ValueError("Translated template methods don't match")
+    variant.loader = loader
+
+    # Translated nodes keep the position of the calls they replace, so the
+    # code has the same lines and maps to the same template lines.
+    try:
+        variant.annotate_lnotab(_template_lines(template))
+    except Exception:  # pragma: no cover
+        log.debug("Unable to map %s lines to the template", template.filename)
+    return variant
+
+
+def _template_lines(template):
+    """Pairs of generated code line and template line of ``template`` methods."""
+    module_code = compile(template.py_text, "<string>", "exec")
+    class_code = [c for c in module_code.co_consts if isinstance(c, types.CodeType)][0]
+    methods_code = dict(
+        (c.co_name, c) for c in class_code.co_consts if isinstance(c, types.CodeType)
+    )
+
+    lines = {}
+    for name, method in template.__methods__:
+        # Both have the same bytecode, but consecutive lines of the generated
+        # code that map to the same template line are merged in the template one.
+        template_starts = list(dis.findlinestarts(method._func.__code__))
+        template_offsets = [offset for offset, __ in template_starts]
+        for offset, py_line in dis.findlinestarts(methods_code[name]):
+            idx = bisect.bisect_right(template_offsets, offset) - 1
+            if idx >= 0:
+                lines[py_line] = template_starts[idx][1]
+    return sorted(lines.items())
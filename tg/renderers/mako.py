@@ -12,8 +12,10 @@ except ImportError:  # pragma: no cover
     import dummy_threading as threading
 
 from markupsafe import Markup
+from repoze.lru import LRUCache
 
 from tg.render import cached_template
+from tg.support.converters import asint
 
 from .base import RendererFactory
 
@@ -38,11 +40,19 @@ class MakoRenderer(RendererFactory):
 
         - ``templating.mako.template_extension`` -> Mako Templates extension, default ``.mak``
         - ``templating.mako.compiled_templates_dir`` -> Where to store mako precompiled templates.
-          By default templates are only stored in memory and not on disk.
+          By default templates are only stored in memory and not on disk. Compiled templates
+          are written atomically and reused by all the processes that share the directory,
+          as far as the template didn't change since it was compiled.
+        - ``templating.mako.template_cache_size`` -> Maximum number of dotted templates
+          kept in memory, by default 1000.
     """
 
     #: Configuration Options that can be set as ``templating.mako.*``.
-    CONFIG_OPTIONS = {"compiled_templates_dir": str, "template_extension": str}
+    CONFIG_OPTIONS = {
+        "compiled_templates_dir": str,
+        "template_extension": str,
+        "template_cache_size": asint,
+    }
     engines = {"mako": {"content_type": "text/html"}}
 
     @classmethod
@@ -100,6 +110,8 @@ class MakoRenderer(RendererFactory):
             module_directory=compiled_dir,
             default_filters=["escape"],
             auto_reload_templates=config["auto_reload_templates"],
+            cache_size=options.get("template_cache_size", 1000),
+            watcher=config.get("tg.templates_watcher"),
         )
 
         normal_loader = TemplateLookup(
@@ -129,6 +141,19 @@ class MakoRenderer(RendererFactory):
         self.use_dotted_templatenames = use_dotted_templatenames
         self.template_extension = template_extension
 
+    def _resolve_template(self, template_name):
+        if self.use_dotted_templatenames and not template_name.endswith(
+            self.template_extension
+        ):
+            template_name = self.dotted_loader.find_template_file(template_name)
+            return template_name, self.dotted_loader
+        return template_name, self.normal_loader
+
+    def load_template(self, template_name):
+        """Loads and compiles a template without rendering it."""
+        template_name, loader = self._resolve_template(template_name)
+        return loader.get_template(template_name)
+
     def __call__(
         self,
         template_name,
@@ -137,13 +162,7 @@ class MakoRenderer(RendererFactory):
         cache_type=None,
         cache_expire=None,
     ):
-        if self.use_dotted_templatenames and not template_name.endswith(
-            self.template_extension
-        ):
-            template_name = self.dotted_loader.find_template_file(template_name)
-            loader = self.dotted_loader
-        else:
-            loader = self.normal_loader
+        template_name, loader = self._resolve_template(template_name)
 
         # Create a render callable for the cache function
         def render_template():
@@ -178,6 +197,15 @@ class DottedTemplateLookup(object):
     is necessary because it emulates files on the filesystem for the
     underlying Mako engine while they are in fact in your zip file.
 
+    Up to ``cache_size`` loaded templates are kept, discarding the least
+    recently used ones. Looking up an already loaded template requires
+    no locking, while each template is loaded holding its own lock,
+    so that different templates can be loaded concurrently.
+
+    When a ``watcher`` is provided, changed templates are discarded
+    when the :class:`.FilesWatcher` notifies them, instead of checking
+    the template file each time the template is requested.
+
     """
 
     def __init__(
@@ -191,6 +219,8 @@ class DottedTemplateLookup(object):
         template_extension=".mak",
         module_directory=None,
         auto_reload_templates=False,
+        cache_size=1000,
+        watcher=None,
     ):
         self.package_name = package_name
         self.find_template_file = find_template_file
@@ -200,15 +230,16 @@ class DottedTemplateLookup(object):
         self.imports = imports
         self.default_filters = default_filters
         # implement a cache for the loaded templates
-        self.template_cache = dict()
+        self.template_cache = _TemplatesCache(cache_size)
         # implement a cache for the filename lookups
-        self.template_filenames_cache = dict()
+        self.template_filenames_cache = _TemplatesCache(cache_size)
         self.module_directory = module_directory
-        self.auto_reload = auto_reload_templates
+        self.watcher = watcher
+        self.auto_reload = auto_reload_templates and watcher is None
         self.template_extension = template_extension
 
-        # a mutex to ensure thread safeness during template loading
-        self._mutex = threading.Lock()
+        # locks ensuring each template is only loaded by one thread at time
+        self._load_locks = dict()
 
     def adjust_uri(self, uri, relativeto):
         """Adjust the given uri relative to a filename.
@@ -276,55 +307,86 @@ class DottedTemplateLookup(object):
         """
         # make sure the template loading from filesystem is only done
         # one thread at a time to avoid bad clashes...
-        self._mutex.acquire()
-        try:
-            try:
-                # try returning from cache one more time in case
-                # concurrent thread already loaded
-                return self.template_cache[filename]
-
-            except KeyError:
-                # not in cache yet... we can continue normally
-                pass
-
-            try:
-                self.template_cache[filename] = Template(
-                    filename=filename,
-                    module_directory=self.module_directory,
-                    input_encoding=self.input_encoding,
-                    output_encoding=self.output_encoding,
-                    default_filters=self.default_filters,
-                    imports=self.imports,
-                    lookup=self,
-                )
-
-                return self.template_cache[filename]
-
-            except Exception:
-                self.template_cache.pop(filename, None)
-                raise
+        lock = self._load_locks.get(filename)
+        if lock is None:
+            lock = self._load_locks.setdefault(filename, threading.Lock())
+
+        with lock:
+            # try returning from cache one more time in case
+            # concurrent thread already loaded
+            template = self.template_cache.get(filename)
+            if template is not None:
+                return template
+
+            template = Template(
+                filename=filename,
+                module_directory=self.module_directory,
+                input_encoding=self.input_encoding,
+                output_encoding=self.output_encoding,
+                default_filters=self.default_filters,
+                imports=self.imports,
+                lookup=self,
+            )
+            self.template_cache[filename] = template
+            if self.watcher is not None:
+                self.watcher.watch(filename, self._template_changed)
+            return template
 
-        finally:
-            # _always_ release the lock once done to avoid
-            # "thread lock" effect
-            self._mutex.release()
+    def _template_changed(self, filename):
+        self.template_cache.pop(filename, None)
 
     def get_template(self, template_name):
         """this is the emulated method that must return a template
         instance based on a given template name
         """
-
-        if template_name not in self.template_cache:
+        template = self.template_cache.get(template_name)
+        if template is None:
             # the template string is not yet loaded into the cache.
             # Do so now
-            self.__load(template_name)
+            template = self.__load(template_name)
 
         if self.auto_reload:
             # AUTO RELOADING will be activated only if user has
             # explicitly asked for it in the configuration
             # return the template, but first make sure it's not outdated
             # and if outdated, refresh the cache.
-            return self.__check(self.template_cache[template_name])
+            return self.__check(template)
 
         else:
-            return self.template_cache[template_name]
+            return template
+
+
+class _TemplatesCache(object):
+    """Size bounded mapping of templates, reads take no locks."""
+
+    def __init__(self, size):
+        self._entries = LRUCache(size)
+
+    def __contains__(self, key):
+        return key in self._entries.data
+
+    def __len__(self):
+        return len(self._entries.data)
+
+    def __getitem__(self, key):
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._entries.put(key, value)
+
+    def get(self, key, default=None):
+        return self._entries.get(key, default)
+
+    def pop(self, key, default=None):
+        value = self._entries.get(key, default)
+        self._entries.invalidate(key)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+_MISSING = object()
@@ -200,6 +200,55 @@ config = DispatchingConfig()
 context = StackedObjectProxy(name="context")
 
 
+# The backend is shared by all the applications of the process,
+# it can't be switched anymore once a request context was set up.
+_context_backend = "threadlocal"
+_context_backend_locked = False
+
+
+def _set_context_backend(backend):
+    """Select the backend that tracks the request context and config.
+
+    Refer to :meth:`.StackedObjectProxy._set_backend` for available backends.
+    With the ``contextvars`` backend the config is resolved from the
+    request context, so each request only sets a single context value.
+
+    Raises ``RuntimeError`` when switching to a different backend
+    after the first request context was set up.
+    """
+    global _context_backend
+
+    if backend == _context_backend:
+        return
+
+    if _context_backend_locked:
+        raise RuntimeError(
+            "Unable to switch request context backend to %s, "
+            "the %s backend is already in use" % (backend, _context_backend)
+        )
+
+    config._set_backend(backend)
+    context._set_backend(backend)
+    config._resolve_from(context if backend == "contextvars" else None)
+    _context_backend = backend
+
+
+def _lock_context_backend():
+    """Prevents switching the backend, done when a request context is set up."""
+    global _context_backend_locked
+    _context_backend_locked = True
+
+
+def _reset_context_backend():
+    """Restores the ``threadlocal`` backend and allows switching it again.
+
+    Only meant for test suites that need to try multiple backends.
+    """
+    global _context_backend_locked
+    _context_backend_locked = False
+    _set_context_backend("threadlocal")
+
+
 class TurboGearsContextMember(TurboGearsObjectProxy):
     """Member of the TurboGears request context.
 
@@ -212,7 +261,7 @@ class TurboGearsContextMember(TurboGearsObjectProxy):
         self.__dict__["name"] = name
 
     def _current_obj(self):
-        return getattr(context, self.name)
+        return getattr(context._current_obj(), self.name)
 
 
 request = TurboGearsContextMember(name="request")
@@ -0,0 +1,273 @@
+"""Serve TurboGears WSGI applications through ASGI servers."""
+
+import asyncio
+import contextvars
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from tempfile import SpooledTemporaryFile
+
+# Request bodies bigger than this are spooled to disk
+_MAX_MEMORY_BODY_SIZE = 1024 * 1024
+
+# Event loops used to run coroutines in threads not served through ASGI
+_thread_loops = threading.local()
+
+
+def run_coroutine(coroutine, loop=None):
+    """Runs ``coroutine`` from synchronous code and returns its result.
+
+    When ``loop`` is provided, as it happens for requests served by
+    :class:`ASGIApplication`, the coroutine is awaited on that event loop
+    in a copy of the current context, while the current thread waits for
+    the result. Otherwise it runs on an event loop owned by the current
+    thread, which is created the first time it's needed.
+    """
+    if loop is None:
+        thread_loop = getattr(_thread_loops, "loop", None)
+        if thread_loop is None:
+            thread_loop = _thread_loops.loop = asyncio.new_event_loop()
+        return thread_loop.run_until_complete(coroutine)
+
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coroutine.close()
+        raise RuntimeError(
+            "Unable to wait for a coroutine from the thread running its event loop"
+        )
+
+    context = contextvars.copy_context()
+    future = Future()
+
+    def _schedule():
+        # Task copies the current context, so it can access the request context.
+        task = context.run(loop.create_task, coroutine)
+        task.add_done_callback(partial(_copy_task_result, future))
+
+    loop.call_soon_threadsafe(_schedule)
+    return future.result()
+
+
+def _copy_task_result(future, task):
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+
+class ASGIApplication(object):
+    """Adapts a WSGI application to the ASGI protocol.
+
+    The request body is received on the event loop before the WSGI
+    application is invoked, so that slow or idle clients don't keep
+    busy a thread while sending it. The whole body is buffered, in memory
+    or spooled to disk when big, so the application can't consume it
+    while it's being uploaded. ``CONTENT_LENGTH`` is always the size of
+    the received body, even for chunked uploads. Requests whose client
+    disconnects before sending the whole body are discarded.
+
+    The WSGI application then runs in a thread pool of at most
+    ``max_workers`` threads, which also consumes the response. Each chunk
+    is queued to the event loop as soon as it's produced, and the event
+    loop sends it to the client, so slow clients don't keep a thread busy.
+    Chunks a slow client hasn't received yet stay in memory. A thread is
+    still held for as long as the application takes to produce the
+    response, ``async def`` actions, long polling and slowly generated
+    responses included. The number of those requests served concurrently
+    is bound by ``max_workers``.
+
+    Each request runs in a copy of the context of the ASGI task, so
+    the ``contextvars`` registry backend can be used to track the
+    request context. Coroutines returned by ``async def`` actions are
+    awaited on the event loop, the event loop is available to the
+    application as ``environ['asgi.loop']``.
+
+    ``lifespan`` events are supported and the thread pool is
+    shutdown when the server stops.
+    """
+
+    def __init__(self, application, max_workers=None):
+        self.application = application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tg-asgi"
+        )
+
+    async def __call__(self, scope, receive, send):
+        scope_type = scope["type"]
+        if scope_type == "http":
+            await self._handle_http(scope, receive, send)
+        elif scope_type == "lifespan":
+            await self._handle_lifespan(receive, send)
+        else:
+            raise ValueError("Unsupported ASGI scope type: %s" % scope_type)
+
+    async def _handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Running requests might need the event loop to complete,
+                # so wait for them from a different thread.
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None, partial(self.executor.shutdown, wait=True)
+                )
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle_http(self, scope, receive, send):
+        body = await self._receive_body(receive)
+        if body is None:
+            # Client went away, nobody is waiting for a response.
+            return
+
+        try:
+            environ = self._make_environ(scope, body)
+            loop = environ["asgi.loop"] = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            messages = asyncio.Queue()
+            cancelled = threading.Event()
+            worker = loop.run_in_executor(
+                self.executor,
+                context.run,
+                self._run_wsgi,
+                environ,
+                partial(loop.call_soon_threadsafe, messages.put_nowait),
+                cancelled,
+            )
+            try:
+                await self._send_response(messages, send)
+            except BaseException:
+                # Client went away, stop the application before closing the body.
+                cancelled.set()
+                await asyncio.wait([worker])
+                if not worker.cancelled():
+                    worker.exception()
+                raise
+            await worker
+        finally:
+            body.close()
+
+    async def _send_response(self, messages, send):
+        """Sends the messages queued by the worker thread until ``None``."""
+        while True:
+            message = await messages.get()
+            if message is None:
+                return
+            await send(message)
+
+    async def _receive_body(self, receive):
+        """Receives the whole request body, ``None`` if the client disconnected."""
+        body = SpooledTemporaryFile(max_size=_MAX_MEMORY_BODY_SIZE)
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                return None
+            body.write(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return body
+
+    def _make_environ(self, scope, body):
+        # The whole body was received, its length is known even when the
+        # client didn't provide it, like for chunked requests.
+        content_length = body.tell()
+        body.seek(0)
+
+        script_name = scope.get("root_path", "")
+        path_info = scope["path"]
+        if script_name and path_info.startswith(script_name):
+            path_info = path_info[len(script_name) :]
+
+        server_name, server_port = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": script_name.encode("utf-8").decode("latin-1"),
+            "PATH_INFO": path_info.encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server_name,
+            "SERVER_PORT": str(server_port),
+            "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            "asgi.scope": scope,
+        }
+
+        client = scope.get("client")
+        if client:
+            environ["REMOTE_ADDR"] = client[0]
+            environ["REMOTE_PORT"] = str(client[1])
+
+        for name, value in scope.get("headers", ()):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                name = "HTTP_" + name
+            value = value.decode("latin-1")
+            if name in environ:
+                # Multiple cookie headers are joined like a single one would be.
+                separator = "; " if name == "HTTP_COOKIE" else ","
+                value = environ[name] + separator + value
+            environ[name] = value
+
+        environ["CONTENT_LENGTH"] = str(content_length)
+        return environ
+
+    def _run_wsgi(self, environ, send, cancelled):
+        """Runs the WSGI application in a worker thread.
+
+        ASGI messages are passed to ``send``, which queues them for the
+        event loop, followed by ``None`` once the response is complete.
+        """
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response_start.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+
+            response_start["message"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers
+                ],
+            }
+            return write
+
+        def _start():
+            if not response_start.get("sent"):
+                response_start["sent"] = True
+                send(response_start["message"])
+
+        def write(data):
+            _start()
+            send({"type": "http.response.body", "body": data, "more_body": True})
+
+        try:
+            app_iter = self.application(environ, start_response)
+            try:
+                for chunk in app_iter:
+                    if cancelled.is_set():
+                        return
+                    if chunk:
+                        write(chunk)
+                _start()
+                send({"type": "http.response.body", "body": b"", "more_body": False})
+            finally:
+                if hasattr(app_iter, "close"):
+                    app_iter.close()
+        finally:
+            send(None)
@@ -0,0 +1,151 @@
+"""Run functions on a bounded pool of background threads."""
+
+import atexit
+import queue
+import threading
+import time
+from logging import getLogger
+
+log = getLogger(__name__)
+
+
+class BackgroundRunner(object):
+    """Runs submitted functions in background threads.
+
+    Functions are queued in a queue of at most ``queue_size`` entries,
+    which is consumed by ``workers`` daemon threads started the first
+    time something is submitted. When the queue is full the
+    ``overflow`` policy decides what happens to the submitted function:
+
+        * ``drop``: the function is discarded and a warning is logged.
+        * ``block``: the caller waits until there is room in the queue.
+        * ``run``: the function is run immediately by the caller.
+
+    Once the threads are started :meth:`shutdown` is registered to
+    run at interpreter exit, so queued functions are not lost.
+
+    The time functions waited in the queue before running is tracked
+    and reported by :meth:`stats` together with the number of
+    completed, failed and dropped functions.
+    """
+
+    OVERFLOW_POLICIES = ("drop", "block", "run")
+
+    def __init__(self, workers=1, queue_size=100, overflow="drop", name="tg-bg"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("Unsupported overflow policy: %s" % overflow)
+
+        self.workers = workers
+        self.overflow = overflow
+        self.name = name
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {
+            "queued": 0,
+            "completed": 0,
+            "failed": 0,
+            "dropped": 0,
+            "total_lag": 0.0,
+            "max_lag": 0.0,
+        }
+
+    def submit(self, func, *args, **kwargs):
+        """Queues ``func`` to be called with the given arguments.
+
+        Returns ``False`` when the function was dropped
+        due to the queue being full.
+        """
+        if len(self._threads) < self.workers:
+            self._start_workers()
+
+        job = (time.perf_counter(), func, args, kwargs)
+        if self.overflow == "block":
+            self._queue.put(job)
+        else:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                if self.overflow == "run":
+                    self._run(job)
+                    return True
+
+                log.warning("Background queue full, dropping %s", func)
+                with self._lock:
+                    self._stats["dropped"] += 1
+                return False
+
+        with self._lock:
+            self._stats["queued"] += 1
+        return True
+
+    def stats(self):
+        """Returns counters and queue lag of the submitted functions.
+
+        ``total_lag`` and ``max_lag`` are the seconds functions
+        waited before being run, ``pending`` the functions
+        that are still in queue.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def join(self):
+        """Waits until all the queued functions have been run."""
+        self._queue.join()
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads once the queued functions have run."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+
+        if threads:
+            atexit.unregister(self.shutdown)
+        for __ in threads:
+            self._queue.put(None)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _start_workers(self):
+        with self._lock:
+            if not self._threads:
+                atexit.register(self.shutdown)
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker,
+                    name="%s-%s" % (self.name, len(self._threads)),
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        queued_at, func, args, kwargs = job
+        lag = time.perf_counter() - queued_at
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            log.exception("Error while running %s in background", func)
+            outcome = "failed"
+        else:
+            outcome = "completed"
+
+        with self._lock:
+            stats = self._stats
+            stats[outcome] += 1
+            stats["total_lag"] += lag
+            if lag > stats["max_lag"]:
+                stats["max_lag"] = lag
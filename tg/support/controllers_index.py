@@ -0,0 +1,96 @@
+"""Index of the controllers mounted in the application controllers tree."""
+
+from inspect import getattr_static
+
+
+class ControllersIndex(object):
+    """Maps each controller of the tree to the place where it's mounted.
+
+    The index is built by :class:`.TGApp` with a single walk of the
+    controllers tree starting from the root controller, and it's used
+    by :attr:`.CoreDispatcher.mount_steps` to know where a controller
+    is mounted without having to search for it in the whole tree.
+
+    Mount steps are the ``(name, controller)`` pairs that lead from the
+    root controller to the indexed controller, the first step is always
+    ``("/", root_controller)``.
+
+    Controllers attached to the tree after the index was built and
+    controllers that are not part of it (like the ones returned
+    by ``_lookup``) are not indexed. Attributes are read without invoking
+    descriptors, so controllers returned by properties are not indexed
+    either. :attr:`.CoreDispatcher.mount_steps` searches the tree for
+    controllers that are not indexed.
+    """
+
+    def __init__(self):
+        self._mount_steps = {}
+        self._children = {}
+        self._root = None
+        self.built = False
+
+    def build(self, root_controller):
+        """Index all controllers reachable from ``root_controller``."""
+        mount_steps = {}
+        children = {}
+
+        def walk(node, node_id, parents):
+            node_children = children.setdefault(node_id, {})
+            for name in dir(node):
+                if name.startswith("_") or name in ("mount_steps", "mount_point"):
+                    continue
+
+                # Properties and other descriptors are not invoked,
+                # they might fail or have side effects.
+                controller = getattr_static(node, name, None)
+                if hasattr(type(controller), "__get__"):
+                    continue
+                if not hasattr(controller, "_dispatch"):
+                    continue
+
+                node_children[name] = controller
+                controller_id = id(controller)
+                if controller_id in mount_steps:
+                    # Already reached through another path, the first one wins.
+                    continue
+
+                steps = parents + [(name, controller)]
+                mount_steps[controller_id] = steps
+                # Subcontrollers are looked up on the class, like dispatch does
+                # for class attributes, to avoid triggering instance properties.
+                walk(controller.__class__, controller_id, steps)
+
+        walk(root_controller, id(root_controller), [("/", root_controller)])
+
+        self._mount_steps = mount_steps
+        self._children = children
+        self._root = root_controller
+        self.built = True
+
+    def mount_steps(self, controller):
+        """Steps that lead from the root controller to ``controller``.
+
+        An empty list is returned for controllers that are not indexed.
+        """
+        return self._mount_steps.get(id(controller), [])
+
+    def mount_point(self, controller):
+        """Path where ``controller`` is mounted, empty when it's not indexed."""
+        return mount_point_from_steps(self.mount_steps(controller))
+
+    def children(self, controller):
+        """Subcontrollers mounted on ``controller`` by their name."""
+        return self._children.get(id(controller), {})
+
+    def controllers(self):
+        """All the indexed controllers, the root controller first."""
+        if self._root is None:
+            return []
+        return [self._root] + [steps[-1][1] for steps in self._mount_steps.values()]
+
+
+def mount_point_from_steps(mount_steps):
+    """Path where the controller reached through ``mount_steps`` is mounted."""
+    if not mount_steps:
+        return ""
+    return "/" + "/".join(x[0] for x in mount_steps[1:])
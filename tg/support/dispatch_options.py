@@ -0,0 +1,67 @@
+"""Dispatch options resolved once from the application configuration."""
+
+import mimetypes as default_mimetypes
+
+
+class DispatchOptions(object):
+    """Options that drive how :class:`.CoreDispatcher` dispatches requests.
+
+    Options are read from the configuration when the object is created,
+    so that dispatching a request doesn't involve any configuration lookup.
+    :class:`.DispatchConfigurationComponent` creates them when the
+    environment is loaded and makes them available as
+    ``config['tg.dispatch_options']``.
+
+    When request extensions are enabled, the mimetype of each extension
+    known by the configured ``mimetypes`` is also resolved in advance.
+    """
+
+    __slots__ = (
+        "enable_request_extensions",
+        "path_translator",
+        "ignore_parameters",
+        "enable_routing_args",
+        "mimetypes",
+        "extensions_mimetypes",
+    )
+
+    def __init__(self, conf):
+        mimetypes = conf.get("mimetypes", default_mimetypes)
+
+        self._set(
+            "enable_request_extensions",
+            not conf.get("disable_request_extensions", False),
+        )
+        self._set("path_translator", conf.get("dispatch_path_translator", True))
+        self._set("ignore_parameters", tuple(conf.get("ignore_parameters", [])))
+        self._set("enable_routing_args", conf.get("enable_routing_args", False))
+        self._set("mimetypes", mimetypes)
+        self._set("extensions_mimetypes", _map_extensions(mimetypes))
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DispatchOptions are read only")
+
+    def mimetype_for_extension(self, ext):
+        """Mimetype expected for a request path with the ``ext`` extension."""
+        try:
+            return self.extensions_mimetypes[ext]
+        except KeyError:
+            # Extension is not known by any map, but mimetypes also tries
+            # it lower cased, so it might still be able to guess something.
+            return self.mimetypes.guess_type("file" + ext)[0]
+
+
+def _map_extensions(mimetypes):
+    if mimetypes is default_mimetypes:
+        if not mimetypes.inited:
+            mimetypes.init()
+        types_map = mimetypes.types_map
+    else:
+        types_map = mimetypes.types_map[True]
+
+    extensions = set(types_map)
+    extensions.update(mimetypes.suffix_map, mimetypes.encodings_map)
+    return dict((ext, mimetypes.guess_type("file" + ext)[0]) for ext in extensions)
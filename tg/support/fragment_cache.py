@@ -0,0 +1,67 @@
+"""In-process cache of rendered templates."""
+
+import sys
+import time
+
+from repoze.lru import ExpiringLRUCache
+
+
+class FragmentCache(object):
+    """Size bounded cache of rendered templates kept in process memory.
+
+    Used by :func:`.cached_template` in place of Beaker, when
+    ``templating.fragment_cache`` is ``inprocess``, when ``cache_type``
+    is ``inprocess`` or when Beaker caching is not available.
+
+    Up to ``size`` rendered templates are kept, the least recently
+    used ones are discarded when the cache is full. Each entry
+    expires after the ``cache_expire`` provided when storing it,
+    entries without an expiration time are only discarded when
+    evicted. The cache is safe to use from multiple threads.
+    """
+
+    def __init__(self, size):
+        self._entries = ExpiringLRUCache(size)
+
+    def __len__(self):
+        return len(self._entries.data)
+
+    def get_value(self, namespace, key, createfunc, expiretime=None):
+        """Returns the cached value or stores the one created by ``createfunc``."""
+        cache_key = (namespace, key)
+        entries = self._entries
+        value = entries.get(cache_key, _MISSING)
+        if value is _MISSING:
+            value = createfunc()
+            if expiretime is not None:
+                expiretime = int(expiretime)
+            entries.put(cache_key, value, timeout=expiretime)
+        return value
+
+    def clear(self):
+        """Discards all the cached templates and resets statistics."""
+        self._entries.clear()
+
+    def stats(self):
+        """Returns entries and memory statistics of the cache.
+
+        ``memory`` is the approximate size in bytes of the
+        cached templates, ``entries`` only counts entries that
+        are not expired yet.
+        """
+        entries = self._entries
+        now = time.time()
+        with entries.lock:
+            values = [(v[1], v[2]) for v in entries.data.values()]
+
+        return {
+            "entries": sum(1 for __, expires in values if expires > now),
+            "size": entries.size,
+            "memory": sum(sys.getsizeof(value) for value, __ in values),
+            "hits": entries.hits,
+            "misses": entries.misses,
+            "evictions": entries.evictions,
+        }
+
+
+_MISSING = object()
@@ -7,6 +7,8 @@ Provides a consistent API to register and execute hooks.
 """
 
 import atexit
+import threading
+import time
 from logging import getLogger
 
 from ..configuration.milestones import config_ready, renderers_ready
@@ -18,14 +20,61 @@ log = getLogger(__name__)
 
 
 class HooksNamespace(object):
-    """Manages hooks registrations and notifications"""
+    """Manages hooks registrations and notifications
+
+    The hooks notified for each hook and controller are compiled
+    to a tuple the first time they are notified, system-wide hooks
+    first and then the controller hooks. Compiled hooks are discarded
+    whenever any hook is registered or disconnected.
+
+    Time spent in each hook function can be measured by enabling
+    stats through :meth:`enable_stats`, see :meth:`stats`.
+    """
 
     def __init__(self):
         self._hooks = dict()
+        self._compiled = dict()
+        self._compiled_generation = Decoration._hooks_generation
+        self._stats = None
+        self._stats_lock = threading.Lock()
         atexit.register(self._atexit)
 
     def _clear(self):
         self._hooks.clear()
+        self._invalidate()
+
+    def _invalidate(self):
+        Decoration._hooks_changed()
+        self._discard_compiled()
+
+    def _discard_compiled(self):
+        self._compiled.clear()
+        self._compiled_generation = Decoration._hooks_generation
+
+    def _compiled_hooks(self, hook_name, controller=None):
+        """Functions to notify for ``hook_name`` on ``controller``."""
+        generation = Decoration._hooks_generation
+        if self._compiled_generation != generation:
+            self._discard_compiled()
+
+        if controller is not None:
+            controller = default_im_func(controller)
+
+        try:
+            return self._compiled[controller][hook_name]
+        except KeyError:
+            return self._compile(hook_name, controller, generation)
+
+    def _compile(self, hook_name, controller, generation):
+        hooks = tuple(self._hooks.get(hook_name, ()))
+        if controller is not None:
+            deco = Decoration.get_decoration(controller)
+            hooks += tuple(deco.hooks.get(hook_name, ()))
+
+        # Hooks changed while compiling, the result might already be stale.
+        if generation == Decoration._hooks_generation:
+            self._compiled.setdefault(controller, {})[hook_name] = hooks
+        return hooks
 
     def _atexit(self):
         for func in self._hooks.get("shutdown", tuple()):
@@ -42,6 +91,62 @@ class HooksNamespace(object):
             else:
                 raise
 
+    def _record_call(self, hook_name, func, elapsed):
+        with self._stats_lock:
+            hook_stats = self._stats.setdefault(hook_name, {})
+            try:
+                func_stats = hook_stats[func]
+            except KeyError:
+                func_stats = hook_stats[func] = {"calls": 0, "total": 0.0, "max": 0.0}
+            func_stats["calls"] += 1
+            func_stats["total"] += elapsed
+            if elapsed > func_stats["max"]:
+                func_stats["max"] = elapsed
+
+    def _timed_call_handler(self, hook_name, trap_exceptions, func, args, kwargs):
+        start = time.perf_counter()
+        try:
+            return HooksNamespace._call_handler(
+                self, hook_name, trap_exceptions, func, args, kwargs
+            )
+        finally:
+            self._record_call(hook_name, func, time.perf_counter() - start)
+
+    def enable_stats(self):
+        """Starts measuring the time spent in each hook function.
+
+        Stats are collected until :meth:`disable_stats` is called,
+        when stats are not enabled hooks are called with no overhead.
+        """
+        if self._stats is None:
+            self._stats = {}
+        self._call_handler = self._timed_call_handler
+
+    def disable_stats(self):
+        """Stops measuring hooks and discards collected stats."""
+        self.__dict__.pop("_call_handler", None)
+        self._stats = None
+
+    def stats(self):
+        """Returns the stats collected since :meth:`enable_stats`.
+
+        Stats are provided as a dictionary of hook names, each one
+        mapping the called functions to the number of ``calls``, the
+        ``total`` and ``max`` time in seconds they took::
+
+            {'before_render': {hook_func: {'calls': 3, 'total': 0.12, 'max': 0.08}}}
+
+        ``None`` is returned when stats are not enabled.
+        """
+        if self._stats is None:
+            return None
+
+        with self._stats_lock:
+            return dict(
+                (hook_name, dict((f, dict(s)) for f, s in hook_stats.items()))
+                for hook_name, hook_stats in self._stats.items()
+            )
+
     def register(self, hook_name, func, controller=None):
         """Registers a TurboGears hook.
 
@@ -62,9 +167,10 @@ class HooksNamespace(object):
             "initialized_config",
             "before_wsgi_middlewares",
             "after_wsgi_middlewares",
+            "after_response",
         ):
             raise TGConfigError(
-                "Startup and Shutdown hooks cannot be registered on controllers"
+                "%s hook cannot be registered on controllers" % hook_name
             )
 
         if hook_name == "controller_wrapper":
@@ -95,6 +201,7 @@ class HooksNamespace(object):
             registrations.remove(func)
         except ValueError:
             pass
+        self._invalidate()
 
     def notify(
         self, hook_name, args=None, kwargs=None, controller=None, trap_exceptions=False
@@ -115,22 +222,14 @@ class HooksNamespace(object):
                             controller=RootController.index)
 
         """
+        hooks = self._compiled_hooks(hook_name, controller)
+        if not hooks:
+            return
+
         args = args or []
         kwargs = kwargs or {}
-
-        try:
-            syswide_hooks = self._hooks[hook_name]
-        except KeyError:  # pragma: no cover
-            pass
-        else:
-            for func in syswide_hooks:
-                self._call_handler(hook_name, trap_exceptions, func, args, kwargs)
-
-        if controller is not None:
-            controller = default_im_func(controller)
-            deco = Decoration.get_decoration(controller)
-            for func in deco.hooks.get(hook_name, []):
-                self._call_handler(hook_name, trap_exceptions, func, args, kwargs)
+        for func in hooks:
+            self._call_handler(hook_name, trap_exceptions, func, args, kwargs)
 
     def notify_with_value(self, hook_name, value, controller=None):
         """Notifies a TurboGears hook which is expected to return a value.
@@ -151,13 +250,13 @@ class HooksNamespace(object):
             pass
         else:
             for func in syswide_hooks:
-                value = func(value)
+                value = self._call_handler(hook_name, False, func, (value,), {})
 
         if controller is not None:
             controller = default_im_func(controller)
             deco = Decoration.get_decoration(controller)
             for func in deco.hooks[hook_name]:
-                value = func(value)
+                value = self._call_handler(hook_name, False, func, (value,), {})
 
         return value
 
@@ -177,6 +276,7 @@ class _ApplicationHookRegistration(object):
         )
         hooks = self.hooks_namespace._hooks
         hooks.setdefault(self.hook_name, []).append(self.func)
+        self.hooks_namespace._invalidate()
 
 
 class _ControllerHookRegistration(object):
@@ -0,0 +1,79 @@
+"""Cache of request paths known to be unresolvable by dispatch."""
+
+from repoze.lru import LRUCache
+from webob import Request
+from webob.exc import HTTPNotFound
+
+
+class NotFoundCache(object):
+    """Keeps track of recently unresolvable paths.
+
+    Paths are recorded by :class:`.CoreDispatcher` whenever object dispatch
+    fails to find a controller for a path piece, so that any other request
+    starting with the same path pieces can be answered by :class:`.TGApp`
+    with a prerendered 404 response without going through dispatch
+    and application wrappers.
+
+    Entries recorded as ``exact`` only match the very same path,
+    this is the case of paths where the missing piece was the last one
+    and had an extension stripped by request extensions.
+
+    ``hits`` and ``misses`` counters report how many requests were
+    answered from the cache and how many weren't.
+    """
+
+    def __init__(self, size):
+        self._entries = LRUCache(size)
+        self.hits = 0
+        self.misses = 0
+
+        response = Request.blank("/").get_response(HTTPNotFound())
+        self.status = response.status
+        self.headerlist = response.headerlist
+        self.body = response.body
+
+    def __len__(self):
+        return len(self._entries.data)
+
+    def clear(self):
+        """Forget all the recorded paths and reset counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, path_info, pieces, exact=False):
+        """Records the first ``pieces`` of ``path_info`` as unresolvable."""
+        path = _normalize_path(path_info)
+        self._entries.put("/".join(path.split("/")[:pieces]), exact)
+
+    def match(self, path_info):
+        """Whenever ``path_info`` starts with a path recorded as unresolvable."""
+        path = _normalize_path(path_info)
+        if path:
+            entries = self._entries
+            end = path.find("/")
+            while end != -1:
+                if entries.get(path[:end]) is False:
+                    self.hits += 1
+                    return True
+                end = path.find("/", end + 1)
+
+            if entries.get(path) is not None:
+                self.hits += 1
+                return True
+
+        self.misses += 1
+        return False
+
+    def __call__(self, environ, start_response):
+        """Serve the prerendered 404 response."""
+        start_response(self.status, list(self.headerlist))
+        return [self.body]
+
+
+def _normalize_path(path_info):
+    # Mimics crank DispatchState.set_path, which removes
+    # the leading slash and any trailing slash.
+    if path_info.startswith("/"):
+        path_info = path_info[1:]
+    return path_info.rstrip("/")
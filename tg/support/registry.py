@@ -9,11 +9,12 @@ global objects for TurboGears2.
 """
 
 import threading as threadinglocal
+from contextvars import ContextVar
 
 from tg.support import NoDefault
 from tg.support.objectproxy import TurboGearsObjectProxy
 
-__all__ = ["StackedObjectProxy", "RegistryManager"]
+__all__ = ["StackedObjectProxy", "RegistryManager", "ContextVarLocal"]
 
 
 def _getboolattr(obj, attrname):
@@ -25,6 +26,29 @@ def _getboolattr(obj, attrname):
         return None
 
 
+class ContextVarLocal(object):
+    """Storage for :class:`StackedObjectProxy` based on :mod:`contextvars`.
+
+    Provides the same ``objects`` attribute of a ``threading.local``,
+    but its value is specific to the current execution context, so that
+    it's preserved when code runs in asyncio tasks or is copied to
+    executor threads through :func:`contextvars.copy_context`.
+    """
+
+    __slots__ = ("_var",)
+
+    def __init__(self, name):
+        self._var = ContextVar(name, default=())
+
+    @property
+    def objects(self):
+        return self._var.get()
+
+    @objects.setter
+    def objects(self, objects):
+        self._var.set(objects)
+
+
 class StackedObjectProxy(TurboGearsObjectProxy):
     """Track an object instance internally using a stack
 
@@ -36,6 +60,9 @@ class StackedObjectProxy(TurboGearsObjectProxy):
     New objects are added to the top of the stack with _push_object while
     objects can be removed with _pop_object.
 
+    The stack can be tracked by context instead of by thread switching
+    to the ``contextvars`` backend through :meth:`_set_backend`.
+
     """
 
     _is_coroutine_marker = False  # make sure inspect.iscoroutine doesn't crash
@@ -49,9 +76,30 @@ class StackedObjectProxy(TurboGearsObjectProxy):
         """
         self.__dict__["____name__"] = name
         self.__dict__["____local__"] = threadinglocal.local()
+        self.__dict__["____backends__"] = {"threadlocal": self.____local__}
         if default is not NoDefault:
             self.__dict__["____default_object__"] = default
 
+    def _set_backend(self, backend):
+        """Switch where the stack of objects is tracked.
+
+        ``backend`` can be ``threadlocal`` to track objects by thread
+        or ``contextvars`` to track them by execution context.
+        Objects pushed by the current thread are moved to the new backend.
+
+        """
+        backends = self.____backends__
+        if backend not in backends:
+            if backend != "contextvars":
+                raise ValueError("Unsupported context backend: %s" % backend)
+            backends[backend] = ContextVarLocal(self.____name__)
+
+        local = backends[backend]
+        if local is not self.____local__:
+            local.objects = tuple(self._object_stack())
+            self.____local__.objects = ()
+            self.__dict__["____local__"] = local
+
     def _current_obj(self):
         """Returns the current active object being proxied to
 
@@ -92,11 +140,14 @@ class StackedObjectProxy(TurboGearsObjectProxy):
                 module.glob._pop_object(conf)
 
         """
+        local = self.____local__
         try:
-            self.____local__.objects.append((obj, False))
+            objects = local.objects
         except AttributeError:
-            self.____local__.objects = []
-            self.____local__.objects.append((obj, False))
+            objects = ()
+        # The stack is never modified in place, as with contextvars
+        # it might be shared with other contexts.
+        local.objects = objects + ((obj, False),)
 
     def _pop_object(self, obj=None):
         """Remove a thread-local object.
@@ -105,39 +156,40 @@ class StackedObjectProxy(TurboGearsObjectProxy):
         error is emitted if they don't match.
 
         """
+        local = self.____local__
         try:
-            popped = self.____local__.objects.pop()
-            popped_obj = popped[0]
-
-            if obj and popped_obj is not obj:
-                raise AssertionError(
-                    "The object popped (%s) is not the same as the object "
-                    "expected (%s)" % (popped_obj, obj)
-                )
+            objects = local.objects
+            popped_obj = objects[-1][0]
         except (AttributeError, IndexError):
             raise AssertionError("No object has been registered for this thread")
 
+        local.objects = objects[:-1]
+        if obj and popped_obj is not obj:
+            raise AssertionError(
+                "The object popped (%s) is not the same as the object "
+                "expected (%s)" % (popped_obj, obj)
+            )
+
     def _object_stack(self):
         """Returns all of the objects stacked in this container
 
         (Might return [] if there are none)
         """
         try:
-            try:
-                objs = self.____local__.objects
-            except AttributeError:
-                return []
-            return objs[:]
-        except AssertionError:  # pragma: no cover
+            objs = self.____local__.objects
+        except AttributeError:
             return []
+        return list(objs)
 
     def _preserve_object(self):
+        local = self.____local__
         try:
-            object, preserved = self.____local__.objects[-1]
+            objects = local.objects
+            object, preserved = objects[-1]
         except (AttributeError, IndexError):
             return
 
-        self.____local__.objects[-1] = (object, True)
+        local.objects = objects[:-1] + ((object, True),)
 
     @property
     def _is_preserved(self):
@@ -303,6 +355,7 @@ class DispatchingConfig(StackedObjectProxy):
     def __init__(self, name="DispatchingConfig"):
         super(DispatchingConfig, self).__init__(name=name)
         self.__dict__["_process_configs"] = []
+        self.__dict__["_context"] = None
 
     def push_thread_config(self, conf):
         """
@@ -347,7 +400,24 @@ class DispatchingConfig(StackedObjectProxy):
                 "expected (%s)" % (popped, conf)
             )
 
+    def _resolve_from(self, context):
+        """Resolve the configuration from the ``config`` of the current ``context``.
+
+        When ``context`` is provided, the configuration of the object
+        currently registered in it takes precedence over the pushed
+        configurations, so a request only has to register its context.
+        Passing ``None`` restores the default behaviour.
+        """
+        self.__dict__["_context"] = context
+
     def _current_obj(self):
+        context = self._context
+        if context is not None:
+            try:
+                return context._current_obj().config
+            except (TypeError, AttributeError):
+                pass
+
         try:
             return super(DispatchingConfig, self)._current_obj()
         except TypeError:
@@ -0,0 +1,159 @@
+"""Watch files for changes from a background thread."""
+
+import atexit
+import os
+import threading
+import weakref
+from logging import getLogger
+
+log = getLogger(__name__)
+
+# Watchers with a running thread, stopped at exit and restarted in forked processes.
+_running_watchers = weakref.WeakSet()
+
+
+class FilesWatcher(object):
+    """Polls the modification time of the watched files.
+
+    Files are registered through :meth:`watch`, the first time a file
+    is registered a daemon thread is started which checks all the
+    watched files every ``interval`` seconds and notifies the callbacks
+    of the files that changed or were removed. The last known
+    modification time of each file is available through :meth:`mtime`
+    without accessing the filesystem.
+
+    Running watchers are stopped when the interpreter exits and, as
+    threads don't survive ``fork``, their thread is started again in
+    forked processes, like the workers of prefork servers.
+    """
+
+    def __init__(self, interval=1.0, name="tg-watcher"):
+        self.interval = interval
+        self.name = name
+        self._mtimes = {}
+        self._callbacks = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def watch(self, filename, callback=None):
+        """Starts watching ``filename``.
+
+        ``callback`` is called with the filename each time the file
+        changes. Returns the modification time of the file, which
+        is ``None`` when it doesn't exist.
+        """
+        with self._lock:
+            if filename not in self._mtimes:
+                self._mtimes[filename] = _getmtime(filename)
+            if callback is not None:
+                callbacks = self._callbacks.setdefault(filename, [])
+                if callback not in callbacks:
+                    callbacks.append(callback)
+            mtime = self._mtimes[filename]
+
+        if self._thread is None:
+            self.start()
+        return mtime
+
+    def subscribe(self, callback):
+        """Calls ``callback`` with the filename of any watched file that changes."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def mtime(self, filename):
+        """Last known modification time of a watched file."""
+        return self._mtimes.get(filename)
+
+    def check(self):
+        """Checks all the watched files and notifies the ones that changed.
+
+        Returns the list of filenames that changed.
+        """
+        with self._lock:
+            watched = list(self._mtimes.items())
+
+        changed = []
+        for filename, mtime in watched:
+            current = _getmtime(filename)
+            if current != mtime:
+                changed.append((filename, current))
+
+        if not changed:
+            return []
+
+        with self._lock:
+            for filename, current in changed:
+                self._mtimes[filename] = current
+            notifications = [
+                (filename, self._listeners + self._callbacks.get(filename, []))
+                for filename, __ in changed
+            ]
+
+        for filename, callbacks in notifications:
+            log.debug("Detected change of %s", filename)
+            for callback in callbacks:
+                try:
+                    callback(filename)
+                except Exception:
+                    log.exception("Error while notifying change of %s", filename)
+
+        return [filename for filename, __ in changed]
+
+    def start(self):
+        """Starts the watcher thread if it's not running yet."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self._thread.start()
+            _running_watchers.add(self)
+
+    def stop(self):
+        """Stops the watcher thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            _running_watchers.discard(self)
+        self._stopped.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _after_fork(self):
+        # Only the thread that forked exists in the child process.
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:  # pragma: no cover
+                log.exception("Error while checking watched files")
+
+
+def _getmtime(filename):
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+def _stop_running_watchers():
+    for watcher in list(_running_watchers):
+        watcher.stop()
+
+
+def _restart_running_watchers():
+    for watcher in list(_running_watchers):
+        watcher._after_fork()
+
+
+atexit.register(_stop_running_watchers)
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    os.register_at_fork(after_in_child=_restart_running_watchers)
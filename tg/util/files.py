@@ -117,6 +117,17 @@ class DottedFileNameFinder(object):
 
             return result
 
+    def invalidate(self, filename):
+        """Forgets the lookups that resolved to ``filename``.
+
+        Used to lookup the files again when they are
+        changed or removed.
+        """
+        cache = self.__cache
+        for template_name, result in list(cache.items()):
+            if result == filename:
+                cache.pop(template_name, None)
+
     @classmethod
     def lookup(cls, name, extension=".html"):
         """Convenience method that permits to quickly get a file by dotted notation.
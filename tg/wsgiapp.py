@@ -2,31 +2,76 @@ import inspect
 import logging
 import os
 import sys
+from functools import partial
 
 from webob.exc import HTTPNotFound
 
 import tg
 from tg import request_local
+from tg.appwrappers.base import PhasedApplicationWrapper
 from tg.configuration.utils import TGConfigError
 from tg.i18n import _get_translator
+from tg.render import _TemplateStream
+from tg.renderers.base import warmup_templates
 from tg.request_local import Request, Response
+from tg.support.controllers_index import ControllersIndex
 
 log = logging.getLogger(__name__)
 
 
 class RequestLocals(object):
+    """The TurboGears context of a request, available as ``environ['tg.locals']``.
+
+    ``translator`` and ``tmpl_context`` are only created the first time
+    they are accessed, using the defaults of the :class:`TGApp` that is
+    serving the request, as many requests never use them.
+    They can still be replaced by assigning them.
+    """
+
     __slots__ = (
         "response",
         "request",
         "app_globals",
         "config",
-        "tmpl_context",
-        "translator",
+        "_tmpl_context",
+        "_translator",
         "session",
         "cache",
         "url",
+        "_app",
+        "_tg_vars",
     )
 
+    @property
+    def translator(self):
+        try:
+            return self._translator
+        except AttributeError:
+            translator = self._translator = _get_translator(
+                self._app.lang, tg_config=self.config
+            )
+            return translator
+
+    @translator.setter
+    def translator(self, translator):
+        self._translator = translator
+
+    @property
+    def tmpl_context(self):
+        try:
+            return self._tmpl_context
+        except AttributeError:
+            if self._app.strict_tmpl_context:
+                tmpl_context = TemplateContext()
+            else:
+                tmpl_context = AttribSafeTemplateContext()
+            self._tmpl_context = tmpl_context
+            return tmpl_context
+
+    @tmpl_context.setter
+    def tmpl_context(self, tmpl_context):
+        self._tmpl_context = tmpl_context
+
 
 class TGApp(object):
     def __init__(self, config=None, **kwargs):
@@ -54,32 +99,88 @@ class TGApp(object):
             "tg.response_options", Response._DEFAULT_RESPONSE_OPTIONS
         )
 
-        self.wrapped_dispatch = self._dispatch
+        # Runs after_response hooks, when background hooks are enabled.
+        self.after_response = config.get("tg.after_response")
+
+        # Paths known to be unresolvable, reset as they might
+        # have been recorded by a previous application.
+        self.notfound_cache = config.get("tg.notfound_cache")
+        if self.notfound_cache is not None:
+            self.notfound_cache.clear()
+
+        pipeline = config.get("application_wrappers_pipeline", False)
+        handler = self._dispatch
+        phased_wrappers = []
         for __, wrapper in self.config.get("application_wrappers", []):
+            if phased_wrappers:
+                next_handler = _ApplicationWrappersPipeline(handler, phased_wrappers)
+            else:
+                next_handler = handler
+
             try:
-                app_wrapper = wrapper(self.wrapped_dispatch, self.config)
-                if getattr(app_wrapper, "injected", True):
+                app_wrapper = wrapper(next_handler, self.config)
+                if not getattr(app_wrapper, "injected", True):
                     # if it conforms to the ApplicationWrapper ABC inject it only
                     # when an injected=True property is provided.
-                    self.wrapped_dispatch = app_wrapper
+                    continue
 
-                    # Force resolution of @cached_property, this speeds up requests
-                    # and also acts as a prevention against race conditions on the
-                    # property itself.
-                    getattr(app_wrapper, "next_handler", None)
+                # Force resolution of @cached_property, this speeds up requests
+                # and also acts as a prevention against race conditions on the
+                # property itself.
+                getattr(app_wrapper, "next_handler", None)
 
             except TypeError:
                 # backward compatibility with wrappers that didn't receive the config
-                self.wrapped_dispatch = wrapper(self.wrapped_dispatch)
+                app_wrapper = wrapper(next_handler)
+
+            if pipeline and _is_phased_wrapper(app_wrapper):
+                # Consecutive phased wrappers are run by a single pipeline.
+                phased_wrappers.append(app_wrapper)
+            else:
+                handler = app_wrapper
+                phased_wrappers = []
+
+        if phased_wrappers:
+            handler = _ApplicationWrappersPipeline(handler, phased_wrappers)
+        self.wrapped_dispatch = handler
+
+        # Index where each controller is mounted, this is built once
+        # the root controller is available and used by mount_point.
+        self.controllers_index = ControllersIndex()
+        self.config["tg.controllers_index"] = self.controllers_index
 
         if self.config.get("tg.root_controller") is not None:
             self.controller_instances["root"] = self.config["tg.root_controller"]
+            self.controllers_index.build(self.controller_instances["root"])
+
+        # Templates watcher to start on first request, see warmup.
+        self._pending_watcher = None
+
+        if config.get("templating.warmup", False):
+            # Compile templates now, so that first requests don't have to.
+            self._get_controller_instance("root")
+            warmup_templates(
+                config,
+                self.controllers_index.controllers(),
+                workers=config.get("templating.warmup_workers", 0),
+            )
+
+            # Loading templates started the watcher thread, the application
+            # might be created before forking workers, so keep the watcher
+            # stopped until a request is served.
+            self._pending_watcher = config.get("tg.templates_watcher")
+            if self._pending_watcher is not None:
+                self._pending_watcher.stop()
 
     def __call__(self, environ, start_response):
         """Serve a WSGI Request"""
         # Hide outer middlewares when crash inside application itself
         __traceback_hide__ = "before"  # noqa: F841
 
+        notfound_cache = self.notfound_cache
+        if notfound_cache is not None and notfound_cache.match(environ["PATH_INFO"]):
+            return notfound_cache(environ, start_response)
+
         testmode, context, registry = self._setup_app_env(environ)
 
         # Expose a path that simply registers the globals and preserves them
@@ -97,7 +198,14 @@ class TGApp(object):
 
         try:
             if response is not None:
-                return response(environ, start_response)
+                app_iter = response(environ, start_response)
+                if self.after_response is not None and tg.hooks._compiled_hooks(
+                    "after_response"
+                ):
+                    app_iter = self._notify_after_response(
+                        app_iter, environ, response.status
+                    )
+                return app_iter
 
             raise Exception(
                 "No content returned by controller (Did you "
@@ -105,8 +213,33 @@ class TGApp(object):
             )
         finally:
             # Help Python collect ram a bit faster by removing the reference
-            # cycle that the thread local objects cause
-            del environ["tg.locals"]
+            # cycle that the thread local objects cause, unless the response
+            # is a streamed template that still has to be rendered.
+            if response is None or not isinstance(response.app_iter, _TemplateStream):
+                del environ["tg.locals"]
+
+    def _notify_after_response(self, app_iter, environ, status):
+        """Queues the after_response hooks once app_iter has been consumed."""
+        # Only immutable values are copied, so the request doesn't
+        # keep alive the request body or other request objects.
+        request = Request(
+            dict((k, v) for k, v in environ.items() if isinstance(v, str))
+        )
+        return _AfterResponseIterator(
+            app_iter, partial(self._submit_after_response, (request, status))
+        )
+
+    def _submit_after_response(self, args):
+        """Queues each after_response hook as a separate background function.
+
+        Hooks are not trapped, so the runner logs and counts the
+        failures and a failing hook doesn't prevent the others from running.
+        """
+        hooks = tg.hooks
+        for func in hooks._compiled_hooks("after_response"):
+            self.after_response.submit(
+                partial(hooks._call_handler, "after_response", False, func), args, {}
+            )
 
     def _setup_app_env(self, environ):
         """Setup Request, Response and TurboGears context objects.
@@ -130,23 +263,12 @@ class TGApp(object):
             headers=resp_options["headers"],
         )
 
-        # Setup the translator object
-        translator = _get_translator(self.lang, tg_config=conf)
-
-        if self.strict_tmpl_context:
-            tmpl_context = TemplateContext()
-        else:
-            tmpl_context = AttribSafeTemplateContext()
-
-        app_globals = self.globals
-
         locals = RequestLocals()
+        locals._app = self
         locals.response = response
         locals.request = req
-        locals.app_globals = app_globals
+        locals.app_globals = self.globals
         locals.config = conf
-        locals.tmpl_context = tmpl_context
-        locals.translator = translator
         locals.session = environ.get(
             "beaker.session"
         )  # Usually None, unless middleware in place
@@ -158,15 +280,23 @@ class TGApp(object):
 
         # Register Global objects
         registry = environ["paste.registry"]
-        registry.register(request_local.config, conf)
+        if request_local._context_backend != "contextvars":
+            registry.register(request_local.config, conf)
         registry.register(request_local.context, locals)
+        if not request_local._context_backend_locked:
+            request_local._lock_context_backend()
+
+        pending_watcher = self._pending_watcher
+        if pending_watcher is not None:
+            self._pending_watcher = None
+            pending_watcher.start()
 
         if "paste.testing_variables" in environ:
             testing = True
             testenv = environ["paste.testing_variables"]
             testenv["req"] = req
             testenv["response"] = response
-            testenv["tmpl_context"] = tmpl_context
+            testenv["tmpl_context"] = locals.tmpl_context
             testenv["app_globals"] = self.globals
             testenv["config"] = conf
             testenv["session"] = locals.session
@@ -249,6 +379,8 @@ class TGApp(object):
                 mycontroller = mycontroller()
 
             self.controller_instances[controller] = mycontroller
+            if controller == "root":
+                self.controllers_index.build(mycontroller)
             return mycontroller
 
     def _dispatch(self, controller, environ, context):
@@ -263,6 +395,72 @@ class TGApp(object):
         return controller(environ, context)
 
 
+class _ApplicationWrappersPipeline(object):
+    """Runs a group of :class:`.PhasedApplicationWrapper` without nesting them.
+
+    ``wrappers`` are provided from the innermost to the outermost,
+    like they are registered, and the ``before`` phases run from the outermost
+    while ``after`` phases run from the innermost.
+    """
+
+    __slots__ = ("next_handler", "_before", "_after")
+
+    def __init__(self, next_handler, wrappers):
+        self.next_handler = next_handler
+        self._before = tuple(w.before for w in reversed(wrappers))
+        self._after = tuple(w.after for w in wrappers)
+
+    def __call__(self, controller, environ, context):
+        for idx, before in enumerate(self._before):
+            response = before(context)
+            if response is not None:
+                # Only wrappers outside of the one that provided
+                # the response get their after phase.
+                after = self._after[len(self._after) - idx :]
+                break
+        else:
+            response = self.next_handler(controller, environ, context)
+            after = self._after
+
+        for phase in after:
+            response = phase(context, response)
+        return response
+
+
+class _AfterResponseIterator(object):
+    """Response body that calls ``on_close`` when the server closes it.
+
+    Like :class:`webob.response.AppIterRange` and other ``app_iter``
+    wrappers it's not a generator, so ``on_close`` runs even when the
+    body is closed without being iterated.
+    """
+
+    __slots__ = ("app_iter", "_on_close")
+
+    def __init__(self, app_iter, on_close):
+        self.app_iter = app_iter
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        try:
+            if hasattr(self.app_iter, "close"):
+                self.app_iter.close()
+        finally:
+            if on_close is not None:
+                on_close()
+
+
+def _is_phased_wrapper(wrapper):
+    return (
+        isinstance(wrapper, PhasedApplicationWrapper)
+        and type(wrapper).__call__ is PhasedApplicationWrapper.__call__
+    )
+
+
 class TemplateContext(object):
     """Used by TurboGears as ``tg.tmpl_context``.
 